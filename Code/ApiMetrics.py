@@ -0,0 +1,192 @@
+import time
+import bisect
+import threading
+import RetryPolicy
+
+
+# upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# metrics of the current run, by endpoint
+_endpoints = {}
+_lock = threading.Lock()
+
+
+# empty metrics of an endpoint
+def _new_endpoint():
+    return {'calls': 0, 'errors': 0, 'quota_errors': 0, 'bytes': 0, 'latency_sum': 0.0, 'latency_max': 0.0,
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1)}
+
+
+# record one call of an endpoint
+def record(endpoint, seconds, error=None, transferred=0):
+    """
+    Record one call of an API endpoint.
+
+    Parameters
+    ----------
+    endpoint : str
+        Endpoint name, e.g. 'ee.getInfo' or 'drive.files.list'.
+    seconds : float
+        Latency of the call.
+    error : Exception, optional
+        Error raised by the call; rate limit and quota errors are also
+        counted separately (see `RetryPolicy.is_quota_error`).
+    transferred : int, optional
+        Bytes transferred by the call.
+    """
+    with _lock:
+        metrics = _endpoints.setdefault(endpoint, _new_endpoint())
+        metrics['calls'] += 1
+        metrics['latency_sum'] += seconds
+        metrics['latency_max'] = max(metrics['latency_max'], seconds)
+        metrics['buckets'][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        metrics['bytes'] += transferred
+        if error is not None:
+            metrics['errors'] += 1
+            metrics['quota_errors'] += RetryPolicy.is_quota_error(error)
+
+
+# timed call of an endpoint
+def call(endpoint, func, *args, **kwargs):
+    """
+    Call an API function and record its latency and outcome under `endpoint`.
+
+    Parameters
+    ----------
+    endpoint : str
+        Endpoint name, e.g. 'ee.task.start'.
+    func : callable
+        Function doing the request.
+    *args, **kwargs
+        Arguments passed to `func`.
+
+    Returns
+    -------
+    object
+        The return value of `func`; errors are recorded and re-raised.
+
+    Example
+    -------
+    >>> tiles = ApiMetrics.call('ee.getInfo.L89List', pathrows.getInfo)
+    """
+    start = time.time()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        record(endpoint, time.time() - start, e)
+        raise
+    record(endpoint, time.time() - start)
+    return result
+
+
+# Earth Engine getInfo
+def get_info(ee_object, endpoint='ee.getInfo'):
+    """
+    Evaluate an Earth Engine object with `getInfo`, recorded under `endpoint`.
+
+    Callers use sub-endpoints such as 'ee.getInfo.classify' so the time spent
+    in the different server-side computations can be told apart.
+    """
+    return call(endpoint, ee_object.getInfo)
+
+
+# start an Earth Engine batch task
+def start_task(task, endpoint='ee.task.start'):
+    return call(endpoint, task.start)
+
+
+# status of an Earth Engine batch task
+def task_status(task, endpoint='ee.task.status'):
+    return call(endpoint, task.status)
+
+
+# execute a Drive API request
+def execute(request, endpoint):
+    """
+    Execute a Google API request, e.g. `service.files().list(...)`, recorded under `endpoint`.
+
+    Example
+    -------
+    >>> response = ApiMetrics.execute(service.files().list(q=query), 'drive.files.list')
+    """
+    return call(endpoint, request.execute)
+
+
+# download one media chunk
+def next_chunk(downloader, fh, endpoint='drive.files.get_media'):
+    """
+    Download the next chunk of a `MediaIoBaseDownload`, recording latency and bytes.
+
+    Parameters
+    ----------
+    downloader : googleapiclient.http.MediaIoBaseDownload
+        Downloader writing into `fh`.
+    fh : io.IOBase
+        File object the chunk is written to; its position gives the bytes transferred.
+    endpoint : str, optional
+        Endpoint name (default: 'drive.files.get_media').
+
+    Returns
+    -------
+    tuple
+        `(status, done)` of `downloader.next_chunk()`.
+    """
+    position = fh.tell()
+    start = time.time()
+    try:
+        result = downloader.next_chunk()
+    except Exception as e:
+        record(endpoint, time.time() - start, e, fh.tell() - position)
+        raise
+    record(endpoint, time.time() - start, transferred=fh.tell() - position)
+    return result
+
+
+# start new run metrics
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+# metrics of all endpoints
+def snapshot():
+    """
+    Return the metrics of all endpoints of the run so far.
+
+    Returns
+    -------
+    dict
+        `{endpoint: {'calls', 'errors', 'quota_errors', 'bytes',
+        'latency_sum', 'latency_max', 'latency_mean', 'buckets'}}`, where
+        `buckets` maps each upper bound of `LATENCY_BUCKETS` (and '+Inf')
+        to the number of calls not slower than it (cumulative, as in a
+        Prometheus histogram).
+    """
+    report = {}
+    with _lock:
+        for endpoint, metrics in sorted(_endpoints.items()):
+            cumulative = 0
+            buckets = {}
+            for bound, n in zip(list(LATENCY_BUCKETS) + ['+Inf'], metrics['buckets']):
+                cumulative += n
+                buckets[str(bound)] = cumulative
+            report[endpoint] = {
+                'calls': metrics['calls'],
+                'errors': metrics['errors'],
+                'quota_errors': metrics['quota_errors'],
+                'bytes': metrics['bytes'],
+                'latency_sum': round(metrics['latency_sum'], 3),
+                'latency_max': round(metrics['latency_max'], 3),
+                'latency_mean': round(metrics['latency_sum'] / metrics['calls'], 3),
+                'buckets': buckets,
+            }
+    return report
+
+
+# console summary of the endpoints
+def print_summary():
+    for endpoint, metrics in snapshot().items():
+        print(f"[API] {endpoint}: {metrics['calls']} calls, {metrics['errors']} errors "
+              f"({metrics['quota_errors']} quota), mean {metrics['latency_mean']:.2f}s, "
+              f"max {metrics['latency_max']:.2f}s, {metrics['bytes'] / 1e6:.1f} MB")
@@ -7,35 +7,40 @@ for the Conterminous United States (CONUS) using Landsat 8/9 and Sentinel-2 data
 
 Main Features:
 --------------
-1. Authenticate and initialize Google Earth Engine.
-2. Define temporal parameters based on the current date, focusing on the previous month.
-3. Generate trusted training pixel labels using multi-year historical Crop Data Layer (CDL).
-4. Run parallel classification pipelines for Landsat 8/9 and Sentinel-2 using multiprocessing:
-   - Landsat 8/9 classification.
-   - Sentinel-2 classification.
+1. Authenticate and initialize Google Earth Engine when the classification stage starts (`EESession`).
+2. Define the period of the run: by default May 1st to today, labelled with the previous month.
+3. Generate trusted training pixel labels using multi-year historical Crop Data Layer (CDL),
+   materialized once per season as an Earth Engine asset and reused by later monthly runs.
+4. Run the Landsat 8/9 and Sentinel-2 classification pipelines with one tile engine:
+   - tiles of both sensors share one export task budget, one status poller and one download pool.
+   - per-sensor throughput is reported when all tiles are downloaded.
 5. Mosaic Landsat and Sentinel-2 classification results into a 10-meter resolution mosaic.
-6. Clip the mosaic to the CONUS boundary shapefile, outputting a Cloud-Optimized GeoTIFF (COG).
+6. Clip the mosaic to the shapefile of the run (CONUS boundary by default), outputting a Cloud-Optimized GeoTIFF (COG).
 7. Convert the clipped COG raster to Erdas Imagine IMG format.
 8. Resample the 10m COG mosaic to 30m resolution and convert to Erdas IMG format.
-9. Clean up intermediate mosaic files and local classification tiles.
+9. Clean up intermediate mosaic files and local classification tiles
+   (tiles are kept in a local archive, tiles without new acquisitions are reused next month).
 10. Delete processed classification files from Google Drive after a delay.
 11. Log the script start time, end time, and total elapsed time.
 
 Parameters and Paths:
 ---------------------
-- Uses fixed file paths for shapefiles, local output directories, and Google Drive folders.
-- Cloud cover thresholds for Sentinel-2 (default 10%) and Landsat 8/9 (default 15%) are defined.
-- Output filenames are dynamically created using the current year and previous month.
+- A run is described by a configuration (`RunConfig`): area of interest (TIGER state names or an
+  Earth Engine table asset, CONUS by default), clip shapefile, period, sensors, cloud cover thresholds
+  (Sentinel-2 10%, Landsat 8/9 15% by default) and output root, read from `--config FILE` and `--set KEY=VALUE`.
+- The national run keeps the historical folders; named runs get their own local folders and Drive folders,
+  so several runs (e.g. per-state rush products, see `LaunchRuns.py`) can run side by side.
+- Output filenames are dynamically created using the year and month label of the run.
 
 Important Notes:
 ----------------
 - Ensure all required Python packages are installed: `ee`, `osgeo.gdal`, `google-auth`, 
-  `google-api-python-client`, `numpy`, `multiprocessing`, and custom modules 
-  (TrustedPixel, ErdasConvert, MosaicL89S2, ClipRasterByShp, ResampleTool, DeleteDriveFiles).
-- The script uses multiprocessing to speed up parallel execution of Landsat and Sentinel processing.
-- Paths and parameters are currently hardcoded; consider parameterizing for reusability.
+  `google-api-python-client`, `numpy`, and custom modules 
+  (TrustedPixel, TrustedPixelCache, ErdasConvert, MosaicL89S2, ClipRasterByShp, ResampleTool, DeleteDriveFiles).
+- Landsat and Sentinel tiles are interleaved by `TileEngine` so both sensors share EE quota and bandwidth.
 - The script waits 30 seconds before deleting files on Google Drive to ensure upload completion.
-- Error handling uses try-except blocks to continue processing despite individual step failures.
+- Steps run as stages of `StagePipeline`: a failed stage blocks only the stages depending on it,
+  completed stages are recorded with content hashes in `<year><month>_stages.json` and skipped on re-runs.
 - The CONUS boundary geometry excludes non-continental US states and territories.
 
 Usage:
@@ -45,7 +50,12 @@ and elapsed processing time.
 
 Example:
 --------
-$ python inseason_crop_mapping.py
+$ python AutoInseasonMapping.py                           # run all stages not up to date
+$ python AutoInseasonMapping.py run resample_30m erdas_30m # run selected stages only
+$ python AutoInseasonMapping.py resume                    # continue after a failure
+$ python AutoInseasonMapping.py force clip_10m            # re-run a stage and what changes downstream
+$ python AutoInseasonMapping.py list                      # stages and recorded state
+$ python AutoInseasonMapping.py --config Runs/Iowa.json --set month=June --set end_date=2025-06-30 run
 
 Output:
 - Mosaic, clipped, and resampled classification maps in both COG formats saved under the Results folder.
@@ -53,216 +63,227 @@ Output:
 - Temporary files and Google Drive export folders cleaned up after processing.
 """
 
-import ee
-
-# Trigger the authentication flow.
-ee.Authenticate()
-# Initialize the library.
-ee.Initialize(project='project name') # replace by your cloud project name
-
 from datetime import datetime
 import os
-from osgeo import gdal
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-import numpy as np
-from multiprocessing import Process
-import TrustedPixel
-import ErdasConvert
-import MosaicL89S2
-from AutomatedL89Mapping import L89MosaicClassification
-from AutomatedS2Mapping import S2MosaicClassification
-import ClipRasterByShp
-import ResampleTool
 import time
-import DeleteDriveFiles
+import StagePipeline
+import Telemetry
+import ApiMetrics
+import EESession
+import ProgressTracker
+import ResourceGovernor
+import RunConfig
+import ScratchSpace
 import shutil
-
-
-# define the current time: year, month, date
-# example: year, startDate, endDate, month = 2025, "2025-05-01","2025-07-17", "July"
-start_time = datetime.now()
-print(f"[{start_time}] Script started")
-year = start_time.year
-print("Year:", year)
-
-startDate = f"{year}-05-01"
-
-month_num = start_time.month
-# Move to previous month
-if month_num == 1:
-    prev_month_num = 12
-    prev_month_year = year - 1
-else:
-    prev_month_num = month_num - 1
-    prev_month_year = year
-
-month = datetime(prev_month_year, prev_month_num, 1).strftime("%B")
-print("startDate:month", startDate,month)
-
-
-# cloud filter threshold for Sentinel-2 and Landsat 8/9
-S2cloudCover = 10
-L89cloudCover = 15 
-
-
-# generate trusted pixel, using gap 7 (past 6 years CDL to predict current year's training labels)
-CONUStrainingLabel = TrustedPixel.trustedPixels(year,7)
-
-
-# define Drive export folder
-root_path = '/content/drive/MyDrive/'
-L89tileFolder = 'AutoInseasonL89_Mapping'
-S2tileFolder = 'AutoInseasonS2_Mapping'
-
-# define local saving folder and path
-local_root_folder = '/home/hli47/InseasonMapping/Results/'
-mosaicfolder_path = '/home/hli47/InseasonMapping/Results/AutoInseasonL89S2_Mosaic/'
-result_path = f'/home/hli47/InseasonMapping/Results/AutoInseasonL89S2_Result/{year}'
-
-
-# define mosaic geotif image name for landsat8/9 and sentinel-2
-l89_name = f"{year}{month}_L89mosaic.tif"
-s2_name = f"{year}{month}_S2mosaic.tif"
-
-# Define a geometry to cover Conterminous U.S.
-CONUSBoundary = (ee.FeatureCollection("TIGER/2018/States")
-                    .filter(ee.Filter.neq('NAME', 'United States Virgin Islands'))
-                    .filter(ee.Filter.neq('NAME', 'Puerto Rico'))
-                    .filter(ee.Filter.neq('NAME', 'Alaska'))
-                    .filter(ee.Filter.neq('NAME', 'Hawaii'))
-                    .filter(ee.Filter.neq('NAME', 'Guam'))
-                    .filter(ee.Filter.neq('NAME', 'Virgin Islands'))
-                    .filter(ee.Filter.neq('NAME', 'American Samoa'))
-                    .filter(ee.Filter.neq('NAME', 'Northern Mariana Islands'))
-                    .filter(ee.Filter.neq('NAME', 'Commonwealth of the Northern Mariana Islands'))).union().geometry()
-print("Generating CONUS boundary")
-
-
-# define the process functions in the Process event
-def run_landsat():
-    L89MosaicClassification(startDate, month, S2cloudCover, CONUSBoundary, CONUStrainingLabel, L89tileFolder, local_root_folder, mosaicfolder_path,l89_name)
-
-def run_sentinel():
-    S2MosaicClassification(startDate, month, L89cloudCover, CONUSBoundary, CONUStrainingLabel, S2tileFolder, local_root_folder, mosaicfolder_path,s2_name)
-
-
-# the automated mapping production starts at multiprocess Landsat 8/9 and Sentinel-2 classification in the Cloud platform
-if __name__ == '__main__':
-
-    # start running the multiprocess functions 
-    print("Starting mapping in Sentinel-2 and Landsat8/9 datasets")
-    p1 = Process(target=run_landsat)
-    p2 = Process(target=run_sentinel)
-
-    p1.start()
-    p2.start()
-
-    p1.join()
-    p2.join()
-
-    print("Both L89 and S2 classification processes completed.")
-
-    # ===========10m in-season crop map processing (mosaic, clip, color, Erdas)==============
-    # define mosaiced, clipped, converted file's name for 10m maps
-    mosaic_name_10m = f"{year}{month}CropMapMosaiced.tif"
-    clip_name_10m = f"{year}{month}CropMap10m.tif"
-    erdas_name_10m = f'{year}{month}CropMap10m.img'
-
-    # define mosaiced image path
-    mosaicedFilePath_10m = mosaicfolder_path +  mosaic_name_10m
-
-    # set the path of clipping shape file covering CONUS
-    shapefile = "/home/hli47/InseasonMapping/ShapeFile/CONUS_boundary_5070.shp"
-
+import sys
+
+# Earth Engine, GDAL and the Google API client are imported by the stages using them (see `EESession`),
+# so importing this module, e.g. in spawned pool workers, stays cheap
+
+
+# TIGER/2018/States outside the Conterminous U.S.
+NON_CONUS_STATES = ['United States Virgin Islands', 'Puerto Rico', 'Alaska', 'Hawaii', 'Guam', 'Virgin Islands',
+                    'American Samoa', 'Northern Mariana Islands', 'Commonwealth of the Northern Mariana Islands']
+
+
+# Define a geometry to cover the area of interest of a run
+def aoi_geometry(config):
+    """
+    Build the area of interest of a run: its TIGER states, its table asset, or CONUS.
+
+    Returns:
+        ee.Geometry: Area of interest.
+    """
+    ee = EESession.initialize(config['ee_project'])
+    states = ee.FeatureCollection("TIGER/2018/States")
+    if config['aoi_asset']:
+        return ee.FeatureCollection(config['aoi_asset']).union().geometry()
+    if config['states']:
+        return states.filter(ee.Filter.inList('NAME', config['states'])).union().geometry()
+    for name in NON_CONUS_STATES:
+        states = states.filter(ee.Filter.neq('NAME', name))
+    return states.union().geometry()
+
+
+# area of interest and training labels of a run
+def aoi_inputs(config):
+    """
+    Build the boundary and the trusted-pixel training labels of a run.
+
+    Returns:
+        tuple: (ee.Geometry, ee.Image) boundary and training label image.
+    """
+    import TrustedPixelCache
+    boundary = aoi_geometry(config)
+    print(f"Generating {config['name']} boundary")
+
+    # generate trusted pixel, using gap 7 by default (past 6 years CDL to predict current year's training labels)
+    # materialized once per season into an asset and loaded by reference afterwards
+    trainingLabel = TrustedPixelCache.trusted_pixels(config['year'], config['trusted_pixel_gap'], boundary,
+                                                     config['name'], config['trusted_pixel_asset_root'])
+    return boundary, trainingLabel
+
+
+# sensor profiles scheduled together by the tile engine
+def sensor_profiles(config):
+    from AutomatedL89Mapping import L89Profile
+    from AutomatedS2Mapping import S2Profile
+    paths = config['paths']
+    builders = {'L89': (L89Profile, config['l89_cloud_cover']), 'S2': (S2Profile, config['s2_cloud_cover'])}
+    return [builders[sensor][0](builders[sensor][1], paths[f'{sensor}_tile_folder'], paths[f'{sensor}_mosaic_name'],
+                                paths[f'{sensor}_archive_folder'])
+            for sensor in RunConfig.SENSORS if sensor in config['sensors']]
+
+
+# ===========pipeline stages==============
+def build_stages(config):
+    """
+    Build the stage graph of a run (see `StagePipeline`).
+
+    Returns:
+        list: Stage definitions; inputs and outputs define the order, independent stages run concurrently.
+    """
+    paths = config['paths']
+    sensors = [sensor for sensor in RunConfig.SENSORS if sensor in config['sensors']]
+    sensor_mosaics = [paths[f'{sensor}_mosaic'] for sensor in sensors]
+
+    # the automated mapping production starts at Landsat 8/9 and Sentinel-2 classification in the Cloud platform
+    def classify_stage():
+        # classify, export, download and mosaic the tiles of all sensors with one scheduler
+        print(f"Starting mapping in {', '.join(sensors)} datasets")
+        import TileEngine
+        boundary, trainingLabel = aoi_inputs(config)
+        progress = ProgressTracker.ProgressTracker(paths['progress_status'], config['progress_port']).start()
+        engine_limits = {key: config[key] for key in ['max_active_tasks', 'download_workers'] if config[key]}
+        try:
+            TileEngine.run_tiles(sensor_profiles(config), config['start_date'], config['month'], boundary,
+                                 trainingLabel, paths['root'], paths['mosaic_folder'],
+                                 export_profile=config['export_profile'], composite_mode=config['composite_mode'],
+                                 sample_cache=paths['sample_cache'], region_table=config['region_table'],
+                                 region_asset_root=paths['region_asset_folder'],
+                                 footprint_cache=paths['footprint_cache'],
+                                 local_majority=config['local_majority_filter'], local_remap=config['local_remap'],
+                                 progress=progress, end_date=config['end_date'], **engine_limits)
+        finally:
+            progress.stop()
+            print(progress.summary())
+        print(f"{', '.join(sensors)} classifications completed.")
 
     # Mosaic S2 and Landsat8/9 mosaiced image, output Geotiff with color tabel
-    try:
-        print('Ready to mosaic 10m L89mosaic and S2mosaic')
-        MosaicL89S2.mosaic_L89_S2_gdal(mosaicfolder_path, l89_name, s2_name, mosaic_name_10m)
-    except Exception as e:
-        print(f"Mosaicking failed: {e}")
-
-
-    #  clip mosaiced image by using CONUS shape file, output COG 
-    clippedFilePath_10m = result_path +  clip_name_10m
-    output_erdas_path_10m = result_path + erdas_name_10m
-    try:
-        print('Ready to clip 10m raster by CONUS shp_file')
-        ClipRasterByShp.clip_raster_to_cog(mosaicedFilePath_10m, shapefile, clippedFilePath_10m)
-    except Exception as e:
-        print(f"ClipRaster failed: {e}")
+    def mosaic_10m_stage():
+        print('Ready to mosaic 10m ' + ' and '.join(f'{sensor}mosaic' for sensor in sensors))
+        import MosaicL89S2
+        MosaicL89S2.mosaic_sensors_gdal(paths['mosaic_folder'], [os.path.basename(p) for p in sensor_mosaics],
+                                        os.path.basename(paths['mosaic_10m']))
+
+    #  clip mosaiced image by the shape file of the run, output COG
+    def clip_10m_stage():
+        print('Ready to clip 10m raster by ' + os.path.basename(config['clip_shapefile']))
+        import ClipRasterByShp
+        ClipRasterByShp.clip_raster_to_cog(paths['mosaic_10m'], config['clip_shapefile'], paths['clipped_10m'])
 
     # convert 10m COG to 10m ERDAS IMG
-    try:
+    def erdas_10m_stage():
         print('Ready to convert 10m COG raster to Erdas IMG')
-        ErdasConvert.convert_tiff_to_erdas(clippedFilePath_10m, output_erdas_path_10m)
-    except Exception as e:
-        print(f"Convert ERDAS IMG failed: {e}")
-
-    # ===========30m in-season crop map resample from 10m maps (resample, convert)==============
-    # define resampled and converted file names and pathes of 30m maps
-    resample30mCOG_name = f'{year}{month}CropMap30m.tif'
-    erdas_name30m = f'{year}{month}CropMap30m.img'
-    resample30mCOG_path = result_path + resample30mCOG_name
-    output_erdas_path30m = result_path + erdas_name30m
+        import ErdasConvert
+        ErdasConvert.convert_tiff_to_erdas(paths['clipped_10m'], paths['erdas_10m'])
 
     # resample 10m COG to 30m COG, output COG
-    try:
+    def resample_30m_stage():
         print('Ready to resample 10m COG raster to 30m')
-        ResampleTool.resample(clippedFilePath_10m,resample30mCOG_path,'COG',30)
-    except Exception as e:
-        print(f"Add color failed: {e}")
+        import ResampleTool
+        ResampleTool.resample(paths['clipped_10m'], paths['resampled_30m'], 'COG', 30)
 
     # convert 30m COG to 30m ERDAS IMG
-    try:
+    def erdas_30m_stage():
         print('Ready to convert 30m COG raster to Erdas IMG')
-        ErdasConvert.convert_tiff_to_erdas(resample30mCOG_path, output_erdas_path30m)
-    except Exception as e:
-        print(f"Convert ERDAS IMG failed: {e}")
-
-
-    # ===========Delete mosaiced files==============
-    l89_path = mosaicfolder_path + l89_name
-    s2_path = mosaicfolder_path + s2_name
-
-
-    # delete l89 mosaic image
-    try:
-        if os.path.exists(l89_path):
-            os.remove(l89_path)
-    except PermissionError:
-        print(f"Warning: Could not delete {l89_path} due to permission error.")
+        import ErdasConvert
+        ErdasConvert.convert_tiff_to_erdas(paths['resampled_30m'], paths['erdas_30m'])
+
+    # ===========Delete mosaiced files and downloaded tiles==============
+    def cleanup_local_stage():
+        # delete the sensor mosaic images
+        for path in sensor_mosaics:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except PermissionError:
+                print(f"Warning: Could not delete {path} due to permission error.")
+
+        # delete folders of the downloaded sensor classifications
+        for sensor in sensors:
+            tilePath = os.path.join(paths['root'], paths[f'{sensor}_tile_folder'])
+            print(f'{sensor} tilePath', tilePath)
+            try:
+                if os.path.exists(tilePath):
+                    shutil.rmtree(tilePath)
+            except PermissionError:
+                print(f"Warning: Could not delete {tilePath} due to permission error.")
 
+    # ===========Delete classifications from Google Drive==============
+    def cleanup_drive_stage():
+        time.sleep(30) # Wait for 30 seconds
+        print("Ready to delete files in Drive folder")
+        import DeleteDriveFiles
+        for sensor in sensors:
+            DeleteDriveFiles.delete_drive_files(paths[f'{sensor}_tile_folder'])
+
+    return [
+        StagePipeline.stage('classify', classify_stage, outputs=sensor_mosaics),
+        StagePipeline.stage('mosaic_10m', mosaic_10m_stage, inputs=sensor_mosaics, outputs=[paths['mosaic_10m']]),
+        StagePipeline.stage('clip_10m', clip_10m_stage, inputs=[paths['mosaic_10m'], config['clip_shapefile']],
+                            outputs=[paths['clipped_10m']]),
+        StagePipeline.stage('erdas_10m', erdas_10m_stage, inputs=[paths['clipped_10m']], outputs=[paths['erdas_10m']]),
+        StagePipeline.stage('resample_30m', resample_30m_stage, inputs=[paths['clipped_10m']],
+                            outputs=[paths['resampled_30m']]),
+        StagePipeline.stage('erdas_30m', erdas_30m_stage, inputs=[paths['resampled_30m']], outputs=[paths['erdas_30m']]),
+        StagePipeline.stage('cleanup_local', cleanup_local_stage, after=['erdas_10m', 'erdas_30m'],
+                            removes=sensor_mosaics, weight=0),
+        StagePipeline.stage('cleanup_drive', cleanup_drive_stage, after=['classify'], weight=0),
+    ]
+
+
+# run the stages of a configuration
+def run(config, argv=None):
+    """
+    Run, resume or force the stages of a run configuration.
+
+    Parameters:
+        config (dict): Run configuration (see `RunConfig.run_config`).
+        argv (list, optional): Stage command, e.g. `['run', 'resample_30m', 'erdas_30m']`
+            (see `StagePipeline.stage_cli`). Defaults to the command line.
+
+    Returns:
+        int: Exit code, 1 if any stage failed or was blocked.
+    """
+    paths = config['paths']
+    print(f"Run {config['name']}: {config['start_date']} to {config['end_date']} ({config['month']}), "
+          f"sensors {', '.join(config['sensors'])}")
+    for folder in [paths['root'], paths['mosaic_folder'], paths['result_folder']]:
+        os.makedirs(folder, exist_ok=True)
+    ScratchSpace.set_root(config['scratch_root'])
+    if config['cpus'] or config['memory_bytes']:
+        ResourceGovernor.set_limits(config['cpus'], config['memory_bytes'])
+
+    exit_code = StagePipeline.stage_cli(build_stages(config), paths['stage_manifest'], argv,
+                                        profile_folder=paths['profile_folder'])
+    ApiMetrics.print_summary()
+    Telemetry.write_report(paths['run_report'], paths['telemetry_textfile'], run=config['name'],
+                           year=config['year'], month=config['month'])
+    print(f"All in-season maps of {config['name']} in {config['month']} have been produced, "
+          f"please access data via path: {paths['result_folder']}")
+    return exit_code
 
-    # delete s2 mosaic image
-    try:
-        if os.path.exists(s2_path):
-            os.remove(s2_path)
-    except PermissionError:
-        print(f"Warning: Could not delete {s2_path} due to permission error.")
-        
 
-    # delete folder of download landsat 8/9 and sentinel-2 classifications 
-    L89tilePath = local_root_folder + L89tileFolder
-    S2tilePath = local_root_folder + S2tileFolder
-    print('L89tilePath,S2tilePath', L89tilePath,S2tilePath)  
-    try:
-        if os.path.exists(L89tilePath):
-            shutil.rmtree(L89tilePath)
-        if os.path.exists(S2tilePath):
-            shutil.rmtree(S2tilePath)
-    except PermissionError:
-        print(f"Warning: Could not delete {L89tilePath} or {S2tilePath} due to permission error.")
+if __name__ == '__main__':
 
+    # define the start time
+    start_time = datetime.now()
+    print(f"[{start_time}] Script started")
 
-    # ===========Delete classifications from Google Drive==============
-    time.sleep(30) # Wait for 30 seconds 
-    print("Ready to delete files in Drive folder")
-    DeleteDriveFiles.delete_drive_files(L89tileFolder)
-    DeleteDriveFiles.delete_drive_files(S2tileFolder)
-    print(f'All in-season maps in {month} have been produced, please access data via path: {result_path}')
+    # run, resume or force stages, e.g. `python AutoInseasonMapping.py --config Runs/Iowa.json run resample_30m`
+    config, stage_argv = RunConfig.config_from_args()
+    exit_code = run(config, stage_argv)
 
     # calculate and return elapsed time at the end of script running
     end_time = datetime.now()
@@ -270,3 +291,4 @@ if __name__ == '__main__':
     elapsed = end_time - start_time
     hh_mm_ss = str(elapsed).split('.')[0]
     print("Elapsed Time:", hh_mm_ss)
+    sys.exit(exit_code)
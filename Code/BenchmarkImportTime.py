@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+
+# modules imported by the driver process and by spawned pool workers, with their import budget in seconds
+IMPORT_BUDGETS = {
+    'AutoInseasonMapping': 0.3,
+    'LaunchRuns': 0.2,
+    'StagePipeline': 0.2,
+    'RunConfig': 0.1,
+}
+# heavy or side-effecting modules these imports must not load; the stages import them when they run
+HEAVY_MODULES = ('ee', 'osgeo', 'googleapiclient', 'google.oauth2', 'google_auth_oauthlib', 'numpy', 'sklearn',
+                 'TrustedPixel', 'TileEngine')
+# slowest nested imports listed per module
+TOP_IMPORTS = 8
+
+# folder of the pipeline modules
+CODE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+# one import in a fresh interpreter
+def import_profile(module):
+    """
+    Import `module` in a fresh interpreter with `-X importtime`.
+
+    Returns
+    -------
+    dict
+        'seconds' (cumulative import time of the module), 'heavy' (modules of
+        `HEAVY_MODULES` loaded by the import) and 'imports' (cumulative
+        seconds of every nested import, by name), or 'error' if the import
+        failed.
+    """
+    probe = (f"import sys, json; import {module}; "
+             f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([CODE_FOLDER, os.environ.get('PYTHONPATH', '')]))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], capture_output=True, text=True,
+                            cwd=CODE_FOLDER, env=env)
+    imports = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            imports[name.strip()] = int(cumulative) / 1e6
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed'}
+    return {'seconds': imports.get(module, 0.0), 'heavy': json.loads(result.stdout.strip().splitlines()[-1]),
+            'imports': imports}
+
+
+# import time of the pipeline modules
+def benchmark_imports(modules=None, repeat=5):
+    """
+    Measure the import time of modules and check that they load no heavy module.
+
+    Parameters
+    ----------
+    modules : dict, optional
+        Budget in seconds by module (default: `IMPORT_BUDGETS`).
+    repeat : int, optional
+        Fresh interpreters per module; the median is reported (default: 5).
+
+    Returns
+    -------
+    dict
+        Per module: 'seconds' (median), 'budget_seconds', 'heavy' modules
+        loaded, the slowest nested imports and 'ok', or 'error'.
+
+    Example
+    -------
+    >>> report = benchmark_imports({'AutoInseasonMapping': 0.3}, repeat=3)
+    """
+    report = {}
+    for module, budget in (modules or IMPORT_BUDGETS).items():
+        runs = [import_profile(module) for _ in range(repeat)]
+        failed = [run for run in runs if 'error' in run]
+        if failed:
+            report[module] = {'error': failed[0]['error'], 'ok': False}
+            print(f"[BENCH] import {module} failed: {failed[0]['error']}")
+            continue
+        seconds = statistics.median(run['seconds'] for run in runs)
+        heavy = runs[-1]['heavy']
+        nested = sorted(((name, t) for name, t in runs[-1]['imports'].items() if name != module),
+                        key=lambda item: -item[1])[:TOP_IMPORTS]
+        report[module] = {
+            'seconds': round(seconds, 4),
+            'budget_seconds': budget,
+            'heavy': heavy,
+            'slowest_imports': {name: round(t, 4) for name, t in nested},
+            'ok': seconds <= budget and not heavy,
+        }
+        print(f"[BENCH] import {module}: {seconds * 1000:.1f} ms (budget {budget * 1000:.0f} ms)"
+              + (f", loads {', '.join(heavy)}" if heavy else ''))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Guard the import time of the pipeline modules.')
+    parser.add_argument('modules', nargs='*', help='modules to check (default: all of IMPORT_BUDGETS)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help='budget factor, e.g. 2 on slow machines')
+    parser.add_argument('--report', default=None, help='JSON file the results are written to')
+    args = parser.parse_args()
+
+    unknown = set(args.modules) - set(IMPORT_BUDGETS)
+    if unknown:
+        parser.error(f"no import budget for {sorted(unknown)}, available: {sorted(IMPORT_BUDGETS)}")
+    budgets = {module: budget * args.scale for module, budget in IMPORT_BUDGETS.items()
+               if not args.modules or module in args.modules}
+    report = benchmark_imports(budgets, args.repeat)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"Import report saved to {args.report}")
+
+    failed = [module for module, result in report.items() if not result['ok']]
+    for module in failed:
+        result = report[module]
+        if 'error' in result:
+            print(f"[REGRESSION] import {module} failed: {result['error']}")
+        elif result['heavy']:
+            print(f"[REGRESSION] import {module} loads {', '.join(result['heavy'])}")
+        else:
+            print(f"[REGRESSION] import {module}: {result['seconds'] * 1000:.1f} ms over the "
+                  f"{result['budget_seconds'] * 1000:.0f} ms budget; slowest: "
+                  + ', '.join(f"{name} {t * 1000:.1f} ms" for name, t in list(result['slowest_imports'].items())[:3]))
+    sys.exit(1 if failed else 0)
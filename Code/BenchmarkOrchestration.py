@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from EESimulator import EESimulator
+
+
+# approximate number of tiles covering CONUS
+CONUS_L89_TILES = 470
+CONUS_S2_TILES = 1000
+
+
+# synthetic WRS [path, row] pairs
+def synthetic_wrs_tiles(n):
+    """Return `n` synthetic Landsat [path, row] pairs over the CONUS path/row range."""
+    return [[path, row] for path in range(10, 50) for row in range(25, 45)][:n]
+
+
+# synthetic MGRS tile names
+def synthetic_mgrs_tiles(n):
+    """Return `n` synthetic Sentinel-2 MGRS tile names over the CONUS UTM zones."""
+    letters = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
+    return [f"{zone}{band}{column}{row}" for zone in range(10, 20) for band in 'RSTU'
+            for column in letters[:6] for row in letters[:6]][:n]
+
+
+# simulated CONUS run of the tile engine
+def run_benchmark(workdir, l89_tiles=CONUS_L89_TILES, s2_tiles=CONUS_S2_TILES, max_active_tasks=None,
+                  download_workers=None, **simulator_options):
+    """
+    Run `TileEngine.run_tiles` against the offline Earth Engine simulator.
+
+    Parameters
+    ----------
+    workdir : str
+        Working folder holding the fake Drive, the local tiles and the report.
+    l89_tiles : int, optional
+        Number of simulated Landsat tiles (default: `CONUS_L89_TILES`).
+    s2_tiles : int, optional
+        Number of simulated Sentinel-2 tiles (default: `CONUS_S2_TILES`).
+    max_active_tasks : int, optional
+        Concurrent export budget (default: `TileEngine.MAX_ACTIVE_TASKS`).
+    download_workers : int, optional
+        Parallel downloads (default: `TileEngine.DOWNLOAD_WORKERS`).
+    **simulator_options
+        Options of `EESimulator` (time_scale, batch_slots, failure_rate, ...).
+
+    Returns
+    -------
+    dict
+        Wall time, simulated time, API-call counts and the engine statistics.
+
+    Notes
+    -----
+    - Local mosaicking is not part of the orchestration benchmark and is
+      replaced by a no-op; see the raster stage benchmarks for it.
+    """
+    sim = EESimulator(os.path.join(workdir, 'drive'), **simulator_options)
+    sim.install()
+
+    # pipeline modules bind to the simulated `ee` module from here on
+    import ee
+    import ApiMetrics
+    import DownloadTool
+    import MosaicMultiImg
+    import RetryPolicy
+    import TileEngine
+    from AutomatedL89Mapping import L89Profile
+    from AutomatedS2Mapping import S2Profile
+
+    sim.patch_drive(DownloadTool)
+    MosaicMultiImg.mosaicoutputVRT = lambda *args, **kwargs: None
+    backoff_delay = RetryPolicy.backoff_delay
+    RetryPolicy.backoff_delay = lambda attempt, *args, **kwargs: backoff_delay(attempt, *args, **kwargs) / sim.time_scale
+
+    profiles = [L89Profile(20, 'SimL89', 'SimL89.tif'), S2Profile(20, 'SimS2', 'SimS2.tif')]
+    profiles[0]['tileList'] = lambda boundary: synthetic_wrs_tiles(l89_tiles)
+    profiles[1]['tileList'] = lambda boundary: synthetic_mgrs_tiles(s2_tiles)
+
+    start_time = time.time()
+    stats = TileEngine.run_tiles(
+        profiles, '2025-05-01', 'Sim', ee.Geometry.Rectangle([-125, 24, -66, 50]), ee.Image('TrustedPixel'),
+        os.path.join(workdir, 'local') + os.sep, os.path.join(workdir, 'mosaic'),
+        max_active_tasks=max_active_tasks or TileEngine.MAX_ACTIVE_TASKS,
+        poll_interval=TileEngine.POLL_INTERVAL / sim.time_scale,
+        download_workers=download_workers or TileEngine.DOWNLOAD_WORKERS
+    )
+    wall_seconds = time.time() - start_time
+
+    tiles = l89_tiles + s2_tiles
+    return {
+        'tiles': tiles,
+        'wall_seconds': round(wall_seconds, 2),
+        'simulated_hours': round(wall_seconds * sim.time_scale / 3600, 2),
+        'api_calls': dict(sorted(sim.calls.items())),
+        'api_calls_per_tile': round(sum(n for call, n in sim.calls.items() if not call.endswith('_rate_limited'))
+                                    / max(tiles, 1), 2),
+        'sensors': {name: {k: v for k, v in s.items() if k != 'last_download'}
+                    for name, s in stats.items() if name not in ['failed_tiles', 'regions']},
+        'failed_tiles': len(stats['failed_tiles']),
+        'endpoints': {endpoint: {k: v for k, v in m.items() if k != 'buckets'}
+                      for endpoint, m in ApiMetrics.snapshot().items()},
+    }
+
+
+# command line entry point
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the tile scheduler against an offline Earth Engine simulator.')
+    parser.add_argument('--l89-tiles', type=int, default=CONUS_L89_TILES)
+    parser.add_argument('--s2-tiles', type=int, default=CONUS_S2_TILES)
+    parser.add_argument('--max-active-tasks', type=int, default=None)
+    parser.add_argument('--download-workers', type=int, default=None)
+    parser.add_argument('--time-scale', type=float, default=1000, help='simulated seconds per wall-clock second')
+    parser.add_argument('--batch-slots', type=int, default=20)
+    parser.add_argument('--queue-limit', type=int, default=3000)
+    parser.add_argument('--task-seconds', type=float, default=600)
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.01)
+    parser.add_argument('--null-rate', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help='working folder, a temporary folder by default')
+    parser.add_argument('--report', default=None, help='JSON file the report is written to')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='ee_sim_')
+    try:
+        report = run_benchmark(workdir, args.l89_tiles, args.s2_tiles, args.max_active_tasks, args.download_workers,
+                               time_scale=args.time_scale, batch_slots=args.batch_slots, queue_limit=args.queue_limit,
+                               task_seconds=args.task_seconds, failure_rate=args.failure_rate,
+                               rate_limit_rate=args.rate_limit_rate, null_rate=args.null_rate, seed=args.seed)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=1))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"Benchmark report saved to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import shutil
+import socket
+import argparse
+import statistics
+from datetime import datetime
+from osgeo import gdal
+import ClipRasterByShp
+import ColorTable
+import ColorTool
+import ErdasConvert
+import MosaicL89S2
+import MosaicMultiImg
+import RemapTable
+import RemapTool
+import ResampleTool
+import ScratchSpace
+import SyntheticRasters
+import Telemetry
+gdal.UseExceptions()
+
+
+# relative slowdown of a stage reported as a regression
+REGRESSION_THRESHOLD = 0.2
+# slowdowns below this many seconds are timing noise
+MIN_REGRESSION_SECONDS = 1.0
+
+
+# file names of the stage outputs
+L89_MOSAIC = 'L89_mosaic.tif'
+S2_MOSAIC = 'S2_mosaic.tif'
+MOSAIC_10M = 'L89S2_mosaic.tif'
+
+
+# the GDAL stages of the pipeline, in order, on the synthetic inputs
+def raster_stages(inputs, out):
+    """
+    Return the benchmarked stages as `(name, function, output)` tuples.
+
+    Parameters
+    ----------
+    inputs : dict
+        Synthetic inputs of `SyntheticRasters.generate_inputs`.
+    out : str
+        Output folder of the stages.
+
+    Returns
+    -------
+    list of tuple
+        Stages running on the outputs of the previous ones, like the
+        production driver: sensor mosaics, L89/S2 mosaic with color table,
+        remap, clip, color table COG, 30 m resample and ERDAS conversion.
+    """
+    s2_resolution = inputs['s2_resolution']
+    mosaic_10m = os.path.join(out, MOSAIC_10M)
+    clipped = os.path.join(out, 'clipped.tif')
+    colored = os.path.join(out, 'colored.tif')
+    resampled = os.path.join(out, 'resampled.tif')
+
+    # the color table COG is written in place, on a copy of the clipped map
+    def color():
+        shutil.copyfile(clipped, colored)
+        ColorTool.apply_color_table_as_new_cog(colored, ColorTable.color_table_Arc())
+
+    return [
+        ('mosaic_l89', lambda: MosaicMultiImg.mosaicoutputVRT(inputs['l89_folder'], out, L89_MOSAIC,
+                                                              resolution=inputs['l89_resolution']),
+         os.path.join(out, L89_MOSAIC)),
+        ('mosaic_s2', lambda: MosaicMultiImg.mosaicoutputVRT(inputs['s2_folder'], out, S2_MOSAIC,
+                                                             resolution=s2_resolution),
+         os.path.join(out, S2_MOSAIC)),
+        ('mosaic_l89_s2', lambda: MosaicL89S2.mosaic_L89_S2_gdal(out, L89_MOSAIC, S2_MOSAIC, MOSAIC_10M,
+                                                                 resolution=s2_resolution),
+         mosaic_10m),
+        ('remap', lambda: RemapTool.reset_pixel_values_to_cog(os.path.join(out, S2_MOSAIC), os.path.join(out, 'remapped.tif'),
+                                                              RemapTable.originalValueList(), RemapTable.resetValueList()),
+         os.path.join(out, 'remapped.tif')),
+        ('clip', lambda: ClipRasterByShp.clip_raster_to_cog(mosaic_10m, inputs['shapefile'], clipped), clipped),
+        ('color', color, colored),
+        ('resample', lambda: ResampleTool.resample(clipped, resampled, 'COG', 3 * s2_resolution), resampled),
+        ('erdas', lambda: ErdasConvert.convert_tiff_to_erdas(resampled, os.path.join(out, 'resampled.img')),
+         os.path.join(out, 'resampled.img')),
+    ]
+
+
+# time the stages at one scale
+def benchmark_scale(workdir, scale_name, coarsen=1, repeat=1, seed=0, shapefile=None, stages=None):
+    """
+    Generate (or reuse) the synthetic inputs of a scale and time every stage.
+
+    Parameters
+    ----------
+    workdir : str
+        Benchmark folder; inputs and outputs go to `<workdir>/<scale>/`.
+    scale_name : str
+        Key of `SyntheticRasters.SCALES`.
+    coarsen : int, optional
+        Pixel size factor of the synthetic inputs (default: 1).
+    repeat : int, optional
+        Runs of every stage; the median is reported (default: 1).
+    seed : int, optional
+        Landscape seed (default: 0).
+    shapefile : str, optional
+        Real CONUS shapefile cut to the extent (default: synthetic boundary).
+    stages : list of str, optional
+        Stages to time (default: all). Skipped stages still run once when a
+        later stage needs their output.
+
+    Returns
+    -------
+    dict
+        `{'inputs': {...}, 'stages': {stage: metrics}}` with the tile and pixel
+        counts of the inputs and, per stage, 'wall_seconds', 'cpu_seconds',
+        'peak_rss_bytes', 'read_bytes', 'written_bytes', 'output_bytes' and
+        'megapixels_per_second', or `{'error': message}` for a stage that
+        failed or wrote no output.
+    """
+    folder = os.path.join(workdir, scale_name)
+    inputs = SyntheticRasters.generate_inputs(os.path.join(folder, 'inputs'), scale_name, coarsen, seed, shapefile)
+    out = os.path.join(folder, 'outputs')
+    os.makedirs(out, exist_ok=True)
+    results = {}
+    for name, func, output in raster_stages(inputs, out):
+        timed = stages is None or name in stages
+        runs = repeat if timed else 1
+        measured = []
+        for run in range(runs):
+            if os.path.exists(output):
+                os.remove(output)
+            Telemetry.reset()
+            try:
+                with Telemetry.measure(name), ScratchSpace.stage(name):
+                    func()
+            except Exception as e:
+                results[name] = {'error': str(e)}
+                break
+            if not os.path.exists(output):
+                results[name] = {'error': 'no output written'}
+                break
+            # one stage per report: the run totals are those of the stage
+            report = Telemetry.run_report()
+            measured.append(dict(report, wall_seconds=report['stages'][name]['wall_seconds']))
+        if not timed or name in results:
+            continue
+        wall = statistics.median(m['wall_seconds'] for m in measured)
+        ds = gdal.Open(output)
+        megapixels = ds.RasterXSize * ds.RasterYSize / 1e6
+        ds = None
+        results[name] = {
+            'wall_seconds': round(wall, 3),
+            'cpu_seconds': round(statistics.median(m['cpu_seconds'] for m in measured), 3),
+            'peak_rss_bytes': max(m['peak_rss_bytes'] for m in measured),
+            'read_bytes': measured[-1]['read_bytes'],
+            'written_bytes': measured[-1]['written_bytes'],
+            'output_bytes': os.path.getsize(output),
+            'megapixels_per_second': round(megapixels / max(wall, 1e-9), 1),
+        }
+        print(f"[BENCH] {scale_name} {name}: {wall:.2f}s, {results[name]['megapixels_per_second']} Mpx/s")
+    return {'inputs': {k: inputs[k] for k in ['l89_tiles', 's2_tiles', 'pixels', 'l89_resolution', 's2_resolution']},
+            'stages': results}
+
+
+# compare results with a baseline
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD, min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    List the stages slower than the baseline by more than `threshold`.
+
+    Parameters
+    ----------
+    results, baseline : dict
+        Reports of `run_benchmarks`.
+    threshold : float, optional
+        Relative slowdown reported (default: `REGRESSION_THRESHOLD`).
+    min_seconds : float, optional
+        Smaller absolute slowdowns are ignored as noise (default: `MIN_REGRESSION_SECONDS`).
+
+    Returns
+    -------
+    list of dict
+        Regressions with scale, stage, baseline and current wall time and ratio;
+        stages that fail now but passed in the baseline are included as well.
+    """
+    regressions = []
+    for scale, current in results['scales'].items():
+        reference = baseline.get('scales', {}).get(scale)
+        if not reference or reference.get('coarsen', 1) != current.get('coarsen', 1):
+            continue
+        for stage, metrics in current['stages'].items():
+            base = reference['stages'].get(stage)
+            if not base or 'wall_seconds' not in base:
+                continue
+            if 'error' in metrics:
+                regressions.append({'scale': scale, 'stage': stage, 'error': metrics['error']})
+                continue
+            ratio = metrics['wall_seconds'] / max(base['wall_seconds'], 1e-9)
+            if ratio > 1 + threshold and metrics['wall_seconds'] - base['wall_seconds'] > min_seconds:
+                regressions.append({'scale': scale, 'stage': stage, 'baseline_seconds': base['wall_seconds'],
+                                    'wall_seconds': metrics['wall_seconds'], 'ratio': round(ratio, 2)})
+    return regressions
+
+
+# benchmark of several scales
+def run_benchmarks(workdir, scales, coarsen=1, repeat=1, seed=0, shapefile=None, stages=None):
+    """
+    Time the GDAL stages at several scales.
+
+    Returns
+    -------
+    dict
+        Report with the host, GDAL version, date and per-scale results,
+        usable as a baseline of later runs.
+
+    Example
+    -------
+    >>> report = run_benchmarks('/data/bench', ['state', 'region'], coarsen=4, repeat=3)
+    """
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'host': socket.gethostname(),
+        'cpus': os.cpu_count(),
+        'gdal': gdal.__version__,
+        'scales': {},
+    }
+    for scale_name in scales:
+        result = benchmark_scale(workdir, scale_name, coarsen, repeat, seed, shapefile, stages)
+        result['coarsen'] = coarsen
+        report['scales'][scale_name] = result
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the GDAL stages on synthetic CONUS rasters.')
+    parser.add_argument('workdir', help='folder of the synthetic inputs and stage outputs')
+    parser.add_argument('--scales', nargs='+', choices=sorted(SyntheticRasters.SCALES), default=['state'])
+    parser.add_argument('--stages', nargs='+', default=None, help='stages to time (default: all)')
+    parser.add_argument('--coarsen', type=int, default=1, help='pixel size factor, e.g. 4 for quick runs')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shapefile', default=None, help='real CONUS boundary shapefile (EPSG:5070)')
+    parser.add_argument('--baseline', default=None, help='JSON baseline to compare with')
+    parser.add_argument('--update-baseline', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--report', default=None, help='JSON file the results are written to')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.workdir, args.scales, args.coarsen, args.repeat, args.seed, args.shapefile, args.stages)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"Benchmark report saved to {args.report}")
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.threshold)
+        for r in regressions:
+            if 'error' in r:
+                print(f"[REGRESSION] {r['scale']} {r['stage']} failed: {r['error']}")
+            else:
+                print(f"[REGRESSION] {r['scale']} {r['stage']}: {r['wall_seconds']}s vs baseline "
+                      f"{r['baseline_seconds']}s ({r['ratio']}x)")
+        if not regressions:
+            print(f"No regression beyond {args.threshold:.0%} against {args.baseline}")
+    elif args.baseline:
+        # merge, so scales not run this time keep their baseline
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update({k: v for k, v in report.items() if k != 'scales'})
+        baseline.setdefault('scales', {}).update(report['scales'])
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,186 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from osgeo import gdal
+import ExportProfile
+import ResourceGovernor
+gdal.UseExceptions()
+
+
+# default processing block of the local NumPy stages
+BLOCK_SIZE = 2048
+# blocks submitted to a process pool per worker, so results never pile up in memory
+IN_FLIGHT_PER_WORKER = 2
+
+
+# block windows covering a raster
+def block_windows(xsize, ysize, block_size=BLOCK_SIZE):
+    """
+    Split a raster into processing windows.
+
+    Parameters
+    ----------
+    xsize, ysize : int
+        Raster size in pixels.
+    block_size : int, optional
+        Window edge in pixels (default: `BLOCK_SIZE`). Multiples of
+        `ExportProfile.LOCAL_BLOCK_SIZE` keep reads aligned to the internal
+        tiles of the COG outputs.
+
+    Returns
+    -------
+    list of tuple of int
+        `(xoff, yoff, xsize, ysize)` windows in row-major order; edge windows
+        are cut at the raster border.
+    """
+    return [(xoff, yoff, min(block_size, xsize - xoff), min(block_size, ysize - yoff))
+            for yoff in range(0, ysize, block_size)
+            for xoff in range(0, xsize, block_size)]
+
+
+# results of a process pool, with a bounded number of blocks in flight
+def bounded_map(pool, func, windows, workers, *args, in_flight_per_worker=IN_FLIGHT_PER_WORKER):
+    """
+    Run `func(window, *args)` for every window in a pool, yielding results as they complete.
+
+    Unlike `pool.map`, at most `workers * in_flight_per_worker` windows are
+    submitted at a time, so the finished blocks waiting to be written stay
+    within the memory budget the pool size was derived from (see
+    `ResourceGovernor.pool_workers`), whatever the raster size.
+
+    Parameters
+    ----------
+    pool : concurrent.futures.Executor
+        Process pool running the blocks.
+    func : callable
+        Block function, called as `func(window, *args)`.
+    windows : list of tuple of int
+        Processing windows (see `block_windows`).
+    workers : int
+        Worker processes of the pool.
+    *args
+        Further arguments of `func`, identical for every window.
+    in_flight_per_worker : int, optional
+        Windows submitted per worker (default: `IN_FLIGHT_PER_WORKER`).
+
+    Yields
+    ------
+    object
+        Return values of `func`, in completion order.
+
+    Example
+    -------
+    >>> for window, block in BlockRaster.bounded_map(pool, _filter_block, windows, workers):
+    ...     band.WriteArray(block, window[0], window[1])
+    """
+    limit = max(1, workers * in_flight_per_worker)
+    pending = set()
+    for window in windows:
+        if len(pending) >= limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(pool.submit(func, window, *args))
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+# pixel offset of a raster on a reference grid
+def grid_offset(reference_geotransform, geotransform):
+    """
+    Return the pixel offset of a raster relative to a reference grid.
+
+    Parameters
+    ----------
+    reference_geotransform : tuple
+        GDAL geotransform of the reference raster.
+    geotransform : tuple
+        GDAL geotransform of the raster to align.
+
+    Returns
+    -------
+    tuple of int
+        `(col, row)` of the reference origin in the raster's pixel grid.
+
+    Raises
+    ------
+    ValueError
+        If the rasters do not share the pixel size or their grids are not
+        aligned to whole pixels (warp them onto a common grid first).
+    """
+    pixel_x, pixel_y = reference_geotransform[1], reference_geotransform[5]
+    if abs(geotransform[1] - pixel_x) > 1e-6 or abs(geotransform[5] - pixel_y) > 1e-6:
+        raise ValueError(f"Pixel size {geotransform[1]} differs from the reference {pixel_x}.")
+    col = (reference_geotransform[0] - geotransform[0]) / pixel_x
+    row = (reference_geotransform[3] - geotransform[3]) / pixel_y
+    if abs(col - round(col)) > 1e-6 or abs(row - round(row)) > 1e-6:
+        raise ValueError("Raster grid is not aligned to the reference grid.")
+    return int(round(col)), int(round(row))
+
+
+# tiled GeoTIFF written block by block
+def create_block_target(path, reference_ds, bands=1, data_type=gdal.GDT_Byte, nodata=0):
+    """
+    Create a tiled, compressed GeoTIFF on the grid of a reference raster.
+
+    Parameters
+    ----------
+    path : str
+        Output file.
+    reference_ds : osgeo.gdal.Dataset
+        Raster providing size, geotransform and projection.
+    bands : int, optional
+        Number of bands (default: 1).
+    data_type : int, optional
+        GDAL data type (default: `gdal.GDT_Byte`).
+    nodata : int or None, optional
+        NoData value of every band (default: 0).
+
+    Returns
+    -------
+    osgeo.gdal.Dataset
+        Writable dataset; blocks are written with `WriteArray(array, xoff, yoff)`.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    ds = gdal.GetDriverByName('GTiff').Create(
+        path, reference_ds.RasterXSize, reference_ds.RasterYSize, bands, data_type,
+        options=['TILED=YES', f'BLOCKXSIZE={ExportProfile.LOCAL_BLOCK_SIZE}',
+                 f'BLOCKYSIZE={ExportProfile.LOCAL_BLOCK_SIZE}', 'COMPRESS=DEFLATE', 'BIGTIFF=IF_SAFER']
+    )
+    ds.SetGeoTransform(reference_ds.GetGeoTransform())
+    ds.SetProjection(reference_ds.GetProjection())
+    if nodata is not None:
+        for b in range(1, bands + 1):
+            ds.GetRasterBand(b).SetNoDataValue(nodata)
+    return ds
+
+
+# convert a block-written GeoTIFF into a COG
+def to_cog(source_path, output_path, compression='DEFLATE', remove_source=True):
+    """
+    Convert a GeoTIFF into a Cloud-Optimized GeoTIFF for class data.
+
+    Parameters
+    ----------
+    source_path : str
+        GeoTIFF written by `create_block_target`.
+    output_path : str
+        Output COG file.
+    compression : str, optional
+        COG compression (default: 'DEFLATE').
+    remove_source : bool, optional
+        Delete `source_path` afterwards (default: True).
+
+    Notes
+    -----
+    - Overviews use the mode, so they keep valid class values.
+    """
+    gdal.Translate(output_path, source_path, options=gdal.TranslateOptions(
+        format='COG',
+        creationOptions=[f'COMPRESS={compression}', f'BLOCKSIZE={ExportProfile.LOCAL_BLOCK_SIZE}',
+                         'RESAMPLING=MODE', 'BIGTIFF=IF_SAFER', f'NUM_THREADS={ResourceGovernor.num_threads()}']
+    ))
+    if remove_source:
+        os.remove(source_path)
+    print(f"COG written to: {output_path}")
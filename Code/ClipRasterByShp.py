@@ -1,4 +1,5 @@
 from osgeo import gdal
+import ResourceGovernor
 
 def clip_raster_to_cog(input_raster_path, shapefile_path, output_cog_path,
                        compression="LZW", nodata_value=0):
@@ -24,7 +25,8 @@ def clip_raster_to_cog(input_raster_path, shapefile_path, output_cog_path,
         - By default, uses `NearestNeighbour` resampling (recommended for categorical data).
         - For continuous data, consider using `GRA_Bilinear`.
         - Requires GDAL 3.1+ for direct COG output.
-        - Sets GDAL cache to 5 GB to optimize performance.
+        - GDAL cache, warp memory and threads follow the budget of the running
+          stage (`ResourceGovernor`).
 
     Example:
         clip_raster_to_cog(
@@ -35,8 +37,8 @@ def clip_raster_to_cog(input_raster_path, shapefile_path, output_cog_path,
     """
     
     gdal.UseExceptions()
-    # Set GDAL cache to 5 GB
-    gdal.SetCacheMax(5120 * 1024 * 1024)  # 5120 MB = 5 GB
+    # Size the GDAL cache from the stage budget
+    ResourceGovernor.apply_cache()
 
     # Determine nodata value if not provided
     if nodata_value is None:
@@ -54,7 +56,7 @@ def clip_raster_to_cog(input_raster_path, shapefile_path, output_cog_path,
     cog_creation_options = [
         f"COMPRESS={compression}",
         "BIGTIFF=YES",
-        "NUM_THREADS=ALL_CPUS",
+        f"NUM_THREADS={ResourceGovernor.num_threads()}",
         "BLOCKSIZE=1024"#,
         # "OPTIMIZE_SIZE=TRUE"
     ]
@@ -65,7 +67,10 @@ def clip_raster_to_cog(input_raster_path, shapefile_path, output_cog_path,
         cropToCutline=True,
         dstNodata=nodata_value,
         creationOptions=cog_creation_options,
-        resampleAlg=gdal.GRA_NearestNeighbour  # or GRA_Bilinear for continuous data
+        resampleAlg=gdal.GRA_NearestNeighbour,  # or GRA_Bilinear for continuous data
+        multithread=True,
+        warpMemoryLimit=ResourceGovernor.warp_memory(),
+        warpOptions=[f"NUM_THREADS={ResourceGovernor.num_threads()}"]
     )
 
     # conduct clip processing
@@ -1,5 +1,6 @@
 import os
 from osgeo import gdal
+import ScratchSpace
 
 
 #add color table to a Geotiff image
@@ -104,8 +105,8 @@ def apply_color_table_as_new_cog(input_output_tif, color_table_dict, nodata_val=
 
     Notes
     -----
-    - The process creates an intermediate temporary GeoTIFF (`temp_palette.tif`)
-      before writing the final COG.
+    - The process creates an intermediate temporary GeoTIFF in the scratch
+      space (`ScratchSpace.temp_path`) before writing the final COG.
     - The output COG is compressed using LZW.
     - The color table is applied only to the first raster band.
     - Uses nearest-neighbor resampling to preserve categorical raster values.
@@ -139,7 +140,7 @@ def apply_color_table_as_new_cog(input_output_tif, color_table_dict, nodata_val=
     print("Source data type:", src_ds.GetRasterBand(1).DataType)
 
     # Create intermediate palette-based GeoTIFF
-    temp_path = "temp_palette.tif"
+    temp_path = ScratchSpace.temp_path("palette.tif", xsize * ysize)
     driver = gdal.GetDriverByName("GTiff")
     dst_ds = driver.Create(temp_path, xsize, ysize, 1, gdal.GDT_Byte, ['PHOTOMETRIC=PALETTE'])
     dst_ds.SetGeoTransform(geotransform)
@@ -2,7 +2,9 @@ import os
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+import ApiMetrics
 import DownloadTool
+import Telemetry
 
 
 # Scope needed for full Drive access
@@ -73,7 +75,7 @@ def get_folder_id_by_name(service, folder_name):
     - Only non-trashed folders are considered.
     """
     query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-    results = service.files().list(q=query, fields="files(id, name)").execute()
+    results = ApiMetrics.execute(service.files().list(q=query, fields="files(id, name)"), 'drive.files.list')
     folders = results.get('files', [])
     if not folders:
         print(f"No folder named '{folder_name}' found.")
@@ -109,12 +111,13 @@ def delete_all_files_in_folder(service, folder_id):
     deleted_count = 0
     for file in files:
         try:
-            service.files().delete(fileId=file['id']).execute()
+            ApiMetrics.execute(service.files().delete(fileId=file['id']), 'drive.files.delete')
             deleted_count += 1
             print(f"Deleted: {file['name']}")
         except Exception as e:
             print(f"Failed to delete {file['name']}: {e}")
     
+    Telemetry.count('deleted_files', deleted_count)
     print(f'{deleted_count} files were deleted')
 
 
@@ -4,6 +4,8 @@ import time
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
+import ApiMetrics
+import ExportProfile
 
 
 # Access all files in a specific folder of Google Drive
@@ -33,13 +35,13 @@ def list_all_files_in_folder(service, folder_id):
     page_token = None
 
     while True:
-        response = service.files().list(
+        response = ApiMetrics.execute(service.files().list(
             q=query,
             spaces='drive',
             fields="nextPageToken, files(id, name)",
             pageSize=1000,
             pageToken=page_token
-        ).execute()
+        ), 'drive.files.list')
 
         files.extend(response.get('files', []))
         page_token = response.get('nextPageToken', None)
@@ -64,7 +66,7 @@ def list_all_files_recursive(service, folder_id):
     Returns
     -------
     list of dict
-        A list of file metadata dictionaries with `id`, `name`, and `mimeType` keys.
+        A list of file metadata dictionaries with `id`, `name`, `mimeType` and `size` keys.
 
     Notes
     -----
@@ -77,12 +79,12 @@ def list_all_files_recursive(service, folder_id):
     while stack:
         current_id = stack.pop()
         query = f"'{current_id}' in parents and trashed=false"
-        response = service.files().list(
+        response = ApiMetrics.execute(service.files().list(
             q=query,
             spaces='drive',
-            fields="files(id, name, mimeType)",
+            fields="files(id, name, mimeType, size)",
             pageSize=1000
-        ).execute()
+        ), 'drive.files.list')
 
         for f in response.get('files', []):
             if f['mimeType'] == 'application/vnd.google-apps.folder':
@@ -92,6 +94,147 @@ def list_all_files_recursive(service, folder_id):
     return all_files
 
 
+# build a Drive service object from the service account key
+def build_drive_service(service_account_file='key.json'):
+    """
+    Build an authenticated Google Drive API service object from a service account key.
+
+    Parameters
+    ----------
+    service_account_file : str, optional
+        Path to the service account JSON key (default: `key.json`).
+
+    Returns
+    -------
+    googleapiclient.discovery.Resource
+        Authenticated Google Drive API service object.
+
+    Notes
+    -----
+    - Service objects are not thread-safe; build one per download thread.
+    """
+    SCOPES = ['https://www.googleapis.com/auth/drive']
+    creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
+    return build('drive', 'v3', credentials=creds)
+
+
+# IDs of all Drive folders with a given name
+def folder_ids_by_name(service, folder_name):
+    """
+    Find the IDs of all non-trashed Google Drive folders with a given name.
+
+    Parameters
+    ----------
+    service : googleapiclient.discovery.Resource
+        Authenticated Google Drive API service object.
+    folder_name : str
+        Name of the folder (must be shared with the service account).
+
+    Returns
+    -------
+    list of str
+        Folder IDs, empty if no folder exists yet.
+    """
+    query = f"name = '{folder_name}' and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+    results = ApiMetrics.execute(service.files().list(q=query, pageSize=10, fields="files(id, name)"), 'drive.files.list')
+    return [f['id'] for f in results.get('files', [])]
+
+
+# download a single Drive file through a temporary .part file
+def download_file(service, file_obj, local_file_path):
+    """
+    Download a single Drive file into a local folder.
+
+    Parameters
+    ----------
+    service : googleapiclient.discovery.Resource
+        Authenticated Google Drive API service object.
+    file_obj : dict
+        File metadata with `id`, `name` and (optionally) `size` keys.
+    local_file_path : str
+        Local folder the file is saved to.
+
+    Returns
+    -------
+    int or None
+        Number of bytes downloaded, or None if an identical file
+        (same name and size) already exists locally.
+
+    Notes
+    -----
+    - The file is written as `<name>.part` and renamed when complete, so the
+      mosaic step never picks up a partially downloaded tile.
+    """
+    local_file_name = os.path.join(local_file_path, file_obj['name'])
+    if os.path.exists(local_file_name) and str(os.path.getsize(local_file_name)) == file_obj.get('size'):
+        return None
+
+    request = service.files().get_media(fileId=file_obj['id'])
+    part_file_name = local_file_name + '.part'
+    with io.FileIO(part_file_name, 'wb') as fh:
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while done is False:
+            status, done = ApiMetrics.next_chunk(downloader, fh)
+    os.replace(part_file_name, local_file_name)
+    return os.path.getsize(local_file_name)
+
+
+# download the files of one finished export task
+def download_export(service, folder_ids, description, local_file_path, attempts=6, wait=10):
+    """
+    Download all files (including shards) of a single finished export.
+
+    Parameters
+    ----------
+    service : googleapiclient.discovery.Resource
+        Authenticated Google Drive API service object.
+    folder_ids : list of str
+        IDs of the Drive folders the export was written to.
+    description : str
+        Export description, which is also the base name of the exported files.
+    local_file_path : str
+        Local folder the files are saved to.
+    attempts : int, optional
+        Number of listings before giving up, since files may appear on Drive
+        shortly after the export task is reported as completed (default: 6).
+    wait : float, optional
+        Seconds between two listings (default: 10).
+
+    Returns
+    -------
+    tuple of (list of str, int)
+        Names of the downloaded (or already present) files and the number
+        of downloaded bytes.
+
+    Raises
+    ------
+    RuntimeError
+        If no file, or an incomplete shard set, is found on Drive after
+        `attempts` listings, so the tile is reported as failed instead of
+        leaving a hole in the mosaic.
+    """
+    os.makedirs(local_file_path, exist_ok=True)
+    for attempt in range(1, attempts + 1):
+        files = []
+        for folder_id in folder_ids:
+            query = f"'{folder_id}' in parents and name contains '{description}' and trashed=false"
+            response = ApiMetrics.execute(service.files().list(q=query, spaces='drive', fields="files(id, name, size)",
+                                                               pageSize=1000), 'drive.files.list')
+            files.extend(f for f in response.get('files', []) if ExportProfile.tile_base_name(f['name']) == description)
+        if files and ExportProfile.shards_complete([f['name'] for f in files]):
+            break
+        if attempt == attempts:
+            found = ', '.join(sorted(f['name'] for f in files)) or 'no file'
+            raise RuntimeError(f"Export '{description}' incomplete on Drive after {attempts} listings: {found}")
+        time.sleep(wait)
+
+    downloaded_bytes = 0
+    for file_obj in files:
+        downloaded_bytes += download_file(service, file_obj, local_file_path) or 0
+    return [f['name'] for f in files], downloaded_bytes
+
+
 # create service account key in Google Cloud, download key .json, share downloadable folders to created service account
 def downloadfiles_byserviceaccout(target_name, local_folder):
     """
@@ -109,8 +252,8 @@ def downloadfiles_byserviceaccout(target_name, local_folder):
     1. Authenticate using a service account JSON key file.
     2. Search for the target folder in Google Drive.
     3. Create a local folder with the same name.
-    4. Recursively list all files in the Drive folder.
-    5. Download each file to the local folder.
+    4. Recursively list all files in the Drive folder and group shards by tile.
+    5. Download each file to the local folder, skipping files already downloaded.
 
     Notes
     -----
@@ -118,6 +261,10 @@ def downloadfiles_byserviceaccout(target_name, local_folder):
       `key.json`
     - The target Drive folder must be shared with the service account email.
     - Downloads are throttled by a `time.sleep(1)` delay to avoid API rate limits.
+    - Files are written as `<name>.part` and renamed when complete, so the mosaic
+      step never picks up a partially downloaded tile.
+    - Shards of a split export (`<description>-<row>-<col>.tif`) are downloaded
+      together and incomplete shard sets are reported.
 
     Important - Before program 
     Create a Google service account, download the JSON key, and share a Google Drive folder or file with the service account's email
@@ -165,22 +312,17 @@ def downloadfiles_byserviceaccout(target_name, local_folder):
     results [{'id': '1A2B3C...', 'name': 'SatelliteImages'}]
     Local_file_path /home/user/Downloads/SatelliteImages
     Files count: 5
+    Tiles count: 5
     1. image1.tif (1XyZ...)
-    Download 100%.
     ...
     5 files were downloaded to: /home/user/Downloads/SatelliteImages
     """
 
-    # Load your service account key
-    SERVICE_ACCOUNT_FILE = 'key.json'
-    SCOPES = ['https://www.googleapis.com/auth/drive']
-
-    creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-
-    drive_service = build('drive', 'v3', credentials=creds)
+    drive_service = build_drive_service()
 
     # List shared folders
-    results = drive_service.files().list(q=f"name = '{target_name}' and trashed = false", pageSize=10, fields="files(id, name)").execute()
+    results = ApiMetrics.execute(drive_service.files().list(q=f"name = '{target_name}' and trashed = false", pageSize=10,
+                                                            fields="files(id, name)"), 'drive.files.list')
     print('results',results.get('files'))
 
     # search and download each file in every folder
@@ -200,20 +342,23 @@ def downloadfiles_byserviceaccout(target_name, local_folder):
         if len(filesList) == 0:
              break
 
-        for i, file_obj in enumerate(filesList):
-                file_title = file_obj['name']
-                file_id = file_obj['id']
-                print(f"{i+1}. {file_title} ({file_id})")
-                local_file_name = os.path.join(local_file_path, file_title)
-
-                request = drive_service.files().get_media(fileId=file_id)
-                fh = io.FileIO(local_file_name, 'wb')
-                downloader = MediaIoBaseDownload(fh, request)
+        # keep the shards of each exported tile together
+        filesByName = {file_obj['name']: file_obj for file_obj in filesList}
+        tileShards = ExportProfile.group_shards(list(filesByName))
+        print('Tiles count:',len(tileShards))
+
+        i = 0
+        for tile_name, shard_names in tileShards.items():
+            if not ExportProfile.shards_complete(shard_names):
+                print(f"Warning: incomplete shard set for {tile_name}: {len(shard_names)} file(s).")
+            for file_title in shard_names:
+                file_obj = filesByName[file_title]
+                i += 1
+                print(f"{i}. {file_title} ({file_obj['id']})")
+                if download_file(drive_service, file_obj, local_file_path) is None:
+                    print(f"Already downloaded: {file_title}")
+                    continue
                 download_file_number += 1
-                done = False
-                while done is False:
-                    status, done = downloader.next_chunk()
-                    print(f"Download {int(status.progress() * 100)}%.")
                 time.sleep(1)
 
         print(f"{download_file_number} files were downloaded to: {local_file_path}")
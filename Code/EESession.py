@@ -0,0 +1,45 @@
+import threading
+
+
+# Earth Engine cloud project
+EE_PROJECT = 'project name'  # replace by your cloud project name
+
+# projects initialized in this process
+_initialized = set()
+_lock = threading.Lock()
+
+
+# authenticated and initialized Earth Engine client
+def initialize(project=None):
+    """
+    Authenticate and initialize Earth Engine once per process and project.
+
+    Importing the pipeline modules does not touch Earth Engine; stages (and
+    worker processes) that need it call this first, so processes that never
+    use Earth Engine, such as GDAL pool workers started with spawn or
+    forkserver, skip the authentication round-trip.
+
+    Parameters
+    ----------
+    project : str, optional
+        Cloud project (default: `EE_PROJECT`).
+
+    Returns
+    -------
+    module
+        The initialized `ee` module.
+
+    Example
+    -------
+    >>> ee = EESession.initialize('my-project')
+    >>> ee.Number(1).getInfo()
+    """
+    import ee
+    project = project or EE_PROJECT
+    with _lock:
+        if project not in _initialized:
+            # Trigger the authentication flow, reusing stored credentials.
+            ee.Authenticate()
+            ee.Initialize(project=project)
+            _initialized.add(project)
+    return ee
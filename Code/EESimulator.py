@@ -0,0 +1,339 @@
+import os
+import re
+import sys
+import time
+import heapq
+import random
+import shutil
+import threading
+import types
+
+
+# server-side tasks run concurrently per project (further tasks wait in READY)
+BATCH_SLOTS = 20
+# tasks accepted in the queue before `start` is refused
+QUEUE_LIMIT = 3000
+# median simulated duration of a tile export in seconds
+TASK_SECONDS = 600
+# simulated Drive download bandwidth in bytes per second
+DRIVE_BANDWIDTH = 50e6
+
+
+class EEException(Exception):
+    """Error raised by the simulated Earth Engine client."""
+
+
+# lazily built expression, evaluated only by getInfo
+class SimObject:
+    """
+    Node of a simulated Earth Engine expression graph.
+
+    Any attribute access or call builds a new node, so every part of the
+    `ee` API used by the pipeline (`ee.Image`, `ee.Filter.eq`, `.classify`,
+    `.remap`, ...) can be chained without a server. Only `getInfo` is
+    evaluated, by `EESimulator.evaluate`.
+    """
+
+    def __init__(self, sim, op, args=(), kwargs=None):
+        self._sim = sim
+        self._op = op
+        self._args = args
+        self._kwargs = kwargs or {}
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return SimObject(self._sim, name, (self,))
+
+    def __call__(self, *args, **kwargs):
+        return SimObject(self._sim, 'call', (self,) + args, kwargs)
+
+    def getInfo(self):
+        return self._sim.get_info(self)
+
+
+# simulated export task
+class SimTask:
+    """Export task with a simulated queue position, duration and outcome."""
+
+    def __init__(self, sim, kind, kwargs):
+        self._sim = sim
+        self.kind = kind
+        self.config = kwargs
+        self.description = kwargs.get('description', 'task')
+        self.begin = None
+        self.end = None
+        self.error = None
+        self.written = False
+
+    def start(self):
+        self._sim.start_task(self)
+
+    def status(self):
+        return self._sim.task_status(self)
+
+
+# fake Drive API service reading the simulated Drive folder
+class FakeDriveService:
+    """
+    Stand-in for the Drive v3 service object used by `DownloadTool`.
+
+    Supports the two listings of `DownloadTool`: folders by name, and files
+    of a folder whose name contains the export description.
+    """
+
+    def __init__(self, sim):
+        self._sim = sim
+        self._query = None
+
+    def files(self):
+        return self
+
+    def list(self, q='', **kwargs):
+        self._query = q
+        return self
+
+    def execute(self):
+        return self._sim.drive_list(self._query)
+
+
+class EESimulator:
+    """
+    Offline stand-in for the Earth Engine and Drive surface of the tile engine.
+
+    Parameters
+    ----------
+    drive_dir : str
+        Local folder playing the role of Google Drive.
+    time_scale : float, optional
+        Simulated seconds per wall-clock second (default: 1000).
+    batch_slots : int, optional
+        Tasks running concurrently on the server (default: `BATCH_SLOTS`).
+    queue_limit : int, optional
+        Maximum number of unfinished tasks (default: `QUEUE_LIMIT`).
+    task_seconds : float, optional
+        Median simulated task duration, log-normally distributed (default: `TASK_SECONDS`).
+    failure_rate : float, optional
+        Probability that a task fails (default: 0.02).
+    transient_share : float, optional
+        Share of task failures that are transient (default: 0.7).
+    rate_limit_rate : float, optional
+        Probability that a `getInfo` or `start` call is refused with a
+        "Too many concurrent requests" error (default: 0.01).
+    null_rate : float, optional
+        Probability that a conditional (`ee.Algorithms.If`) takes its null
+        branch, i.e. a tile without scenes or training samples (default: 0.02).
+    shard_rate : float, optional
+        Probability that an export is written as two shards (default: 0.05).
+    tile_bytes : int, optional
+        Size of each synthetic exported file (default: 64 kB).
+    drive_bandwidth : float, optional
+        Simulated download bandwidth in bytes per second (default: `DRIVE_BANDWIDTH`).
+    seed : int, optional
+        Seed of the random generator (default: 0).
+
+    Notes
+    -----
+    - Counts every simulated API call in `calls` (getInfo, task_start,
+      task_status, drive_list, drive_download, ...).
+    - Task durations and download times are divided by `time_scale`, so
+      a CONUS run of several hours is simulated in minutes.
+    """
+
+    def __init__(self, drive_dir, time_scale=1000, batch_slots=BATCH_SLOTS, queue_limit=QUEUE_LIMIT,
+                 task_seconds=TASK_SECONDS, failure_rate=0.02, transient_share=0.7, rate_limit_rate=0.01,
+                 null_rate=0.02, shard_rate=0.05, tile_bytes=65536, drive_bandwidth=DRIVE_BANDWIDTH, seed=0):
+        self.drive_dir = drive_dir
+        self.time_scale = time_scale
+        self.batch_slots = batch_slots
+        self.queue_limit = queue_limit
+        self.task_seconds = task_seconds
+        self.failure_rate = failure_rate
+        self.transient_share = transient_share
+        self.rate_limit_rate = rate_limit_rate
+        self.null_rate = null_rate
+        self.shard_rate = shard_rate
+        self.tile_bytes = tile_bytes
+        self.drive_bandwidth = drive_bandwidth
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.slots = [0.0] * batch_slots
+        self.unfinished = 0
+
+    # count one simulated API call
+    def count(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    # refuse a request with a rate-limit error
+    def maybe_rate_limit(self, name):
+        with self.lock:
+            refused = self.random.random() < self.rate_limit_rate
+        if refused:
+            self.count(name + '_rate_limited')
+            raise EEException('Too many concurrent requests, please retry later.')
+
+    # evaluate a value of the expression graph
+    def evaluate(self, value):
+        if isinstance(value, dict):
+            return {k: self.evaluate(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.evaluate(v) for v in value]
+        if not isinstance(value, SimObject):
+            return value
+        if value._op == 'If':
+            with self.lock:
+                true_branch = self.random.random() >= self.null_rate
+            return self.evaluate(value._args[1] if true_branch else value._args[2])
+        if value._op == 'Dictionary':
+            return self.evaluate(value._args[0]) if value._args else {}
+        if value._op == 'call' and value._args[0]._op == 'get':
+            target = self.evaluate(value._args[0]._args[0])
+            return target.get(value._args[1]) if isinstance(target, dict) else None
+        return None
+
+    # simulated getInfo request
+    def get_info(self, value):
+        self.count('getInfo')
+        self.maybe_rate_limit('getInfo')
+        return self.evaluate(value)
+
+    # queue a task on the simulated batch slots
+    def start_task(self, task):
+        self.count('task_start')
+        self.maybe_rate_limit('task_start')
+        with self.lock:
+            if self.unfinished >= self.queue_limit:
+                raise EEException(f'Too many tasks already in the queue ({self.queue_limit}). '
+                                  'Please wait for some of them to complete.')
+            now = time.time()
+            duration = self.random.lognormvariate(0, 0.5) * self.task_seconds / self.time_scale
+            task.begin = max(now, heapq.heappop(self.slots))
+            task.end = task.begin + duration
+            heapq.heappush(self.slots, task.end)
+            if self.random.random() < self.failure_rate:
+                task.error = ('Internal error.' if self.random.random() < self.transient_share
+                              else 'User memory limit exceeded.')
+            self.unfinished += 1
+
+    # state of a task at the current time
+    def task_status(self, task):
+        self.count('task_status')
+        now = time.time()
+        if task.begin is None:
+            return {'state': 'UNSUBMITTED', 'description': task.description}
+        if now < task.begin:
+            return {'state': 'READY', 'description': task.description}
+        if now < task.end:
+            return {'state': 'RUNNING', 'description': task.description}
+        with self.lock:
+            first_report = not task.written
+            task.written = True
+            if first_report:
+                self.unfinished -= 1
+        if task.error:
+            return {'state': 'FAILED', 'description': task.description, 'error_message': task.error}
+        if first_report:
+            self.write_export(task)
+        return {'state': 'COMPLETED', 'description': task.description}
+
+    # synthetic files of a finished export on the fake Drive
+    def write_export(self, task):
+        folder = os.path.join(self.drive_dir, task.config.get('folder') or '')
+        os.makedirs(folder, exist_ok=True)
+        with self.lock:
+            sharded = self.random.random() < self.shard_rate
+        names = ([f"{task.description}-0000000000-0000000000.tif", f"{task.description}-0000000000-0000032768.tif"]
+                 if sharded else [f"{task.description}.tif"])
+        for name in names:
+            with open(os.path.join(folder, name), 'wb') as f:
+                f.write(os.urandom(self.tile_bytes))
+
+    # files().list() of the fake Drive service
+    def drive_list(self, query):
+        self.count('drive_list')
+        name = re.search(r"name = '([^']*)'", query)
+        if name and 'folder' in query:
+            # folder lookup by name, the folder name is its ID
+            folder = name.group(1)
+            exists = os.path.isdir(os.path.join(self.drive_dir, folder))
+            return {'files': [{'id': folder, 'name': folder}] if exists else []}
+        parent = re.search(r"'([^']*)' in parents", query)
+        contains = re.search(r"name contains '([^']*)'", query)
+        folder = os.path.join(self.drive_dir, parent.group(1) if parent else '')
+        if not os.path.isdir(folder):
+            return {'files': []}
+        files = []
+        for file_name in sorted(os.listdir(folder)):
+            if contains is None or contains.group(1) in file_name:
+                files.append({'id': os.path.join(folder, file_name), 'name': file_name,
+                              'size': str(os.path.getsize(os.path.join(folder, file_name)))})
+        return {'files': files}
+
+    # copy a fake Drive file with the simulated bandwidth
+    def drive_download(self, service, file_obj, local_file_path):
+        self.count('drive_download')
+        local_file_name = os.path.join(local_file_path, file_obj['name'])
+        if os.path.exists(local_file_name) and str(os.path.getsize(local_file_name)) == file_obj.get('size'):
+            return None
+        size = int(file_obj.get('size') or 0)
+        time.sleep(size / self.drive_bandwidth / self.time_scale)
+        shutil.copyfile(file_obj['id'], local_file_name + '.part')
+        os.replace(local_file_name + '.part', local_file_name)
+        return size
+
+    # `ee` module backed by this simulator
+    def module(self):
+        """
+        Build a module object exposing the `ee` API surface used by the pipeline.
+
+        Returns
+        -------
+        types.ModuleType
+            Module with `Initialize`, `Authenticate`, `EEException`,
+            `Dictionary`, `Algorithms.If`, `batch.Export` and `data`; every
+            other attribute (`Image`, `ImageCollection`, `Filter`, ...) is a
+            lazily built `SimObject`.
+        """
+        sim = self
+        ee = types.ModuleType('ee')
+        ee.EEException = EEException
+        ee.Initialize = lambda *args, **kwargs: None
+        ee.Authenticate = lambda *args, **kwargs: None
+        ee.Dictionary = lambda *args, **kwargs: SimObject(sim, 'Dictionary', args, kwargs)
+        ee.Algorithms = types.SimpleNamespace(If=lambda *args: SimObject(sim, 'If', args))
+
+        def export(kind):
+            return lambda *args, **kwargs: SimTask(sim, kind, kwargs)
+
+        ee.batch = types.SimpleNamespace(Export=types.SimpleNamespace(
+            image=types.SimpleNamespace(toDrive=export('image.toDrive'), toAsset=export('image.toAsset')),
+            table=types.SimpleNamespace(toDrive=export('table.toDrive'), toAsset=export('table.toAsset')),
+            classifier=types.SimpleNamespace(toAsset=export('classifier.toAsset'))))
+        ee.data = types.SimpleNamespace(getInfo=lambda asset_id: None,
+                                        createAsset=lambda *args, **kwargs: None,
+                                        deleteAsset=lambda *args, **kwargs: None)
+        ee.__getattr__ = lambda name: SimObject(sim, name)
+        return ee
+
+    # replace the `ee` module before the pipeline modules are imported
+    def install(self):
+        """
+        Register the simulated `ee` module in `sys.modules`.
+
+        Must be called before `TileEngine` and the mapping modules are
+        imported, so that their `import ee` binds to the simulator.
+        """
+        sys.modules['ee'] = self.module()
+
+    # route DownloadTool to the fake Drive folder
+    def patch_drive(self, download_tool):
+        """
+        Point `DownloadTool` at the fake Drive folder.
+
+        The real listing and shard logic of `DownloadTool.download_export`
+        is kept; only the service and the file transfer are replaced.
+        """
+        download_tool.build_drive_service = lambda *args, **kwargs: FakeDriveService(self)
+        download_tool.download_file = self.drive_download
@@ -1,5 +1,6 @@
 # Processing - Erdas IMAGE convert
 from osgeo import gdal
+import ResourceGovernor
 gdal.UseExceptions()
 
 
@@ -23,7 +24,7 @@ def convert_tiff_to_erdas(input_tiff_path, output_erdas_path):
     - Uses the GDAL "HFA" driver for ERDAS Imagine format.
     - Copies all georeferencing, metadata, and raster bands from the source.
     - Applies compression to the output file (`COMPRESS=YES`).
-    - Sets the GDAL cache size to 5 GB for potentially faster processing.
+    - Sizes the GDAL cache from the budget of the running stage (`ResourceGovernor`).
 
     Raises
     ------
@@ -41,8 +42,8 @@ def convert_tiff_to_erdas(input_tiff_path, output_erdas_path):
     Conversion successful: input_satellite.tif converted to output_imagery.img
     """
     try:
-        # Set GDAL cache to 5 GB
-        gdal.SetCacheMax(5120 * 1024 * 1024)  # 5120 MB = 5 GB
+        # Size the GDAL cache from the stage budget
+        ResourceGovernor.apply_cache()
         # Open the input TIFF dataset
         src_ds = gdal.Open(input_tiff_path)
         if src_ds is None:
@@ -0,0 +1,169 @@
+import re
+
+
+# Export profiles for ee.batch.Export.image.toDrive
+# - 'GeoTIFF': Earth Engine defaults (plain GeoTIFF, native data type)
+# - 'COG_Byte': Cloud-Optimized GeoTIFF, uint8 with explicit NoData 0,
+#   shards and file dimensions aligned to the local processing block size
+EXPORT_PROFILES = {
+    'GeoTIFF': {
+        'uint8': False,
+        'cloudOptimized': False,
+        'noData': None,
+    },
+    'COG_Byte': {
+        'uint8': True,
+        'cloudOptimized': True,
+        'noData': 0,
+    },
+}
+
+# block size used by the local GDAL stages (RemapTool, COG outputs)
+LOCAL_BLOCK_SIZE = 512
+
+# largest file edge before Earth Engine splits a tile into several files
+MAX_FILE_DIMENSION = 32768
+
+# Earth Engine appends "-<row offset>-<col offset>" to split export files
+SHARD_PATTERN = re.compile(r'^(?P<base>.+)-(?P<row>\d{10})-(?P<col>\d{10})$')
+
+
+# export keyword arguments of a profile
+def export_options(profile='COG_Byte', block_size=LOCAL_BLOCK_SIZE):
+    """
+    Build the format keyword arguments of `ee.batch.Export.image.toDrive` for a profile.
+
+    Parameters
+    ----------
+    profile : str, optional
+        Name of the export profile in `EXPORT_PROFILES` (default: 'COG_Byte').
+    block_size : int, optional
+        Local processing block size in pixels (default: `LOCAL_BLOCK_SIZE`).
+        Used as `shardSize`, and `fileDimensions` is rounded down to a
+        multiple of it, so file splits never cut through a local block.
+
+    Returns
+    -------
+    dict
+        Keyword arguments to pass to `ee.batch.Export.image.toDrive`
+        in addition to image, description, folder, region, scale and crs.
+
+    Raises
+    ------
+    KeyError
+        If the profile name is unknown.
+
+    Example
+    -------
+    >>> export_options('COG_Byte')
+    {'fileFormat': 'GeoTIFF', 'shardSize': 512, 'fileDimensions': 32768, 'formatOptions': {'cloudOptimized': True, 'noData': 0}}
+    """
+    settings = EXPORT_PROFILES[profile]
+    if not settings['cloudOptimized'] and settings['noData'] is None:
+        return {}
+
+    format_options = {'cloudOptimized': settings['cloudOptimized']}
+    if settings['noData'] is not None:
+        format_options['noData'] = settings['noData']
+
+    return {
+        'fileFormat': 'GeoTIFF',
+        'shardSize': block_size,
+        'fileDimensions': (MAX_FILE_DIMENSION // block_size) * block_size,
+        'formatOptions': format_options,
+    }
+
+
+# cast classification to the profile's data type
+def prepare_image(image, profile='COG_Byte'):
+    """
+    Cast a classified ee.Image to the data type of an export profile.
+
+    Parameters
+    ----------
+    image : ee.Image
+        Classified image to export.
+    profile : str, optional
+        Name of the export profile in `EXPORT_PROFILES` (default: 'COG_Byte').
+
+    Returns
+    -------
+    ee.Image
+        The image cast to uint8 for Byte profiles, otherwise unchanged.
+    """
+    if EXPORT_PROFILES[profile]['uint8']:
+        return image.toUint8()
+    return image
+
+
+# tile name of an exported file, without shard offsets and extension
+def tile_base_name(file_name):
+    """
+    Return the export description an exported (possibly sharded) file belongs to.
+
+    Parameters
+    ----------
+    file_name : str
+        File name such as `July_15TVG_2025-08-01.tif` or
+        `July_15TVG_2025-08-01-0000000000-0000032768.tif`.
+
+    Returns
+    -------
+    str
+        The name without extension and shard offsets.
+    """
+    stem = file_name.rsplit('.', 1)[0]
+    match = SHARD_PATTERN.match(stem)
+    return match.group('base') if match else stem
+
+
+# group exported files by their tile
+def group_shards(file_names):
+    """
+    Group exported file names by tile, keeping the shards of a tile together.
+
+    Parameters
+    ----------
+    file_names : list of str
+        Exported file names (or paths ending with the file name).
+
+    Returns
+    -------
+    dict[str, list of str]
+        Mapping of tile base name to its sorted files.
+    """
+    tiles = {}
+    for name in sorted(file_names):
+        base = tile_base_name(name.replace('\\', '/').rsplit('/', 1)[-1])
+        tiles.setdefault(base, []).append(name)
+    return tiles
+
+
+# check whether all shards of a tile are present
+def shards_complete(file_names):
+    """
+    Check whether the shards of one tile form a complete row/column grid.
+
+    Earth Engine names shards by their pixel offsets, so a tile split into
+    R rows and C columns must have exactly R x C distinct offset pairs.
+
+    Parameters
+    ----------
+    file_names : list of str
+        Files of a single tile as returned by `group_shards`.
+
+    Returns
+    -------
+    bool
+        True for single-file tiles and for complete shard grids.
+    """
+    offsets = set()
+    for name in file_names:
+        stem = name.replace('\\', '/').rsplit('/', 1)[-1].rsplit('.', 1)[0]
+        match = SHARD_PATTERN.match(stem)
+        if match is None:
+            return len(file_names) == 1
+        offsets.add((match.group('row'), match.group('col')))
+    rows = {row for row, _ in offsets}
+    cols = {col for _, col in offsets}
+    return len(offsets) == len(rows) * len(cols) == len(file_names)
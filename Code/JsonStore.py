@@ -0,0 +1,66 @@
+import os
+import json
+import threading
+
+
+# cached file of a tile for a year
+def cache_path(cache_folder, year, tile_key):
+    """
+    Return the cache file of a tile for a year.
+
+    Parameters
+    ----------
+    cache_folder : str
+        Local root folder of the cache (training samples, footprints, ...).
+    year : int or str
+        Mapping year.
+    tile_key : str
+        Unique tile key (e.g. `L89_20_31` or `S2_15TVG`).
+
+    Returns
+    -------
+    str
+        Path `<cache_folder>/<year>/<tile_key>.json`.
+    """
+    return os.path.join(cache_folder, str(year), tile_key + '.json')
+
+
+# write a file atomically
+def write_text_atomic(path, text):
+    """
+    Write a text file through a temporary file renamed into place.
+
+    Readers (the next run, the node_exporter textfile collector, a status
+    poller) never see a partial file. The temporary file is unique per
+    process and thread, so concurrent writers of the same path, e.g. runs
+    sharing a cache, never clobber each other: the last complete file wins.
+
+    Parameters
+    ----------
+    path : str
+        Destination file; its folder is created if needed.
+    text : str
+        File content.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+# write a JSON file atomically
+def write_json_atomic(path, data, **dump_kwargs):
+    """
+    Write `data` as JSON through a temporary file renamed into place (see `write_text_atomic`).
+
+    Example
+    -------
+    >>> JsonStore.write_json_atomic(manifest_path, manifest, indent=1, sort_keys=True)
+    """
+    write_text_atomic(path, json.dumps(data, **dump_kwargs))
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+import ResourceGovernor
+import RunConfig
+
+
+# Earth Engine export tasks of all runs together (the per-user task queue, as `TileEngine.MAX_ACTIVE_TASKS`)
+TOTAL_ACTIVE_TASKS = 200
+# Drive download threads of all runs together
+TOTAL_DOWNLOAD_WORKERS = 8
+# runs going on at the same time
+PARALLEL_RUNS = 2
+
+# the in-season driver run for every configuration
+DRIVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AutoInseasonMapping.py')
+
+
+# share of the machine of one run
+def run_budget(parallel, total_tasks=TOTAL_ACTIVE_TASKS, total_downloads=TOTAL_DOWNLOAD_WORKERS):
+    """
+    Split the CPUs, memory, Earth Engine task queue and download threads
+    between `parallel` runs.
+
+    Returns
+    -------
+    dict
+        `cpus`, `memory_bytes`, `max_active_tasks` and `download_workers`
+        settings of one run (see `RunConfig.DEFAULTS`).
+    """
+    machine = ResourceGovernor.limits()
+    return {
+        'cpus': max(1, machine['cpus'] // parallel),
+        'memory_bytes': machine['memory_bytes'] // parallel,
+        'max_active_tasks': max(1, total_tasks // parallel),
+        'download_workers': max(1, total_downloads // parallel),
+    }
+
+
+# distinct progress ports of the runs
+def progress_ports(configs):
+    """
+    Return a progress port per run, unique across the runs.
+
+    A run keeps its configured `progress_port` unless an earlier run already
+    has it (e.g. the shared default 8765); such a run gets the next port not
+    configured or given to any other run. Runs without a port (None) keep
+    the endpoint disabled.
+
+    Example
+    -------
+    >>> progress_ports([{'progress_port': 8765}, {'progress_port': 8765}, {'progress_port': 8766}])
+    [8765, 8767, 8766]
+    """
+    configured = {config['progress_port'] for config in configs if config['progress_port']}
+    ports = [None] * len(configs)
+    taken = set()
+    for i, config in enumerate(configs):
+        if config['progress_port'] and config['progress_port'] not in taken:
+            ports[i] = config['progress_port']
+            taken.add(ports[i])
+    for i, config in enumerate(configs):
+        if config['progress_port'] and ports[i] is None:
+            port = config['progress_port'] + 1
+            while port in taken or port in configured:
+                port += 1
+            ports[i] = port
+            taken.add(port)
+    return ports
+
+
+# launch several runs side by side
+def launch_runs(config_paths, stage_argv=('run',), parallel=PARALLEL_RUNS, overrides=None,
+                total_tasks=TOTAL_ACTIVE_TASKS, total_downloads=TOTAL_DOWNLOAD_WORKERS):
+    """
+    Run the in-season driver for several configurations, at most `parallel` at a time.
+
+    Every run is a separate process with its own local folders, Drive
+    folders, telemetry, scratch space (see `RunConfig.run_paths`) and
+    progress port (see `progress_ports`). The
+    machine and the Earth Engine quota are shared under one budget: each
+    run gets `1 / parallel` of the CPUs, memory, export task queue and
+    download threads (see `run_budget`); further runs wait for a free slot.
+
+    Parameters
+    ----------
+    config_paths : list of str
+        JSON run configurations; run names must be unique.
+    stage_argv : list of str, optional
+        Stage command of every run (default: `['run']`, see `StagePipeline.stage_cli`).
+    parallel : int, optional
+        Runs going on at the same time (default: `PARALLEL_RUNS`).
+    overrides : dict, optional
+        Settings applied to every run, e.g. `{'month': 'June'}`.
+    total_tasks, total_downloads : int, optional
+        Earth Engine export tasks and download threads of all runs together.
+
+    Returns
+    -------
+    dict
+        Exit code of every run, by name (0: all stages done or skipped).
+
+    Raises
+    ------
+    ValueError
+        If two configurations have the same run name.
+
+    Example
+    -------
+    >>> launch_runs(['Runs/Iowa.json', 'Runs/Illinois.json', 'Runs/Nebraska.json'], parallel=2)
+    """
+    overrides = overrides or {}
+    configs = [RunConfig.load_config(path, **overrides) for path in config_paths]
+    names = [config['name'] for config in configs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Run names must be unique, got {duplicates} more than once.")
+
+    ports = progress_ports(configs)
+    budget = run_budget(parallel, total_tasks, total_downloads)
+    print(f"Launching {len(configs)} runs, {parallel} at a time, each with {budget['cpus']} CPUs, "
+          f"{budget['memory_bytes'] / 2**30:.1f} GB, {budget['max_active_tasks']} EE tasks and "
+          f"{budget['download_workers']} download threads")
+    slots = threading.Semaphore(parallel)
+    exit_codes = {}
+
+    # one run in its own process, logged next to its run report
+    def run_one(index, path, config):
+        settings = dict(budget)
+        if ports[index] != config['progress_port']:
+            print(f"Run {config['name']} serves its progress on port {ports[index]}, "
+                  f"{config['progress_port']} is used by another run")
+            settings['progress_port'] = ports[index]
+        command = [sys.executable, DRIVER, '--config', path]
+        for key, value in list(overrides.items()) + list(settings.items()):
+            command += ['--set', f'{key}={value if isinstance(value, str) else json.dumps(value)}']
+        command += list(stage_argv)
+        os.makedirs(config['paths']['root'], exist_ok=True)
+        log_path = os.path.join(config['paths']['root'], f"{config['year']}{config['month']}_launch.log")
+        with slots:
+            started = time.time()
+            print(f"[{datetime.now():%H:%M:%S}] Run {config['name']} started, log: {log_path}")
+            with open(log_path, 'a') as log:
+                exit_codes[config['name']] = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+            print(f"[{datetime.now():%H:%M:%S}] Run {config['name']} finished with exit code "
+                  f"{exit_codes[config['name']]} in {(time.time() - started) / 60:.1f} min")
+
+    threads = [threading.Thread(target=run_one, args=(i, path, config))
+               for i, (path, config) in enumerate(zip(config_paths, configs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return exit_codes
+
+
+if __name__ == '__main__':
+    # stage command of the runs after `--`, e.g. `-- force clip_10m`
+    argv = sys.argv[1:]
+    stage_argv = ['run']
+    if '--' in argv:
+        stage_argv = argv[argv.index('--') + 1:] or stage_argv
+        argv = argv[:argv.index('--')]
+
+    parser = argparse.ArgumentParser(description='Run several in-season mapping configurations side by side.',
+                                     epilog='Example: python LaunchRuns.py Runs/*.json --parallel 3 -- run')
+    parser.add_argument('configs', nargs='+', help='JSON run configurations')
+    parser.add_argument('--parallel', type=int, default=PARALLEL_RUNS, help='runs going on at the same time')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', type=RunConfig.parse_setting,
+                        help='override a run setting of every run')
+    parser.add_argument('--tasks', type=int, default=TOTAL_ACTIVE_TASKS, help='EE export tasks of all runs')
+    parser.add_argument('--downloads', type=int, default=TOTAL_DOWNLOAD_WORKERS, help='download threads of all runs')
+    args = parser.parse_args(argv)
+
+    exit_codes = launch_runs(args.configs, stage_argv, args.parallel, dict(args.set), args.tasks, args.downloads)
+    print('Run exit codes: ' + ', '.join(f'{name} {code}' for name, code in exit_codes.items()))
+    sys.exit(1 if any(exit_codes.values()) else 0)
@@ -0,0 +1,324 @@
+import os
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from osgeo import gdal
+import BlockRaster
+import MajorityFilter
+import RemapTool
+import ResourceGovernor
+gdal.UseExceptions()
+
+try:
+    from sklearn.ensemble import RandomForestClassifier
+except ImportError:  # optional dependency of the local engine only
+    RandomForestClassifier = None
+
+
+# training points per class, as in the Sentinel-2 profile
+NUM_POINTS = 1500
+# trees of the Random Forest, as in `TileEngine.classifyTile`
+NUM_TREES = 20
+
+# state of a classification worker process
+_worker = {}
+
+
+# trusted-pixel labels on the grid of a feature raster
+def aligned_labels(label_path, feature_ds):
+    """
+    Read the trusted-pixel labels warped onto the grid of a feature raster.
+
+    Parameters
+    ----------
+    label_path : str
+        Trusted-pixel label raster (e.g. from `LocalTrustedPixel`).
+    feature_ds : osgeo.gdal.Dataset
+        Feature raster of the tile.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 labels with the shape of the feature raster, NoData 0.
+    """
+    geotransform = feature_ds.GetGeoTransform()
+    xsize, ysize = feature_ds.RasterXSize, feature_ds.RasterYSize
+    bounds = (geotransform[0], geotransform[3] + geotransform[5] * ysize,
+              geotransform[0] + geotransform[1] * xsize, geotransform[3])
+    label_ds = gdal.Warp('', label_path, options=gdal.WarpOptions(
+        format='MEM', outputBounds=bounds, width=xsize, height=ysize,
+        dstSRS=feature_ds.GetProjection(), resampleAlg='near', dstNodata=0
+    ))
+    return label_ds.GetRasterBand(1).ReadAsArray()
+
+
+# valid feature vectors
+def valid_features(features, nodata_values):
+    """
+    Flag pixels whose features are finite and not NoData in every band.
+
+    Parameters
+    ----------
+    features : numpy.ndarray
+        Features of shape (pixels, bands).
+    nodata_values : list
+        NoData value of each band, or None.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean array of shape (pixels,).
+    """
+    valid = np.isfinite(features).all(axis=1)
+    for b, nodata in enumerate(nodata_values):
+        if nodata is not None:
+            valid &= features[:, b] != nodata
+    return valid
+
+
+# stratified training sample of a tile
+def stratified_sample(feature_path, label_path, num_points=NUM_POINTS, block_size=BlockRaster.BLOCK_SIZE, seed=0):
+    """
+    Draw a stratified training sample from a feature raster and the trusted-pixel labels.
+
+    Parameters
+    ----------
+    feature_path : str
+        Multi-band time-series feature raster of the tile.
+    label_path : str
+        Trusted-pixel label raster.
+    num_points : int, optional
+        Points per class (default: `NUM_POINTS`).
+    block_size : int, optional
+        Window edge used to read the features at the sample points.
+    seed : int, optional
+        Random seed (default: 0).
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Features of shape (samples, bands) and their class labels.
+
+    Notes
+    -----
+    - Twice `num_points` candidates are drawn per class, so classes keep
+      their full sample after candidates with NoData features are dropped.
+    - Features are only read in the blocks holding a sample point.
+    """
+    rng = np.random.default_rng(seed)
+    ds = gdal.Open(feature_path)
+    labels = aligned_labels(label_path, ds)
+    xsize = ds.RasterXSize
+    nodata_values = [ds.GetRasterBand(b + 1).GetNoDataValue() for b in range(ds.RasterCount)]
+
+    candidates = []
+    for value in np.unique(labels):
+        if value == 0:
+            continue
+        pixels = np.flatnonzero(labels == value)
+        candidates.append(rng.choice(pixels, size=min(pixels.size, 2 * num_points), replace=False))
+    if not candidates:
+        return np.empty((0, ds.RasterCount), dtype=np.float32), np.empty(0, dtype=np.uint8)
+    candidates = np.concatenate(candidates)
+    rows, cols = candidates // xsize, candidates % xsize
+
+    features = np.empty((candidates.size, ds.RasterCount), dtype=np.float32)
+    for xoff, yoff, bx, by in BlockRaster.block_windows(xsize, ds.RasterYSize, block_size):
+        inside = (cols >= xoff) & (cols < xoff + bx) & (rows >= yoff) & (rows < yoff + by)
+        if inside.any():
+            block = ds.ReadAsArray(xoff, yoff, bx, by).reshape(ds.RasterCount, by, bx)
+            features[inside] = block[:, rows[inside] - yoff, cols[inside] - xoff].T
+
+    classes = labels.ravel()[candidates]
+    keep = valid_features(features, nodata_values)
+    # first num_points valid candidates of every class
+    for value in np.unique(classes):
+        members = np.flatnonzero(keep & (classes == value))
+        keep[members[num_points:]] = False
+    return features[keep], classes[keep]
+
+
+# Random Forest matching Earth Engine's smileRandomForest defaults
+def train_classifier(features, classes, num_trees=NUM_TREES, seed=0):
+    """
+    Train a Random Forest on a training sample.
+
+    Parameters
+    ----------
+    features : numpy.ndarray
+        Features of shape (samples, bands).
+    classes : numpy.ndarray
+        Class labels.
+    num_trees : int, optional
+        Number of trees (default: `NUM_TREES`).
+    seed : int, optional
+        Random seed (default: 0).
+
+    Returns
+    -------
+    sklearn.ensemble.RandomForestClassifier
+        Trained classifier (square-root features per split and half-size
+        bags, as `ee.Classifier.smileRandomForest`).
+
+    Raises
+    ------
+    ImportError
+        If scikit-learn is not installed.
+    """
+    if RandomForestClassifier is None:
+        raise ImportError("scikit-learn is required for local classification (pip install scikit-learn).")
+    classifier = RandomForestClassifier(n_estimators=num_trees, max_features='sqrt', max_samples=0.5,
+                                        n_jobs=-1, random_state=seed)
+    classifier.fit(features, classes)
+    # one core per worker process during prediction
+    classifier.set_params(n_jobs=1)
+    return classifier
+
+
+# open the feature raster in a worker process
+def _init_worker(feature_path, classifier, lut):
+    ds = gdal.Open(feature_path)
+    _worker.update({
+        'ds': ds,
+        'classifier': classifier,
+        'lut': lut,
+        'nodata': [ds.GetRasterBand(b + 1).GetNoDataValue() for b in range(ds.RasterCount)],
+    })
+
+
+# classify and majority-filter one block
+def _classify_block(window):
+    ds = _worker['ds']
+    # one-pixel halo so the majority filter is seamless between blocks
+    read, pad = MajorityFilter.halo_window(window, ds.RasterXSize, ds.RasterYSize)
+    features = ds.ReadAsArray(*read).reshape(ds.RasterCount, -1).T
+    valid = valid_features(features, _worker['nodata'])
+    classes = np.zeros(features.shape[0], dtype=np.uint8)
+    if valid.any():
+        classes[valid] = _worker['classifier'].predict(features[valid])
+    classes = classes.reshape(read[3], read[2])
+    filtered = MajorityFilter.majority_3x3(np.pad(classes, pad, constant_values=0))
+    if _worker['lut'] is not None:
+        filtered = _worker['lut'][filtered]
+    return window, filtered
+
+
+# local classification of one tile
+def classify_tile(feature_path, label_path, output_path, num_points=NUM_POINTS, num_trees=NUM_TREES,
+                  block_size=BlockRaster.BLOCK_SIZE, workers=None, remap=True, seed=0):
+    """
+    Classify a tile feature raster locally, the way `TileEngine.classifyTile` does in Earth Engine.
+
+    Parameters
+    ----------
+    feature_path : str
+        Multi-band time-series feature raster of the tile (e.g. an export of
+        the `TileEngine.tileFeatures` image).
+    label_path : str
+        Trusted-pixel label raster (e.g. from `LocalTrustedPixel`).
+    output_path : str
+        Output classification COG.
+    num_points : int, optional
+        Training points per class (default: `NUM_POINTS`).
+    num_trees : int, optional
+        Number of trees (default: `NUM_TREES`).
+    block_size : int, optional
+        Classification window edge (default: `BlockRaster.BLOCK_SIZE`).
+    workers : int, optional
+        Worker processes (default: the budget of the running stage, see
+        `ResourceGovernor.pool_workers`).
+    remap : bool, optional
+        Apply the `RemapTable` class remap like the Earth Engine exports
+        (default: True).
+    seed : int, optional
+        Random seed of sampling and training (default: 0).
+
+    Returns
+    -------
+    str or None
+        `output_path`, or None if the tile has no training sample or only one
+        class (the local counterpart of a 'null' classification).
+
+    Notes
+    -----
+    - Blocks are classified in a process pool and smoothed by the 3x3
+      majority filter (`MajorityFilter`) with a one-pixel halo, matching
+      `focal_mode(radius=1)` without seams between blocks.
+    - The output is a uint8 COG with NoData 0 on the feature raster's grid,
+      so it can be mosaicked by `MosaicMultiImg.mosaicoutputVRT` together
+      with the Earth Engine tiles.
+    """
+    features, classes = stratified_sample(feature_path, label_path, num_points, block_size, seed)
+    if features.shape[0] == 0 or np.unique(classes).size < 2:
+        print(f"[SKIPPED] Not enough training samples for {feature_path}")
+        return None
+    classifier = train_classifier(features, classes, num_trees, seed)
+    lut = RemapTool.class_remap_lut() if remap else None
+
+    ds = gdal.Open(feature_path)
+    windows = BlockRaster.block_windows(ds.RasterXSize, ds.RasterYSize, block_size)
+    temp_path = output_path + '.tmp.tif'
+    target = BlockRaster.create_block_target(temp_path, ds)
+    band = target.GetRasterBand(1)
+    # a worker holds the float feature block of all bands and its class probabilities
+    workers = workers or ResourceGovernor.pool_workers(2 * ds.RasterCount * 8 * block_size ** 2)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(feature_path, classifier, lut)) as pool:
+        for window, block in BlockRaster.bounded_map(pool, _classify_block, windows, workers):
+            band.WriteArray(block, window[0], window[1])
+    band = None
+    target = None
+    ds = None
+    BlockRaster.to_cog(temp_path, output_path)
+    return output_path
+
+
+# local classification of a folder of tiles
+def classify_tiles(feature_folder, label_path, output_folder, **options):
+    """
+    Classify every feature raster of a folder with `classify_tile`.
+
+    Parameters
+    ----------
+    feature_folder : str
+        Folder of tile feature rasters (`*.tif`).
+    label_path : str
+        Trusted-pixel label raster.
+    output_folder : str
+        Folder of the classified tiles, ready for `MosaicMultiImg.mosaicoutputVRT`.
+    **options
+        Options passed to `classify_tile`.
+
+    Returns
+    -------
+    list of str
+        Classified tiles.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    outputs = []
+    for feature_path in sorted(glob.glob(os.path.join(feature_folder, '*.tif'))):
+        output_path = os.path.join(output_folder, os.path.basename(feature_path))
+        try:
+            if classify_tile(feature_path, label_path, output_path, **options):
+                outputs.append(output_path)
+        except Exception as e:
+            print(f"Something wrong during local classification of {feature_path}: {e}")
+    print(f"{len(outputs)} tiles classified locally.")
+    return outputs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Classify local tile feature rasters with trusted-pixel labels.')
+    parser.add_argument('feature_folder')
+    parser.add_argument('label_path')
+    parser.add_argument('output_folder')
+    parser.add_argument('--num-points', type=int, default=NUM_POINTS)
+    parser.add_argument('--num-trees', type=int, default=NUM_TREES)
+    parser.add_argument('--block-size', type=int, default=BlockRaster.BLOCK_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-remap', action='store_true')
+    args = parser.parse_args()
+    classify_tiles(args.feature_folder, args.label_path, args.output_folder, num_points=args.num_points,
+                   num_trees=args.num_trees, block_size=args.block_size, workers=args.workers,
+                   remap=not args.no_remap)
@@ -0,0 +1,253 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from osgeo import gdal
+import BlockRaster
+import ResourceGovernor
+gdal.UseExceptions()
+
+
+# file name of the national CDL rasters as distributed by USDA NASS
+CDL_PATTERN = '{year}_30m_cdls.tif'
+
+# rasters opened once per worker process
+_worker_sources = []
+
+
+# open the CDL rasters in a worker process
+def _init_worker(paths, use_mmap):
+    global _worker_sources
+    _worker_sources = []
+    for path, offset in paths:
+        ds = gdal.Open(path)
+        band = ds.GetRasterBand(1)
+        array = None
+        if use_mmap:
+            try:
+                # pages are mapped lazily, only the windows read are loaded
+                array = band.GetVirtualMemAutoArray(gdal.GF_Read)
+            except Exception:
+                array = None
+        _worker_sources.append({'ds': ds, 'band': band, 'array': array, 'offset': offset})
+
+
+# window of a source, zero outside its extent
+def read_aligned(source, window):
+    """
+    Read a reference-grid window from an aligned source raster.
+
+    Parameters
+    ----------
+    source : dict
+        Opened source with `band`, optional memory-mapped `array` and the
+        `offset` of the reference grid in the source (see `BlockRaster.grid_offset`).
+    window : tuple of int
+        `(xoff, yoff, xsize, ysize)` on the reference grid.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 block of shape (ysize, xsize); pixels outside the source are 0.
+    """
+    xoff, yoff, xsize, ysize = window
+    col0, row0 = xoff + source['offset'][0], yoff + source['offset'][1]
+    band = source['band']
+    block = np.zeros((ysize, xsize), dtype=np.uint8)
+    c0, r0 = max(col0, 0), max(row0, 0)
+    c1, r1 = min(col0 + xsize, band.XSize), min(row0 + ysize, band.YSize)
+    if c1 <= c0 or r1 <= r0:
+        return block
+    if source['array'] is not None:
+        data = source['array'][r0:r1, c0:c1]
+    else:
+        data = band.ReadAsArray(c0, r0, c1 - c0, r1 - r0)
+    block[r0 - row0:r1 - row0, c0 - col0:c1 - col0] = data
+    return block
+
+
+# CDL years of a trusted-pixel layer
+def cdl_years(year, gap):
+    """
+    Return the CDL years used for `year` with the year gap `gap`.
+
+    As in `TrustedPixel.trustedPixels`, the gap counts the mapping year
+    itself: gap 7 uses the past 6 CDL years.
+
+    Raises
+    ------
+    ValueError
+        If `gap` leaves no CDL year.
+
+    Example
+    -------
+    >>> cdl_years(2025, 7)
+    [2019, 2020, 2021, 2022, 2023, 2024]
+    """
+    if gap < 2:
+        raise ValueError(f"Year gap must be at least 2 to use a CDL year, got {gap}.")
+    return list(range(year - gap + 1, year))
+
+
+# per-pixel class consistency of the CDL years
+def consistent_labels(stack, min_agreement):
+    """
+    Keep the class of each pixel that is consistent over the CDL years.
+
+    Parameters
+    ----------
+    stack : numpy.ndarray
+        uint8 CDL classes of shape (years, rows, cols); 0 is NoData.
+    min_agreement : int
+        Minimum number of years with the same class.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 labels, the most frequent class where it occurs in at least
+        `min_agreement` years and is not NoData, otherwise 0.
+
+    Example
+    -------
+    >>> stack = np.array([[[1, 5, 24, 36]], [[1, 5, 24, 36]], [[1, 5, 24, 36]],
+    ...                   [[1, 5, 24, 37]], [[1, 5, 24, 37]], [[1, 1, 0, 37]]], dtype=np.uint8)
+    >>> consistent_labels(stack, 6)
+    array([[1, 0, 0, 0]], dtype=uint8)
+    >>> consistent_labels(stack, 5)
+    array([[ 1,  5, 24,  0]], dtype=uint8)
+    """
+    if min_agreement >= stack.shape[0]:
+        # all years agree: no counting needed
+        label = stack[0].copy()
+        label[(stack != stack[0]).any(axis=0)] = 0
+        return label
+    agreement = np.stack([(stack == stack[i]).sum(axis=0, dtype=np.uint8) for i in range(stack.shape[0])])
+    best = agreement.argmax(axis=0)
+    label = np.take_along_axis(stack, best[np.newaxis], axis=0)[0]
+    label[np.take_along_axis(agreement, best[np.newaxis], axis=0)[0] < min_agreement] = 0
+    return label
+
+
+# trusted labels and class counts of one block
+def _trusted_block(window, min_agreement):
+    stack = np.stack([read_aligned(source, window) for source in _worker_sources])
+    label = consistent_labels(stack, min_agreement)
+    valid = int((stack != 0).all(axis=0).sum())
+    return window, label, np.bincount(label.ravel(), minlength=256), valid
+
+
+# local trusted-pixel label raster
+def local_trusted_pixels(year, gap, cdl_folder, output_path, cdl_pattern=CDL_PATTERN, min_agreement=None,
+                         block_size=BlockRaster.BLOCK_SIZE, workers=None, use_mmap=False):
+    """
+    Compute the trusted-pixel label layer from local CDL rasters, block by block.
+
+    A pixel is trusted when its CDL class is consistent over the `gap - 1`
+    years before `year` (see `cdl_years`), mirroring
+    `TrustedPixel.trustedPixels(year, gap)` without Earth Engine.
+
+    Parameters
+    ----------
+    year : int
+        Mapping year; CDL years `year - gap + 1` to `year - 1` are used.
+    gap : int
+        Year gap, counting the mapping year (7: past 6 CDL years).
+    cdl_folder : str
+        Folder holding the CDL rasters.
+    output_path : str
+        Output label COG (uint8, band `cropland`, NoData 0).
+    cdl_pattern : str, optional
+        File name pattern of a CDL year (default: `CDL_PATTERN`).
+    min_agreement : int, optional
+        Minimum number of years with the same class (default: all `gap - 1` years).
+    block_size : int, optional
+        Processing window edge in pixels (default: `BlockRaster.BLOCK_SIZE`).
+    workers : int, optional
+        Worker processes (default: the budget of the running stage, see
+        `ResourceGovernor.pool_workers`).
+    use_mmap : bool, optional
+        Memory-map uncompressed CDL rasters instead of reading windows
+        (default: False). Falls back to windowed reads where GDAL cannot
+        map a raster.
+
+    Returns
+    -------
+    dict
+        Summary written next to the COG as `<output>.counts.json`: CDL years,
+        pixels with data in every year, trusted pixels and per-class counts.
+
+    Raises
+    ------
+    ValueError
+        If `gap` leaves no CDL year, or the CDL rasters do not share the
+        pixel size or grid.
+
+    Example
+    -------
+    >>> local_trusted_pixels(2025, 7, '/data/CDL', 'Results/TrustedPixel_2025_gap7.tif')
+    """
+    years = cdl_years(year, gap)
+    paths = [os.path.join(cdl_folder, cdl_pattern.format(year=y)) for y in years]
+    min_agreement = min_agreement or len(years)
+
+    # the latest CDL year defines the output grid
+    reference_ds = gdal.Open(paths[-1])
+    reference_geotransform = reference_ds.GetGeoTransform()
+    sources = []
+    for path in paths:
+        ds = gdal.Open(path)
+        sources.append((path, BlockRaster.grid_offset(reference_geotransform, ds.GetGeoTransform())))
+        ds = None
+
+    windows = BlockRaster.block_windows(reference_ds.RasterXSize, reference_ds.RasterYSize, block_size)
+    print(f"Computing trusted pixels {year} (gap {gap}) from {len(paths)} CDL years in {len(windows)} blocks.")
+
+    temp_path = output_path + '.tmp.tif'
+    target = BlockRaster.create_block_target(temp_path, reference_ds)
+    band = target.GetRasterBand(1)
+    band.SetDescription('cropland')
+    class_counts = np.zeros(256, dtype=np.int64)
+    valid_pixels = 0
+    # a worker holds one block of every CDL year and the agreement counts
+    workers = workers or ResourceGovernor.pool_workers(2 * len(paths) * block_size ** 2)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(sources, use_mmap)) as pool:
+        for window, label, counts, valid in BlockRaster.bounded_map(pool, _trusted_block, windows, workers,
+                                                                    min_agreement):
+            band.WriteArray(label, window[0], window[1])
+            class_counts += counts
+            valid_pixels += valid
+    band = None
+    target = None
+    reference_ds = None
+    BlockRaster.to_cog(temp_path, output_path)
+
+    summary = {
+        'year': year,
+        'gap': gap,
+        'cdl_years': years,
+        'min_agreement': min_agreement,
+        'valid_pixels': valid_pixels,
+        'trusted_pixels': int(class_counts[1:].sum()),
+        'class_counts': {str(c): int(n) for c, n in enumerate(class_counts) if c and n},
+    }
+    with open(output_path + '.counts.json', 'w') as f:
+        json.dump(summary, f, indent=1)
+    print(f"{summary['trusted_pixels']} of {valid_pixels} pixels trusted, counts saved to {output_path}.counts.json")
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compute trusted-pixel labels from local CDL rasters.')
+    parser.add_argument('year', type=int)
+    parser.add_argument('gap', type=int)
+    parser.add_argument('cdl_folder')
+    parser.add_argument('output_path')
+    parser.add_argument('--cdl-pattern', default=CDL_PATTERN)
+    parser.add_argument('--min-agreement', type=int, default=None)
+    parser.add_argument('--block-size', type=int, default=BlockRaster.BLOCK_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--mmap', action='store_true')
+    args = parser.parse_args()
+    local_trusted_pixels(args.year, args.gap, args.cdl_folder, args.output_path, args.cdl_pattern,
+                         args.min_agreement, args.block_size, args.workers, args.mmap)
@@ -0,0 +1,161 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from osgeo import gdal
+import BlockRaster
+import ResourceGovernor
+gdal.UseExceptions()
+
+# raster opened once per worker process
+_worker = {}
+
+
+# 3x3 majority of a block with a one-pixel halo
+def majority_3x3(block, nodata=0):
+    """
+    Apply a 3x3 majority (mode) filter to the interior of a block with a one-pixel halo.
+
+    Equivalent to Earth Engine's `focal_mode(radius=1, units='pixels',
+    kernelType='square')` on uint8 class data.
+
+    Parameters
+    ----------
+    block : numpy.ndarray
+        uint8 classes of shape (rows + 2, cols + 2); the outer ring holds the
+        neighbouring pixels (or `nodata` at the raster border).
+    nodata : int, optional
+        NoData value (default: 0). NoData neighbours do not vote and NoData
+        pixels stay NoData.
+
+    Returns
+    -------
+    numpy.ndarray
+        Filtered uint8 classes of shape (rows, cols).
+
+    Notes
+    -----
+    - Ties are resolved to the smallest class value.
+    - Fully vectorized: the 9 shifted views are compared pairwise, so the
+      cost does not depend on the number of classes.
+    """
+    rows, cols = block.shape[0] - 2, block.shape[1] - 2
+    window = np.stack([block[dy:dy + rows, dx:dx + cols] for dy in range(3) for dx in range(3)])
+    votes = np.zeros(window.shape, dtype=np.uint16)
+    for j in range(9):
+        votes += window == window[j]
+    votes[window == nodata] = 0
+    # most votes first, smaller class on ties
+    score = votes * 256 + (255 - window.astype(np.uint16))
+    best = score.argmax(axis=0)
+    result = np.take_along_axis(window, best[np.newaxis], axis=0)[0]
+    center = window[4]
+    result[center == nodata] = nodata
+    return result
+
+
+# 3x3 majority of a whole array
+def majority_filter(classes, nodata=0):
+    """
+    Apply the 3x3 majority filter to an array, treating pixels outside it as NoData.
+
+    Parameters
+    ----------
+    classes : numpy.ndarray
+        uint8 classes of shape (rows, cols).
+    nodata : int, optional
+        NoData value (default: 0).
+
+    Returns
+    -------
+    numpy.ndarray
+        Filtered uint8 classes of the same shape.
+    """
+    return majority_3x3(np.pad(classes, 1, constant_values=nodata), nodata)
+
+
+# read window with a one-pixel halo
+def halo_window(window, xsize, ysize):
+    """
+    Extend a block window by a one-pixel halo, cut at the raster border.
+
+    Parameters
+    ----------
+    window : tuple of int
+        `(xoff, yoff, xsize, ysize)` block window.
+    xsize, ysize : int
+        Raster size in pixels.
+
+    Returns
+    -------
+    tuple
+        `(xoff, yoff, xsize, ysize)` of the window to read, and the
+        `numpy.pad` widths completing it to a full halo at the raster border.
+    """
+    xoff, yoff, bx, by = window
+    x0, y0 = max(xoff - 1, 0), max(yoff - 1, 0)
+    x1, y1 = min(xoff + bx + 1, xsize), min(yoff + by + 1, ysize)
+    pad = ((1 - (yoff - y0), yoff + by + 1 - y1), (1 - (xoff - x0), xoff + bx + 1 - x1))
+    return (x0, y0, x1 - x0, y1 - y0), pad
+
+
+# open the class raster in a worker process
+def _init_worker(input_path, nodata):
+    ds = gdal.Open(input_path)
+    _worker.update({'ds': ds, 'band': ds.GetRasterBand(1), 'nodata': nodata})
+
+
+# filter one block, reading a one-pixel halo around it
+def _filter_block(window):
+    band = _worker['band']
+    nodata = _worker['nodata']
+    read, pad = halo_window(window, band.XSize, band.YSize)
+    # the halo is NoData only at the raster border
+    padded = np.pad(band.ReadAsArray(*read), pad, constant_values=nodata)
+    return window, majority_3x3(padded, nodata)
+
+
+# seam-aware majority filter of a mosaic
+def filter_raster(input_path, output_path=None, block_size=BlockRaster.BLOCK_SIZE, workers=None, nodata=0):
+    """
+    Apply the 3x3 majority filter to a whole class raster, block by block in parallel.
+
+    Each block is read with a one-pixel halo of its neighbours, so the
+    result is identical to filtering the raster in one piece. Applied to a
+    mosaic, pixels along tile seams are filtered with the pixels of the
+    neighbouring tile, which the per-tile `focal_mode` in Earth Engine cannot see.
+
+    Parameters
+    ----------
+    input_path : str
+        uint8 class raster, e.g. a mosaic of `MosaicMultiImg.mosaicoutputVRT`.
+    output_path : str, optional
+        Output GeoTIFF. Defaults to None, replacing `input_path`.
+    block_size : int, optional
+        Window edge in pixels (default: `BlockRaster.BLOCK_SIZE`).
+    workers : int, optional
+        Worker processes (default: the budget of the running stage, see
+        `ResourceGovernor.pool_workers`).
+    nodata : int, optional
+        NoData value (default: 0).
+
+    Example
+    -------
+    >>> filter_raster('Results/AutoInseasonS2_Mosaic/S2_Mosaic.tif')
+    Majority filter written to: Results/AutoInseasonS2_Mosaic/S2_Mosaic.tif
+    """
+    output_path = output_path or input_path
+    ds = gdal.Open(input_path)
+    windows = BlockRaster.block_windows(ds.RasterXSize, ds.RasterYSize, block_size)
+    temp_path = output_path + '.tmp.tif'
+    target = BlockRaster.create_block_target(temp_path, ds, nodata=nodata)
+    ds = None
+    band = target.GetRasterBand(1)
+    # the 9 shifted views, votes and scores of a block take ~64 bytes per pixel
+    workers = workers or ResourceGovernor.pool_workers(64 * block_size ** 2)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(input_path, nodata)) as pool:
+        for window, block in BlockRaster.bounded_map(pool, _filter_block, windows, workers):
+            band.WriteArray(block, window[0], window[1])
+    band = None
+    target = None
+    os.replace(temp_path, output_path)
+    print(f"Majority filter written to: {output_path}")
@@ -3,19 +3,23 @@ import os
 from osgeo import gdal
 import ColorTable
 import ColorTool
+import MosaicMultiImg
+import ResourceGovernor
+import ScratchSpace
 gdal.UseExceptions()
 
 
-def mosaic_L89_S2_gdal(output_path,L89name,S2name,mosaic_name):
+def mosaic_L89_S2_gdal(output_path,L89name,S2name,mosaic_name,resolution=10):
   """
   Mosaic Landsat 8/9 and Sentinel-2 classification rasters into a single GeoTIFF
   and apply a predefined color table.
 
   This function:
     1. Checks for the existence of the two input raster classification files.
-    2. Creates a virtual raster (VRT) mosaic from the two inputs with NoData set to 0.
+    2. Creates a virtual raster (VRT) mosaic from the two inputs with NoData set to 0,
+       snapping the 30 m Landsat mosaic onto the 10 m grid by nearest replication.
     3. Converts the VRT to a compressed, tiled GeoTIFF using multi-threaded writing.
-    4. Removes the temporary VRT file.
+    4. Removes the temporary VRT file (written to the scratch space, see `ScratchSpace`).
     5. Applies a predefined ArcGIS-style color table to the final mosaic.
 
   Parameters
@@ -28,6 +32,9 @@ def mosaic_L89_S2_gdal(output_path,L89name,S2name,mosaic_name):
       Filename of the Sentinel-2 classification raster (GeoTIFF format).
   mosaic_name : str
       Filename for the output mosaic GeoTIFF.
+  resolution : float, optional
+      Output pixel size of the mosaic (default: 10). Inputs of a coarser
+      integer-factor resolution are replicated on the fly.
 
   Raises
   ------
@@ -51,24 +58,42 @@ def mosaic_L89_S2_gdal(output_path,L89name,S2name,mosaic_name):
   ...     S2name="sentinel2_classified.tif",
   ...     mosaic_name="mosaic_L89_S2.tif"
   ... )
-  Mosaiced raster of L89 and S2 has been saved at /data/mosaics/mosaic_L89_S2.tif
+  Mosaiced raster of landsat89_classified.tif, sentinel2_classified.tif has been saved at /data/mosaics/mosaic_L89_S2.tif
   """
-  l89_path = os.path.join(output_path, L89name)
-  s2_path = os.path.join(output_path, S2name)
-  # print("l89s2 mosaiced images",l89_path,l89_path)
-  if not os.path.exists(l89_path) or not os.path.exists(s2_path):
-    raise FileNotFoundError("One or both classification TIFFs are missing. Mosaic step aborted.")
-
-  input_files = [
-      l89_path,
-      s2_path
-  ]
-
-  vrt_path = os.path.join(output_path, 'temp_mosaic.vrt')
+  mosaic_sensors_gdal(output_path, [L89name, S2name], mosaic_name, resolution)
+
+
+def mosaic_sensors_gdal(output_path,names,mosaic_name,resolution=10):
+  """
+  Mosaic the classification rasters of any sensors into one GeoTIFF with the color table.
+
+  Used by `mosaic_L89_S2_gdal`, and on its own by runs mapping a single sensor.
+
+  Parameters
+  ----------
+  output_path : str
+      Directory containing the input rasters and where the output mosaic will be saved.
+  names : list of str
+      Filenames of the sensor classification rasters; later rasters win where they overlap.
+  mosaic_name : str
+      Filename for the output mosaic GeoTIFF.
+  resolution : float, optional
+      Output pixel size of the mosaic (default: 10).
+
+  Raises
+  ------
+  FileNotFoundError
+      If one of the rasters is missing in the output_path.
+  """
+  input_files = [os.path.abspath(os.path.join(output_path, name)) for name in names]
+  if not all(os.path.exists(path) for path in input_files):
+    raise FileNotFoundError("One or more classification TIFFs are missing. Mosaic step aborted.")
+
+  vrt_path = ScratchSpace.temp_path('mosaic_sensors.vrt')
   mosaic_output = os.path.join(output_path, mosaic_name)
 
   # 1. Build virtual mosaic
-  vrt_options = gdal.BuildVRTOptions(srcNodata=0, VRTNodata=0)  # if 0 is NoData
+  vrt_options = MosaicMultiImg.snap_vrt_options(input_files, resolution)  # 0 is NoData
   gdal.BuildVRT(vrt_path, input_files, options=vrt_options)
 
   # 2. Translate VRT to GeoTIFF using parallel write
@@ -76,13 +101,13 @@ def mosaic_L89_S2_gdal(output_path,L89name,S2name,mosaic_name):
       'TILED=YES',
       'COMPRESS=LZW',
       'BIGTIFF=YES',
-      'NUM_THREADS=ALL_CPUS'
+      f'NUM_THREADS={ResourceGovernor.num_threads()}'
   ])
   gdal.Translate(mosaic_output, vrt_path, options=translate_options)
-  print(f'Mosaiced raster of L89 and S2 has been saved at {mosaic_output}')
+  print(f'Mosaiced raster of {", ".join(names)} has been saved at {mosaic_output}')
   # 3. Cleanup
   os.remove(vrt_path)
 
   # 4. Color table
   color_table = ColorTable.color_table_Arc()
-  ColorTool.add_color_table(mosaic_output,color_table)
\ No newline at end of file
+  ColorTool.add_color_table(mosaic_output,color_table)
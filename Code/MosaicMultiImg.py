@@ -1,11 +1,93 @@
 import glob
+import math
 import os
+import xml.etree.ElementTree as ET
 from osgeo import gdal
+import ExportProfile
+import ResourceGovernor
+import ScratchSpace
 gdal.UseExceptions()
 
 
+# VRT options snapping sources onto a common grid
+def snap_vrt_options(tif_files, resolution):
+    """
+    Build VRT options that place all sources on a common aligned grid.
+
+    Sources whose pixel size differs from `resolution` by an integer factor
+    (e.g. 30 m Landsat tiles on a 10 m grid) are replicated or decimated with
+    nearest-neighbour sampling while GDAL reads the VRT, so no resampled copy
+    of the tiles is ever written to disk.
+
+    Parameters
+    ----------
+    tif_files : list of str
+        Source rasters of the virtual mosaic.
+    resolution : float or None
+        Target pixel size in the units of the source CRS. If None, GDAL's
+        default resolution handling is kept.
+
+    Returns
+    -------
+    osgeo.gdal.BuildVRTOptions
+        Options for `gdal.BuildVRT` with NoData set to 0.
+
+    Notes
+    -----
+    - A warning is printed for sources that are not an integer factor of the
+      target resolution or whose origin is not aligned to the target grid,
+      because their pixels would not be replicated exactly.
+    """
+    if resolution is None:
+        return gdal.BuildVRTOptions(srcNodata=0, VRTNodata=0)
+
+    for tif in tif_files:
+        ds = gdal.Open(tif)
+        geotransform = ds.GetGeoTransform()
+        ds = None
+        source_res = abs(geotransform[1])
+        factor = max(source_res, resolution) / min(source_res, resolution)
+        if abs(factor - round(factor)) > 1e-6:
+            print(f"Warning: {tif} pixel size {source_res} is not an integer factor of {resolution}.")
+        elif any(abs(math.remainder(origin, resolution)) > 1e-6 for origin in (geotransform[0], geotransform[3])):
+            print(f"Warning: {tif} is not aligned to the {resolution} grid.")
+
+    return gdal.BuildVRTOptions(srcNodata=0, VRTNodata=0,
+                                xRes=resolution, yRes=resolution,
+                                targetAlignedPixels=True,
+                                resampleAlg='nearest')
+
+
+# apply a class LUT while GDAL reads the VRT
+def add_vrt_lut(vrt_path, lut):
+    """
+    Attach a lookup table to every source of a VRT.
+
+    GDAL applies the `<LUT>` of a `ComplexSource` while reading the source,
+    so the translated mosaic is remapped in the same pass, without writing
+    or reading the tiles a second time.
+
+    Parameters
+    ----------
+    vrt_path : str
+        VRT written by `gdal.BuildVRT`, rewritten in place.
+    lut : sequence of int
+        256-entry class LUT (see `RemapTool.class_remap_lut`). Every input
+        value is listed, so GDAL's linear interpolation between LUT entries
+        never applies to integer class codes.
+    """
+    lut_text = ','.join(f'{value}:{int(mapped)}' for value, mapped in enumerate(lut))
+    tree = ET.parse(vrt_path)
+    for band in tree.getroot().iter('VRTRasterBand'):
+        for source in list(band):
+            if source.tag in ('SimpleSource', 'ComplexSource'):
+                source.tag = 'ComplexSource'
+                ET.SubElement(source, 'LUT').text = lut_text
+    tree.write(vrt_path)
+
+
 # Function - S2 mosaic
-def mosaicoutputVRT(inputfolder_path,outputfolder_path,file_name):
+def mosaicoutputVRT(inputfolder_path,outputfolder_path,file_name,resolution=None,lut=None):
     """
     Mosaics multiple GeoTIFF files from a specified input folder into a single GeoTIFF.
 
@@ -23,11 +105,21 @@ def mosaicoutputVRT(inputfolder_path,outputfolder_path,file_name):
         The folder will be created if it does not exist.
     file_name : str
         Name of the output GeoTIFF file (including `.tif` extension).
+    resolution : float, optional
+        Output pixel size. If given, all tiles are snapped onto an aligned grid
+        of this size with nearest-neighbour sampling (see `snap_vrt_options`).
+        Defaults to None (GDAL's default resolution handling).
+    lut : sequence of int, optional
+        256-entry class LUT applied while the tiles are read (see
+        `add_vrt_lut`), e.g. to remap raw class codes exported without the
+        server-side remap. Defaults to None.
 
     Processing Steps
     ----------------
-    1. Search the `inputfolder_path` for all `.tif` files.
-    2. Build a temporary `.vrt` mosaic using `gdal.BuildVRT` with `srcNodata=0`.
+    1. Search the `inputfolder_path` for all `.tif` files and register the
+       shards of split exports as one tile (incomplete shard sets are reported).
+    2. Build a temporary `.vrt` mosaic in the scratch space (`ScratchSpace`)
+       using `gdal.BuildVRT` with `srcNodata=0`.
     3. Translate the `.vrt` to a GeoTIFF with:
        - LZW compression
        - Internal tiling
@@ -66,15 +158,28 @@ def mosaicoutputVRT(inputfolder_path,outputfolder_path,file_name):
         print("No .tif files found.")
         return
 
-    # Create temporary VRT (Virtual Raster Tile)
-    vrt_path = os.path.join(inputfolder_path, "temp_mosaic.vrt")
-    vrt_options = gdal.BuildVRTOptions(srcNodata=0, VRTNodata=0)
+    # Register shards of the same exported tile together
+    tiles = ExportProfile.group_shards(tif_files)
+    for tile_name, shard_files in tiles.items():
+        if not ExportProfile.shards_complete(shard_files):
+            print(f"Warning: incomplete shard set for {tile_name}: {len(shard_files)} file(s).")
+    tif_files = [shard for shard_files in tiles.values() for shard in shard_files]
+    print(f"Registered {len(tiles)} tiles for mosaicking.")
+
+    # Create temporary VRT (Virtual Raster Tile); absolute source paths, as it lives in the scratch space
+    tif_files = [os.path.abspath(tif) for tif in tif_files]
+    vrt_path = ScratchSpace.temp_path("mosaic.vrt")
+    vrt_options = snap_vrt_options(tif_files, resolution)
     vrt = gdal.BuildVRT(vrt_path, tif_files, options=vrt_options)
     if vrt is None:
         print("VRT build failed.")
         return
     vrt = None  # Close the VRT handle
 
+    # Remap class codes while the VRT is read
+    if lut is not None:
+        add_vrt_lut(vrt_path, lut)
+
     # Define output mosaic path
     # outputfolder_path = os.path.join('/content/drive/MyDrive', outputfolder)
     os.makedirs(outputfolder_path, exist_ok=True)
@@ -87,7 +192,7 @@ def mosaicoutputVRT(inputfolder_path,outputfolder_path,file_name):
             'TILED=YES',
             'COMPRESS=LZW',
             'BIGTIFF=YES',  # Use for large outputs
-            'NUM_THREADS=ALL_CPUS'
+            f'NUM_THREADS={ResourceGovernor.num_threads()}'
         ]
     )
     gdal.Translate(out_fp, vrt_path, options=translate_options)
@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import JsonStore
+
+
+# states of a tile, in pipeline order
+STATES = ('queued', 'submitted', 'running', 'exported', 'downloaded', 'mosaicked')
+# states a tile leaves the pipeline in early
+END_STATES = ('reused', 'skipped', 'failed')
+# seconds of history used for rates and ETA
+RATE_WINDOW = 1800
+# seconds between two writes of the status file
+REFRESH_INTERVAL = 15
+
+# stage waiting on each backlog state, used to name the bottleneck
+WAITING_ON = {'submitted': 'Earth Engine', 'running': 'Earth Engine', 'exported': 'Drive download',
+              'downloaded': 'local mosaic'}
+
+
+# live progress of the tiles of a run
+class ProgressTracker:
+    """
+    Track every tile through submitted -> running -> exported -> downloaded -> mosaicked.
+
+    Tiles leave the pipeline early as 'reused' (restored from the archive and
+    only mosaicked), 'skipped' (no classification) or 'failed'. Throughput
+    and ETA are computed from the transitions seen in the last `RATE_WINDOW`
+    seconds. The status is written periodically as JSON and can be served on
+    a local HTTP port.
+
+    Parameters
+    ----------
+    status_path : str, optional
+        JSON status file refreshed every `refresh` seconds. Defaults to None.
+    port : int, optional
+        Local port of the status endpoint (`http://127.0.0.1:<port>/`, JSON
+        at `/status.json`). Defaults to None (no server).
+    refresh : float, optional
+        Seconds between two writes of the status file (default: `REFRESH_INTERVAL`).
+
+    Example
+    -------
+    >>> progress = ProgressTracker('Results/2025July_progress.json', port=8765)
+    >>> progress.start()
+    >>> TileEngine.run_tiles(..., progress=progress)
+    >>> progress.stop()
+    """
+
+    def __init__(self, status_path=None, port=None, refresh=REFRESH_INTERVAL):
+        self.status_path = status_path
+        self.port = port
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.tiles = {}
+        self.transitions = deque()
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self.writer = None
+        self.server = None
+
+    # register the tiles of a sensor
+    def add_tiles(self, sensor, tile_keys):
+        with self.lock:
+            for key in tile_keys:
+                self.tiles[(sensor, key)] = {'state': 'queued', 'since': time.time(), 'attempts': 0}
+
+    # move a tile to a new state
+    def update(self, sensor, tile_key, state):
+        """
+        Record the transition of a tile to `state` (one of `STATES` or `END_STATES`).
+
+        Moving back to 'queued' (a resubmission) counts an attempt.
+        """
+        now = time.time()
+        with self.lock:
+            tile = self.tiles.setdefault((sensor, tile_key), {'state': 'queued', 'since': now, 'attempts': 0})
+            if tile['state'] == state:
+                return
+            if state == 'queued':
+                tile['attempts'] += 1
+            tile['state'] = state
+            tile['since'] = now
+            self.transitions.append((now, sensor, state))
+            # history older than the rate window is not needed
+            while self.transitions and self.transitions[0][0] < now - RATE_WINDOW:
+                self.transitions.popleft()
+
+    # move all tiles of a sensor in one state to another
+    def update_all(self, sensor, from_states, state):
+        with self.lock:
+            keys = [key for (s, key), tile in self.tiles.items() if s == sensor and tile['state'] in from_states]
+        for key in keys:
+            self.update(sensor, key, state)
+
+    # progress of all sensors
+    def snapshot(self):
+        """
+        Return the progress of the run.
+
+        Returns
+        -------
+        dict
+            Per sensor: tiles per state, throughput per state (tiles/hour
+            reaching it in the last `RATE_WINDOW` seconds), tiles not yet
+            downloaded, ETA in seconds until all are downloaded, and the
+            stage with the largest backlog (Earth Engine, Drive download or,
+            once all tiles are downloaded, local mosaic) as `bottleneck`.
+        """
+        now = time.time()
+        with self.lock:
+            tiles = list(self.tiles.items())
+            transitions = list(self.transitions)
+        window = max(min(RATE_WINDOW, now - self.started), 1)
+        sensors = {}
+        for (sensor, key), tile in tiles:
+            s = sensors.setdefault(sensor, {'tiles': 0, 'states': {state: 0 for state in STATES + END_STATES}})
+            s['tiles'] += 1
+            s['states'][tile['state']] += 1
+        for sensor, s in sensors.items():
+            rates = {}
+            for state in STATES[1:] + END_STATES:
+                n = sum(1 for t, name, st in transitions if name == sensor and st == state and t >= now - window)
+                rates[state] = round(n / window * 3600, 1)
+            remaining = sum(s['states'][state] for state in STATES[:4])
+            finish_rate = (rates['downloaded'] + rates['reused'] + rates['skipped'] + rates['failed']) / 3600
+            backlog = {stage: 0 for stage in set(WAITING_ON.values())}
+            for state, stage in WAITING_ON.items():
+                # the sensor mosaic starts once all its tiles are downloaded
+                if state != 'downloaded' or not remaining:
+                    backlog[stage] += s['states'][state]
+            s['tiles_per_hour'] = rates
+            s['remaining'] = remaining
+            if not remaining:
+                s['eta_seconds'] = 0
+            else:
+                s['eta_seconds'] = round(remaining / finish_rate) if finish_rate > 0 else None
+            s['backlog'] = backlog
+            s['bottleneck'] = max(backlog, key=backlog.get) if any(backlog.values()) else None
+        return {'updated': time.strftime('%Y-%m-%dT%H:%M:%S'), 'elapsed_seconds': round(now - self.started),
+                'sensors': sensors}
+
+    # one line per sensor
+    def summary(self):
+        lines = []
+        for sensor, s in self.snapshot()['sensors'].items():
+            states = ', '.join(f"{state} {n}" for state, n in s['states'].items() if n)
+            eta = f"{s['eta_seconds'] / 3600:.1f}h" if s['eta_seconds'] is not None else 'unknown'
+            lines.append(f"[{sensor}] {states} | {s['tiles_per_hour']['downloaded']:.0f} downloads/hour, "
+                         f"ETA {eta}, bottleneck: {s['bottleneck'] or '-'}")
+        return '\n'.join(lines)
+
+    # write the status file atomically
+    def write_status(self):
+        if not self.status_path:
+            return
+        try:
+            JsonStore.write_json_atomic(self.status_path, self.snapshot(), indent=1)
+        except OSError as e:
+            print(f"[WARNING] Could not write progress status: {e}")
+
+    # refresh the status file until stopped
+    def _write_loop(self):
+        while not self.stop_event.wait(self.refresh):
+            self.write_status()
+
+    # start the status file writer and the HTTP endpoint
+    def start(self):
+        if self.status_path:
+            os.makedirs(os.path.dirname(self.status_path) or '.', exist_ok=True)
+            self.writer = threading.Thread(target=self._write_loop, daemon=True)
+            self.writer.start()
+        if self.port:
+            tracker = self
+
+            # status as plain text at / and JSON at /status.json
+            class StatusHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.startswith('/status.json'):
+                        body, content_type = json.dumps(tracker.snapshot(), indent=1), 'application/json'
+                    else:
+                        body, content_type = tracker.summary() + '\n', 'text/plain; charset=utf-8'
+                    data = body.encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self.server = ThreadingHTTPServer(('127.0.0.1', self.port), StatusHandler)
+                threading.Thread(target=self.server.serve_forever, daemon=True).start()
+                print(f"Progress available at http://127.0.0.1:{self.port}/")
+            except OSError as e:
+                self.server = None
+                print(f"[WARNING] Progress endpoint not started on port {self.port}: {e}")
+        return self
+
+    # final status and shutdown
+    def stop(self):
+        self.stop_event.set()
+        self.write_status()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,173 @@
+import csv
+import time
+import ee
+import ApiMetrics
+import TrustedPixelCache
+
+
+# pooled training points per class and region, shared by the member tiles
+REGION_SAMPLES_PER_CLASS = 5000
+# seconds between two status polls of the region exports
+POLL_INTERVAL = 60
+
+
+# tile -> region lookup table
+def load_region_table(csv_path):
+    """
+    Load the lookup table assigning tiles to agro-ecological regions.
+
+    Parameters
+    ----------
+    csv_path : str
+        CSV file with a header row and the columns `tile` and `region`.
+        Tiles are engine tile keys, e.g. `L89_20_31` or `S2_15TVG`.
+
+    Returns
+    -------
+    dict
+        Mapping of tile key to region name.
+
+    Example
+    -------
+    tile,region
+    L89_20_31,CornBelt
+    S2_15TVG,CornBelt
+    """
+    with open(csv_path, newline='') as f:
+        return {row['tile'].strip(): row['region'].strip() for row in csv.DictReader(f) if row.get('region')}
+
+
+# sample points per member tile
+def member_num_points(numPoints, n_members):
+    """
+    Return the points per class drawn from each member tile of a region.
+
+    The pooled sample of a region is bounded by `REGION_SAMPLES_PER_CLASS`
+    per class, but each member contributes at least 50 points per class.
+    """
+    return max(50, min(numPoints, REGION_SAMPLES_PER_CLASS // max(1, n_members)))
+
+
+# delete an asset before it is exported again
+def _replace_asset(asset_path):
+    if TrustedPixelCache.asset_exists(asset_path):
+        ee.data.deleteAsset(asset_path)
+
+
+# train one shared classifier per region
+def prepare_regions(regions, asset_root, numTrees=20, poll_interval=POLL_INTERVAL):
+    """
+    Train one Random Forest per region from the pooled samples of its member tiles.
+
+    Every region runs two batch tasks, and all regions run in parallel:
+    1. Export the pooled training samples to a table asset.
+    2. Train the classifier from that table and export it to a classifier asset.
+    The trained classifiers are then loaded by reference to classify all
+    member tiles, so each region pays for a single training job.
+
+    Parameters
+    ----------
+    regions : dict
+        Mapping of region key to `{'samples': ee.FeatureCollection,
+        'inputProperties': ee.List, 'tiles': int}`.
+    asset_root : str
+        Earth Engine asset folder of the region samples and models, unique
+        per run and month (see `RunConfig.run_paths`): existing assets in it
+        are replaced. The folder and its parent are created if needed.
+    numTrees : int, optional
+        Number of trees of the Random Forest (default: 20).
+    poll_interval : float, optional
+        Seconds between two status polls (default: `POLL_INTERVAL`).
+
+    Returns
+    -------
+    tuple of (dict, dict)
+        Classifiers (`ee.Classifier`) and metrics per region key. Metrics hold
+        `tiles`, `samples`, `classes`, `sample_seconds`, `train_seconds` and
+        `state`. Regions that failed or have fewer than two classes are
+        missing from the classifiers, so their tiles fall back to per-tile
+        training.
+    """
+    TrustedPixelCache.ensure_folder(asset_root.rsplit('/', 1)[0])
+    TrustedPixelCache.ensure_folder(asset_root)
+    classifiers = {}
+    metrics = {}
+    pending = {}
+
+    # phase 1: export the pooled samples of every region
+    for region_key, region in regions.items():
+        table_path = f"{asset_root}/{region_key}_samples"
+        try:
+            _replace_asset(table_path)
+            task = ee.batch.Export.table.toAsset(
+                collection=region['samples'],
+                description=f"{region_key}_samples",
+                assetId=table_path
+            )
+            ApiMetrics.start_task(task)
+        except Exception as e:
+            print(f"[REGION] Failed to start sampling of region {region_key}: {e}")
+            metrics[region_key] = {'tiles': region['tiles'], 'state': 'failed'}
+            continue
+        metrics[region_key] = {'tiles': region['tiles'], 'state': 'sampling'}
+        pending[region_key] = {'task': task, 'phase': 'samples', 'table': table_path,
+                               'model': f"{asset_root}/{region_key}_model", 'start': time.time()}
+        print(f"[REGION] Sampling {region['tiles']} tiles of region {region_key}")
+
+    # phase 2: train each region as soon as its samples are materialized
+    while pending:
+        time.sleep(poll_interval)
+        for region_key in list(pending):
+            job = pending[region_key]
+            try:
+                status = ApiMetrics.task_status(job['task'])
+            except Exception as e:
+                print(f"[WARNING] Failed to poll region {region_key}: {e}")
+                continue
+            state = status['state']
+            if state in ['FAILED', 'CANCELLED']:
+                print(f"[REGION] {job['phase']} of region {region_key} {state}: {status.get('error_message', '')}")
+                metrics[region_key]['state'] = 'failed'
+                del pending[region_key]
+            elif state == 'COMPLETED' and job['phase'] == 'samples':
+                samples = ee.FeatureCollection(job['table'])
+                try:
+                    counts = ApiMetrics.get_info(ee.Dictionary({'samples': samples.size(),
+                                                                'classes': samples.aggregate_count_distinct('cropland')}),
+                                                 'ee.getInfo.regionSamples')
+                    metrics[region_key].update(counts)
+                    metrics[region_key]['sample_seconds'] = round(time.time() - job['start'], 1)
+                    if counts['samples'] == 0 or counts['classes'] < 2:
+                        print(f"[REGION] Region {region_key} has too few samples or classes, using per-tile training")
+                        metrics[region_key]['state'] = 'skipped'
+                        del pending[region_key]
+                        continue
+                    trained = ee.Classifier.smileRandomForest(numTrees).train(
+                        features=samples,
+                        classProperty='cropland',
+                        inputProperties=regions[region_key]['inputProperties']
+                    )
+                    _replace_asset(job['model'])
+                    task = ee.batch.Export.classifier.toAsset(
+                        classifier=trained,
+                        description=f"{region_key}_model",
+                        assetId=job['model']
+                    )
+                    ApiMetrics.start_task(task)
+                except Exception as e:
+                    print(f"[REGION] Failed to start training of region {region_key}: {e}")
+                    metrics[region_key]['state'] = 'failed'
+                    del pending[region_key]
+                    continue
+                metrics[region_key]['state'] = 'training'
+                job.update({'task': task, 'phase': 'model', 'start': time.time()})
+            elif state == 'COMPLETED':
+                metrics[region_key]['train_seconds'] = round(time.time() - job['start'], 1)
+                metrics[region_key]['state'] = 'trained'
+                classifiers[region_key] = ee.Classifier.load(job['model'])
+                del pending[region_key]
+
+    for region_key, m in metrics.items():
+        print(f"[REGION] {region_key}: {m['state']}, tiles {m['tiles']}, samples {m.get('samples', 0)}, "
+              f"classes {m.get('classes', 0)}, sampling {m.get('sample_seconds', 0)}s, training {m.get('train_seconds', 0)}s")
+    return classifiers, metrics
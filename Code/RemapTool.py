@@ -1,6 +1,12 @@
 from osgeo import gdal
 import numpy as np
 import os
+import functools
+import RemapTable
+import ScratchSpace
+
+# class codes of the CDL that every remap table must cover
+CDL_CLASS_RANGE = range(1, 255)
 
 def reset_pixel_values_to_cog(input_path, cog_path, old_values, new_values, nodata_value=0):
     """
@@ -30,8 +36,8 @@ def reset_pixel_values_to_cog(input_path, cog_path, old_values, new_values, noda
     -----
     - The function processes the raster block-by-block (default 512×512 pixels) to 
       minimize memory usage.
-    - Intermediate results are stored in a temporary file (`temp_reset.tif`), 
-      which is deleted after conversion to COG.
+    - Intermediate results are stored in a temporary file in the scratch space
+      (`ScratchSpace.temp_path`), which is deleted after conversion to COG.
     - Output COG is LZW compressed, internally tiled, and supports BigTIFF if needed.
     - By default, the function handles 8-bit (`GDT_Byte`) rasters, but this can be 
       changed to `GDT_Float32` or `GDT_UInt16` depending on the data type.
@@ -47,9 +53,6 @@ def reset_pixel_values_to_cog(input_path, cog_path, old_values, new_values, noda
     ... )
     Cloud-Optimized COG created at: output_cog.tif
     """
-    # Create a temporary file to hold modified raster
-    temp_path = 'temp_reset.tif'
-
     # Step 1: Open input raster (read-only)
     src_ds = gdal.Open(input_path, gdal.GA_ReadOnly)
     if src_ds is None:
@@ -62,6 +65,9 @@ def reset_pixel_values_to_cog(input_path, cog_path, old_values, new_values, noda
     geotransform = src_ds.GetGeoTransform()
     band = src_ds.GetRasterBand(1)
 
+    # Create a temporary file to hold modified raster (uncompressed, one byte per pixel)
+    temp_path = ScratchSpace.temp_path('reset.tif', xsize * ysize)
+
     # Create temporary output GeoTIFF to write modified pixel values
     driver = gdal.GetDriverByName('GTiff')
     temp_ds = driver.Create(
@@ -113,3 +119,72 @@ def reset_pixel_values_to_cog(input_path, cog_path, old_values, new_values, noda
     # Step 3: Clean up temporary file
     os.remove(temp_path)
     print(f"Cloud-Optimized COG created at: {cog_path}")
+
+
+# 256-entry lookup table of a class remap
+def remap_lut(old_values, new_values):
+    """
+    Build a uint8 lookup table applying an `old_values` → `new_values` remap.
+
+    Values missing from `old_values` are kept unchanged. The table is applied
+    with `lut[data]`, a single vectorized lookup per block.
+
+    Parameters
+    ----------
+    old_values : list of int
+        Original class values (0–255).
+    new_values : list of int
+        Replacement values, same length as `old_values`.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 array of length 256.
+    """
+    lut = np.arange(256, dtype=np.uint8)
+    lut[np.asarray(old_values, dtype=np.intp)] = np.asarray(new_values, dtype=np.uint8)
+    return lut
+
+
+# validated LUT of the class remap in RemapTable, built once per process
+@functools.lru_cache(maxsize=None)
+def class_remap_lut():
+    """
+    Build the 256-entry LUT of `RemapTable` once and check it for unmapped values.
+
+    Returns
+    -------
+    numpy.ndarray
+        Read-only uint8 LUT (see `remap_lut`).
+
+    Raises
+    ------
+    ValueError
+        If the original and reset lists differ in length, contain values
+        outside 0–255, or map an original value twice.
+
+    Notes
+    -----
+    - CDL class codes missing from `RemapTable.originalValueList()` are
+      reported, since they would pass through the remap unchanged.
+    - The remap is checked to be idempotent (`lut[lut] == lut`), so tiles that
+      were already remapped (e.g. archived server-side exports) are safe to
+      pass through the LUT again.
+    """
+    old_values = RemapTable.originalValueList()
+    new_values = RemapTable.resetValueList()
+    if len(old_values) != len(new_values):
+        raise ValueError(f"Remap table lists differ in length: {len(old_values)} != {len(new_values)}.")
+    if len(set(old_values)) != len(old_values):
+        raise ValueError("Remap table maps an original value more than once.")
+    if not all(0 <= v <= 255 for v in list(old_values) + list(new_values)):
+        raise ValueError("Remap table values must be in 0-255.")
+
+    unmapped = sorted(set(CDL_CLASS_RANGE) - set(old_values))
+    if unmapped:
+        print(f"Warning: CDL classes not in the remap table, kept unchanged: {unmapped}")
+    lut = remap_lut(old_values, new_values)
+    if not np.array_equal(lut[lut], lut):
+        print("Warning: class remap is not idempotent, already remapped tiles must not be remapped again.")
+    lut.setflags(write=False)
+    return lut
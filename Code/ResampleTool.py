@@ -1,4 +1,5 @@
 from osgeo import gdal
+import ResourceGovernor
 gdal.UseExceptions()
 
 
@@ -26,6 +27,7 @@ def resample(input_path,output_path,format,cell_size):
     - Resampling method: Nearest Neighbor (fast, preserves class values).
     - Output compression: LZW.
     - BIGTIFF is enabled for large files.
+    - Warp memory and threads follow the budget of the running stage (`ResourceGovernor`).
     - Make sure GDAL is installed and imported before calling this function.
 
     Example
@@ -40,9 +42,13 @@ def resample(input_path,output_path,format,cell_size):
         xRes=cell_size,
         yRes=cell_size,
         resampleAlg='Nearest Neighbor',
+        multithread=True,
+        warpMemoryLimit=ResourceGovernor.warp_memory(),
+        warpOptions=[f'NUM_THREADS={ResourceGovernor.num_threads()}'],
         creationOptions=[
             'COMPRESS=LZW',
-            'BIGTIFF=YES'
+            'BIGTIFF=YES',
+            f'NUM_THREADS={ResourceGovernor.num_threads()}'
         ]
     )
     print(f'The 30m COG image has been saved at {output_path}')
@@ -0,0 +1,249 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+# share of the available memory used as GDAL block cache
+CACHE_FRACTION = 0.25
+# share of the available memory used as warp buffers
+WARP_FRACTION = 0.1
+# smallest GDAL cache and warp buffer of a stage
+MIN_CACHE_BYTES = 64 * 1024 * 1024
+MIN_WARP_BYTES = 64 * 1024 * 1024
+# share of the available memory process pool workers may use together
+POOL_MEMORY_FRACTION = 0.5
+
+# machine limits, read once (see `limits`)
+_limits = {}
+# weights of the running stages, by stage name
+_active = {}
+_lock = threading.Lock()
+# stage of the current thread
+_local = threading.local()
+
+
+# value of a cgroup file, None if absent or unlimited
+def _read_cgroup(path):
+    try:
+        with open(path) as f:
+            value = f.read().split()
+    except OSError:
+        return None
+    if not value or value[0] == 'max':
+        return None
+    return value
+
+
+# CPUs this process may use
+def available_cpus():
+    """
+    Return the CPUs available to this process.
+
+    The CPU affinity is capped by the cgroup CPU quota (v2 `cpu.max`, v1
+    `cpu.cfs_quota_us` / `cpu.cfs_period_us`), as set by Docker, Kubernetes
+    or systemd.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _read_cgroup('/sys/fs/cgroup/cpu.max')
+    if quota:
+        quota, period = int(quota[0]), int(quota[1])
+    else:
+        quota, period = _read_cgroup('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), \
+                        _read_cgroup('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        quota = int(quota[0]) if quota else -1
+        period = int(period[0]) if period else 0
+    if quota > 0 and period > 0:
+        cpus = min(cpus, max(1, quota // period))
+    return cpus
+
+
+# memory this process may allocate in bytes
+def available_memory():
+    """
+    Return the memory available to this process in bytes.
+
+    `MemAvailable` of `/proc/meminfo` is capped by the room left under the
+    cgroup memory limit (v2 `memory.max` - `memory.current`, v1
+    `memory.limit_in_bytes` - `memory.usage_in_bytes`).
+    """
+    memory = None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    memory = int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    if memory is None:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    for limit_path, usage_path in [('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current'),
+                                   ('/sys/fs/cgroup/memory/memory.limit_in_bytes',
+                                    '/sys/fs/cgroup/memory/memory.usage_in_bytes')]:
+        limit, usage = _read_cgroup(limit_path), _read_cgroup(usage_path)
+        # v1 reports "no limit" as a huge number
+        if limit and usage and int(limit[0]) < 1 << 60:
+            memory = min(memory, max(0, int(limit[0]) - int(usage[0])))
+            break
+    return memory
+
+
+# CPUs and memory shared by the stages
+def limits():
+    """
+    Return the `{'cpus', 'memory_bytes'}` shared by the stages of this process.
+
+    Read once from the machine and cgroup limits, unless set by `set_limits`.
+    """
+    with _lock:
+        if not _limits:
+            _limits.update(cpus=available_cpus(), memory_bytes=available_memory())
+        return dict(_limits)
+
+
+# override the machine limits
+def set_limits(cpus=None, memory_bytes=None):
+    """
+    Set the CPUs and memory shared by the stages, e.g. the share of one run
+    when several runs use the same machine. None keeps the machine value.
+    """
+    machine = {'cpus': available_cpus(), 'memory_bytes': available_memory()}
+    with _lock:
+        _limits.update(cpus=cpus or machine['cpus'], memory_bytes=memory_bytes or machine['memory_bytes'])
+    apply_cache()
+
+
+# budget of a stage
+def budget(name=None):
+    """
+    Return the resource budget of a stage.
+
+    CPUs and memory are split between the running stages by weight, so the
+    budget shrinks when more stages run concurrently and grows back when
+    they finish.
+
+    Parameters
+    ----------
+    name : str, optional
+        Stage name (default: the stage of the current thread, see `stage`).
+        Outside any stage, the share of one more stage is returned.
+
+    Returns
+    -------
+    dict
+        'threads' (GDAL `NUM_THREADS` and pool workers), 'cache_bytes'
+        (GDAL block cache share), 'warp_memory_bytes' (warp buffer) and
+        'memory_bytes' (memory of the stage).
+    """
+    total = limits()
+    name = name or getattr(_local, 'stage', None)
+    with _lock:
+        weights = dict(_active)
+    weight = weights.get(name)
+    if weight is None:
+        weight = 1.0
+        weights[None] = weight
+    share = weight / sum(weights.values()) if weight else 0
+    memory = int(total['memory_bytes'] * share)
+    return {
+        'threads': max(1, int(total['cpus'] * share)),
+        'cache_bytes': max(MIN_CACHE_BYTES, int(memory * CACHE_FRACTION)),
+        'warp_memory_bytes': max(MIN_WARP_BYTES, int(memory * WARP_FRACTION)),
+        'memory_bytes': memory,
+    }
+
+
+# GDAL threads of the current stage
+def num_threads():
+    """
+    Return the thread count of the current stage as the `NUM_THREADS` value of GDAL options.
+
+    Example
+    -------
+    >>> creationOptions=['COMPRESS=LZW', f'NUM_THREADS={ResourceGovernor.num_threads()}']
+    """
+    return str(budget()['threads'])
+
+
+# warp buffer of the current stage
+def warp_memory():
+    """Return the warp buffer of the current stage in bytes, for `gdal.WarpOptions(warpMemoryLimit=...)`."""
+    return budget()['warp_memory_bytes']
+
+
+# process pool size of the current stage
+def pool_workers(worker_bytes=0):
+    """
+    Return the worker processes of a pool in the current stage.
+
+    Parameters
+    ----------
+    worker_bytes : int, optional
+        Estimated memory of one worker (e.g. its block arrays). Workers are
+        limited so that together they stay within `POOL_MEMORY_FRACTION` of
+        the stage memory (default: 0, threads only).
+    """
+    stage_budget = budget()
+    workers = stage_budget['threads']
+    if worker_bytes:
+        workers = min(workers, int(stage_budget['memory_bytes'] * POOL_MEMORY_FRACTION) // worker_bytes)
+    return max(1, workers)
+
+
+# process-wide GDAL cache as the sum of the stage caches
+def apply_cache():
+    """
+    Size the process-wide GDAL block cache as the sum of the cache budgets
+    of the running stages (outside any stage: the budget of one stage).
+    """
+    try:
+        # imported on first use, importing the governor stays cheap
+        from osgeo import gdal
+    except ImportError:  # budgets can be computed without the raster stack
+        return
+    with _lock:
+        names = list(_active) or [None]
+    cache = sum(budget(name)['cache_bytes'] for name in names if _active.get(name, 1))
+    gdal.SetCacheMax(max(cache, MIN_CACHE_BYTES))
+
+
+# budget of a stage while it runs
+@contextmanager
+def stage(name, weight=1.0):
+    """
+    Register a running stage and make its budget the one of the current thread.
+
+    The GDAL block cache is process-wide, so it is resized to the sum of the
+    cache budgets of the running stages.
+
+    Parameters
+    ----------
+    name : str
+        Stage name.
+    weight : float, optional
+        Share of the stage relative to the other running stages (default: 1).
+        Stages mostly waiting on the network, such as cleanups, use 0 and
+        get one thread.
+
+    Example
+    -------
+    >>> with ResourceGovernor.stage('clip_10m'):
+    ...     ClipRasterByShp.clip_raster_to_cog(mosaic, shapefile, clipped)
+    """
+    with _lock:
+        _active[name] = weight
+    previous = getattr(_local, 'stage', None)
+    _local.stage = name
+    apply_cache()
+    b = budget(name)
+    print(f"[BUDGET] {name}: {b['threads']} threads, GDAL cache {b['cache_bytes'] / 2**20:.0f} MB, "
+          f"warp memory {b['warp_memory_bytes'] / 2**20:.0f} MB")
+    try:
+        yield b
+    finally:
+        _local.stage = previous
+        with _lock:
+            _active.pop(name, None)
+        apply_cache()
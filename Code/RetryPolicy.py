@@ -0,0 +1,185 @@
+import re
+import random
+import time
+
+
+# attempts of a single blocking call (tile lists, status queries)
+MAX_ATTEMPTS = 5
+# resubmissions of a tile after a transient failure
+MAX_RESUBMITS = 3
+# backoff base and ceiling in seconds
+BASE_DELAY = 2.0
+MAX_DELAY = 300.0
+
+# HTTP status codes of rate limits, and of errors that usually disappear when the request is repeated later
+QUOTA_STATUS = (429,)
+TRANSIENT_STATUS = QUOTA_STATUS + (500, 502, 503, 504)
+
+# error messages of rate limits and exhausted quota
+QUOTA_MARKERS = (
+    'too many requests',
+    'too many concurrent',
+    'too many tasks',
+    'rate limit',
+    'ratelimitexceeded',
+    'quota',
+)
+
+# error messages that usually disappear when the request is repeated later
+TRANSIENT_MARKERS = QUOTA_MARKERS + (
+    'capacity exceeded',
+    'internal error',
+    'backend error',
+    'service unavailable',
+    'deadline exceeded',
+    'timed out',
+    'connection reset',
+    'connection aborted',
+    'broken pipe',
+    'temporarily',
+)
+
+# status codes and timeouts quoted in a message, as whole words ("over 5000 elements" is no 500)
+QUOTA_PATTERN = re.compile(rf"\b({'|'.join(map(str, QUOTA_STATUS))})\b")
+TRANSIENT_PATTERN = re.compile(rf"\b({'|'.join(map(str, TRANSIENT_STATUS))}|timeout)\b")
+
+# error messages of requests that fail the same way every time
+PERMANENT_MARKERS = (
+    'memory limit exceeded',
+    'not found',
+    'permission',
+    'invalid',
+    'cancelled',
+)
+
+
+# HTTP status of an error
+def status_code(error):
+    """
+    Return the HTTP status carried by an exception, or None.
+
+    Reads `googleapiclient.errors.HttpError.resp.status`, a `status_code`
+    attribute, or the `response.status_code` of `requests` errors.
+    """
+    for status in (getattr(getattr(error, 'resp', None), 'status', None), getattr(error, 'status_code', None),
+                   getattr(getattr(error, 'response', None), 'status_code', None)):
+        try:
+            return int(status)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+# transient or permanent error
+def classify_error(error):
+    """
+    Classify an Earth Engine or Drive error as transient or permanent.
+
+    Parameters
+    ----------
+    error : Exception or str
+        Raised exception, or the `error_message` of a failed task status.
+
+    Returns
+    -------
+    str
+        'transient' if repeating the request later is likely to succeed
+        (rate limits, quota, capacity, server and network errors,
+        timeouts), otherwise 'permanent'.
+
+    Notes
+    -----
+    - An HTTP status of the exception (see `status_code`) in
+      `TRANSIENT_STATUS` is transient whatever the message says.
+    - Permanent markers are checked before the message markers, so e.g.
+      "User memory limit exceeded" is never retried even though it
+      mentions a limit.
+    - Status codes in a message only count as whole words, so "over 5000
+      elements" is not a 500 error.
+    - Python network errors (`ConnectionError`, `TimeoutError`) are transient.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)) or status_code(error) in TRANSIENT_STATUS:
+        return 'transient'
+    message = str(error).lower()
+    if any(marker in message for marker in PERMANENT_MARKERS):
+        return 'permanent'
+    if any(marker in message for marker in TRANSIENT_MARKERS) or TRANSIENT_PATTERN.search(message):
+        return 'transient'
+    return 'permanent'
+
+
+# rate limit or quota error
+def is_quota_error(error):
+    """
+    Return True if an error is a rate limit or quota error (HTTP status in
+    `QUOTA_STATUS`, or a message matching `QUOTA_MARKERS`); every quota
+    error is also transient.
+    """
+    if status_code(error) in QUOTA_STATUS:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in QUOTA_MARKERS) or bool(QUOTA_PATTERN.search(message))
+
+
+# jittered exponential backoff
+def backoff_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """
+    Return the waiting time before the next attempt ("full jitter" backoff).
+
+    Parameters
+    ----------
+    attempt : int
+        Number of attempts already failed (1 for the first retry).
+    base_delay : float, optional
+        Delay scale in seconds (default: `BASE_DELAY`).
+    max_delay : float, optional
+        Upper bound of the delay in seconds (default: `MAX_DELAY`).
+
+    Returns
+    -------
+    float
+        Random delay in `[0, min(max_delay, base_delay * 2**attempt)]`, so
+        concurrent clients hitting the same quota do not retry in lockstep.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+# call a function, retrying transient errors
+def call_with_retry(func, *args, max_attempts=MAX_ATTEMPTS, description='request', **kwargs):
+    """
+    Call a function and retry it with jittered exponential backoff on transient errors.
+
+    Parameters
+    ----------
+    func : callable
+        Function to call, e.g. `ee.ComputedObject.getInfo` or `task.start`.
+    *args, **kwargs
+        Arguments passed to `func`.
+    max_attempts : int, optional
+        Maximum number of calls (default: `MAX_ATTEMPTS`).
+    description : str, optional
+        Name of the request used in log messages.
+
+    Returns
+    -------
+    object
+        The return value of `func`.
+
+    Raises
+    ------
+    Exception
+        The last error, if it is permanent or all attempts failed.
+
+    Example
+    -------
+    >>> tiles = call_with_retry(L89List, CONUSBoundary, description='L89 tile list')
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_attempts or classify_error(e) == 'permanent':
+                raise
+            delay = backoff_delay(attempt)
+            print(f"[RETRY] {description} failed ({e}), attempt {attempt}/{max_attempts}, retrying in {delay:.1f}s")
+            time.sleep(delay)
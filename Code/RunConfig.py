@@ -0,0 +1,239 @@
+import os
+import json
+import argparse
+from datetime import datetime, date
+
+
+# name of the national run, which keeps the historical folder layout
+DEFAULT_NAME = 'CONUS'
+# sensors a run can map
+SENSORS = ('L89', 'S2')
+
+# settings of a run; None values are derived from the others (see `run_config`)
+DEFAULTS = {
+    # run name, used in local folders, Drive folders and asset IDs
+    'name': DEFAULT_NAME,
+    # Earth Engine cloud project (None: `EESession.EE_PROJECT`)
+    'ee_project': None,
+    # area of interest: TIGER/2018/States names, or an Earth Engine table asset; both None maps CONUS
+    'states': None,
+    'aoi_asset': None,
+    # local shapefile the 10 m map is clipped to (EPSG:5070)
+    'clip_shapefile': '/home/hli47/InseasonMapping/ShapeFile/CONUS_boundary_5070.shp',
+    # period: season start, end of the scenes (None: today) and month label (None: previous month)
+    'year': None,
+    'start_date': None,
+    'end_date': None,
+    'month': None,
+    'sensors': list(SENSORS),
+    # cloud filter threshold for Sentinel-2 and Landsat 8/9
+    's2_cloud_cover': 10,
+    'l89_cloud_cover': 15,
+    # local output root; named runs get their own subfolder
+    'output_root': '/home/hli47/InseasonMapping/Results/',
+    # trusted pixels: asset folder and year gap (past 6 years CDL to predict current year's training labels)
+    'trusted_pixel_asset_root': 'projects/project-name/assets/TrustedPixel',  # replace by your cloud project name
+    'trusted_pixel_gap': 7,
+    # Drive export encoding, see ExportProfile.EXPORT_PROFILES ('COG_Byte': uint8 COG with NoData 0)
+    'export_profile': 'COG_Byte',
+    # temporal compositing before classification: None (every scene), 'biweekly' or 'monthly' median composites
+    'composite_mode': None,
+    # True: skip the per-tile focal_mode in Earth Engine and majority-filter each sensor mosaic locally
+    'local_majority_filter': False,
+    # True: export raw class codes and apply the RemapTable remap as a LUT in the local mosaic
+    'local_remap': False,
+    # optional regional shared models (requires composite_mode); None trains one model per tile
+    'region_table': None,
+    'region_asset_root': 'projects/project-name/assets/RegionModel',  # replace by your cloud project name
+    # local HTTP port of the live tile progress (None disables it)
+    'progress_port': 8765,
+    # scratch root of the intermediate files; None uses $INSEASON_SCRATCH or /tmp
+    'scratch_root': None,
+    # share of the machine: CPUs and memory of the stages (None: all), EE export tasks and download threads
+    'cpus': None,
+    'memory_bytes': None,
+    'max_active_tasks': None,
+    'download_workers': None,
+}
+
+
+# first day of the previous month
+def _previous_month(today):
+    return date(today.year - 1, 12, 1) if today.month == 1 else date(today.year, today.month - 1, 1)
+
+
+# complete configuration of a run
+def run_config(settings=None, today=None, **overrides):
+    """
+    Build a run configuration from `DEFAULTS`, `settings` and `overrides`.
+
+    Parameters
+    ----------
+    settings : dict, optional
+        Settings, e.g. loaded from a JSON file (see `load_config`).
+    today : datetime.date, optional
+        Date the period defaults derive from (default: today).
+    **overrides
+        Settings taking precedence over `settings`.
+
+    Returns
+    -------
+    dict
+        All keys of `DEFAULTS`, with `year` (current year), `start_date`
+        (May 1st), `end_date` (today) and `month` (name of the previous
+        month) filled in, plus the run folders and file paths under 'paths'
+        (see `run_paths`).
+
+    Raises
+    ------
+    ValueError
+        If a setting is unknown, no sensor or an unknown sensor is given,
+        or both `states` and `aoi_asset` are set.
+
+    Example
+    -------
+    >>> config = run_config({'name': 'Iowa', 'states': ['Iowa']}, clip_shapefile='ShapeFile/Iowa_5070.shp')
+    """
+    today = today or datetime.now().date()
+    config = dict(DEFAULTS)
+    for values in (settings or {}, overrides):
+        unknown = set(values) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown run settings {sorted(unknown)}, available: {sorted(DEFAULTS)}.")
+        config.update(values)
+    if not config['sensors'] or set(config['sensors']) - set(SENSORS):
+        raise ValueError(f"Sensors must be a non-empty subset of {SENSORS}, got {config['sensors']}.")
+    if config['states'] and config['aoi_asset']:
+        raise ValueError("Give either states or aoi_asset as area of interest, not both.")
+    config['year'] = int(config['year'] or today.year)
+    config['start_date'] = config['start_date'] or f"{config['year']}-05-01"
+    config['end_date'] = config['end_date'] or today.strftime('%Y-%m-%d')
+    config['month'] = config['month'] or _previous_month(today).strftime('%B')
+    config['paths'] = run_paths(config)
+    return config
+
+
+# folders and files of a run
+def run_paths(config):
+    """
+    Return the local folders, file paths and Drive folders of a run.
+
+    The national run (`DEFAULT_NAME`) writes directly into `output_root`
+    and exports to the historical Drive folders, so its archives and caches
+    stay in place. Any other run gets `<output_root>/<name>/` and Drive
+    folders suffixed with its name, so several runs never share files.
+
+    Returns
+    -------
+    dict
+        Keys 'root', 'mosaic_folder', 'result_folder', the Drive tile folder
+        and local archive of each sensor ('L89_tile_folder',
+        'L89_archive_folder', ...), caches, sensor mosaics, 10 m and 30 m
+        products, stage manifest, run report, Prometheus textfile, profile
+        folder, progress status file and the Earth Engine asset folder of
+        the regional models ('region_asset_folder', one per run and month
+        under `region_asset_root`, so runs never replace each other's models).
+    """
+    name, year, month = config['name'], config['year'], config['month']
+    isolated = name != DEFAULT_NAME
+    root = os.path.join(config['output_root'], name) if isolated else config['output_root']
+    suffix = f'_{name}' if isolated else ''
+    mosaic_folder = os.path.join(root, 'AutoInseasonL89S2_Mosaic')
+    result_folder = os.path.join(root, 'AutoInseasonL89S2_Result', str(year))
+    paths = {
+        'root': root,
+        'mosaic_folder': mosaic_folder,
+        'result_folder': result_folder,
+        # local cache of per-tile training locations, sampled once per year and reused by the monthly runs
+        'sample_cache': os.path.join(root, 'TrainingSampleCache'),
+        # simplified tile footprints do not depend on the area of interest, all runs share them
+        'footprint_cache': os.path.join(config['output_root'], 'TileFootprintCache'),
+        'mosaic_10m': os.path.join(mosaic_folder, f'{year}{month}CropMapMosaiced.tif'),
+        'clipped_10m': os.path.join(result_folder, f'{year}{month}CropMap10m.tif'),
+        'erdas_10m': os.path.join(result_folder, f'{year}{month}CropMap10m.img'),
+        'resampled_30m': os.path.join(result_folder, f'{year}{month}CropMap30m.tif'),
+        'erdas_30m': os.path.join(result_folder, f'{year}{month}CropMap30m.img'),
+        # stage manifest (content hashes of completed stages), telemetry, profiles and live progress
+        'stage_manifest': os.path.join(root, f'{year}{month}_stages.json'),
+        'run_report': os.path.join(root, f'{year}{month}_run_report.json'),
+        'telemetry_textfile': os.path.join(config['output_root'], f'inseason_mapping{suffix}.prom'),
+        'profile_folder': os.path.join(root, f'{year}{month}_profile'),
+        'progress_status': os.path.join(root, f'{year}{month}_progress.json'),
+        'region_asset_folder': f"{config['region_asset_root']}/{year}{month}{suffix}",
+    }
+    for sensor in SENSORS:
+        # Drive export folder, local archive of classified tiles and sensor mosaic
+        paths[f'{sensor}_tile_folder'] = f'AutoInseason{sensor}_Mapping{suffix}'
+        paths[f'{sensor}_archive_folder'] = os.path.join(root, f'AutoInseason{sensor}_Archive')
+        paths[f'{sensor}_mosaic_name'] = f'{year}{month}_{sensor}mosaic.tif'
+        paths[f'{sensor}_mosaic'] = os.path.join(mosaic_folder, paths[f'{sensor}_mosaic_name'])
+    return paths
+
+
+# configuration of a JSON file
+def load_config(path=None, **overrides):
+    """
+    Load a run configuration from a JSON file of `DEFAULTS` keys.
+
+    Parameters
+    ----------
+    path : str, optional
+        JSON file. Defaults to None (national run with the defaults).
+    **overrides
+        Settings taking precedence over the file.
+
+    Example
+    -------
+    $ cat Runs/Iowa.json
+    {"name": "Iowa", "states": ["Iowa"], "clip_shapefile": "ShapeFile/Iowa_5070.shp", "progress_port": 8766}
+    """
+    settings = {}
+    if path:
+        with open(path) as f:
+            settings = json.load(f)
+    return run_config(settings, **overrides)
+
+
+# `key=value` of the command line
+def parse_setting(text):
+    """
+    Parse a `key=value` command line setting; the value is read as JSON
+    when possible (numbers, lists, null), else as a string.
+    """
+    key, _, value = text.partition('=')
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return key, value
+
+
+# command line options selecting a run configuration
+def config_arguments(parser):
+    """
+    Add `--config FILE` and `--set KEY=VALUE` to an argument parser.
+
+    Example
+    -------
+    $ python AutoInseasonMapping.py --config Runs/Iowa.json --set month=June --set end_date=2025-06-30 run
+    """
+    parser.add_argument('--config', default=None, help='JSON run configuration (default: national run)')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', type=parse_setting,
+                        help=f'override a run setting: {", ".join(sorted(DEFAULTS))}')
+    return parser
+
+
+# configuration selected on the command line
+def config_from_args(argv=None):
+    """
+    Return the run configuration of `--config` / `--set` and the remaining arguments.
+
+    Returns
+    -------
+    tuple
+        `(config, remaining)`, the remaining arguments being the stage
+        command (see `StagePipeline.stage_cli`).
+    """
+    parser = config_arguments(argparse.ArgumentParser(add_help=False))
+    args, remaining = parser.parse_known_args(argv)
+    return load_config(args.config, **dict(args.set)), remaining
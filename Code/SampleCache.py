@@ -0,0 +1,142 @@
+import os
+import json
+import ee
+import ApiMetrics
+import JsonStore
+
+
+# read cached training locations
+def load_points(cache_folder, year, tile_key):
+    """
+    Load the cached training locations of a tile.
+
+    Returns
+    -------
+    list of list or None
+        `[lon, lat, cropland]` triples, or None if the tile is not cached yet.
+    """
+    path = JsonStore.cache_path(cache_folder, year, tile_key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)['points']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not read training sample cache {path}: {e}")
+        return None
+
+
+# write training locations
+def save_points(cache_folder, year, tile_key, points):
+    """
+    Save the training locations of a tile to the cache.
+
+    Parameters
+    ----------
+    cache_folder : str
+        Local root folder of the training-sample cache.
+    year : int or str
+        Mapping year.
+    tile_key : str
+        Unique tile key.
+    points : list of list
+        `[lon, lat, cropland]` triples.
+    """
+    JsonStore.write_json_atomic(JsonStore.cache_path(cache_folder, year, tile_key),
+                                {'tile': tile_key, 'year': int(year), 'points': points})
+
+
+# sample training locations from the label image only
+def sample_locations(label_image, region, numPoints, scale):
+    """
+    Draw stratified training locations from the trusted-pixel label image.
+
+    Parameters
+    ----------
+    label_image : ee.Image
+        Training label image with a `cropland` band.
+    region : ee.Geometry
+        Tile region to sample.
+    numPoints : int
+        Number of points per class.
+    scale : float
+        Sampling scale in meters.
+
+    Returns
+    -------
+    list of list
+        `[lon, lat, cropland]` triples. This call triggers one server-side request,
+        which only evaluates the label image and not the spectral time series.
+    """
+    samples = label_image.select('cropland').stratifiedSample(
+        numPoints=numPoints,
+        classBand='cropland',
+        region=region,
+        scale=scale,
+        geometries=True
+    )
+    coords = samples.map(lambda f: f.set('coords', f.geometry().transform('EPSG:4326', 1).coordinates()))
+    info = ApiMetrics.get_info(ee.Dictionary({'coords': coords.aggregate_array('coords'),
+                                              'labels': coords.aggregate_array('cropland')}), 'ee.getInfo.samples')
+    return [[lon, lat, label] for (lon, lat), label in zip(info['coords'], info['labels'])]
+
+
+# training locations as a FeatureCollection
+def points_collection(points):
+    """
+    Convert cached `[lon, lat, cropland]` triples into an ee.FeatureCollection.
+
+    The triples are embedded in the request as a single `ee.List` constant
+    and turned into point features server-side with `ee.List.map`, so the
+    request graph holds one list instead of one Feature and Geometry per
+    point (S2 tiles cache `numPoints` x classes points), keeping it far
+    below the request payload limit and quick to serialize. No asset or
+    server-side sampling is needed to rebuild them.
+    """
+    def to_feature(row):
+        row = ee.List(row)
+        return ee.Feature(ee.Geometry.Point(row.slice(0, 2)), {'cropland': row.get(2)})
+    return ee.FeatureCollection(ee.List(points).map(to_feature))
+
+
+# cached training locations of a tile, sampled once per year
+def cached_locations(cache_folder, year, tile_key, label_image, region, numPoints, scale):
+    """
+    Return the training locations of a tile, sampling them only on the first run of a year.
+
+    Parameters
+    ----------
+    cache_folder : str
+        Local root folder of the training-sample cache.
+    year : int or str
+        Mapping year.
+    tile_key : str
+        Unique tile key.
+    label_image : ee.Image
+        Training label image with a `cropland` band.
+    region : ee.Geometry
+        Tile region to sample on a cache miss.
+    numPoints : int
+        Number of points per class on a cache miss.
+    scale : float
+        Sampling scale in meters on a cache miss.
+
+    Returns
+    -------
+    ee.FeatureCollection
+        Point features with a `cropland` property. Later runs only sample the
+        new spectral features at these locations (`ee.Image.sampleRegions`).
+
+    Notes
+    -----
+    - Locations are stratified on the label image alone. Points falling on
+      pixels masked in the spectral features are dropped by `sampleRegions`.
+    """
+    points = load_points(cache_folder, year, tile_key)
+    if points is None:
+        points = sample_locations(label_image, region, numPoints, scale)
+        # tiles without any scene or trusted pixel yet are sampled again next run
+        if points:
+            save_points(cache_folder, year, tile_key, points)
+            print(f"{len(points)} training locations of {tile_key} cached.")
+    return points_collection(points)
@@ -0,0 +1,203 @@
+import os
+import time
+import errno
+import fcntl
+import atexit
+import shutil
+import signal
+import tempfile
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+# environment variable naming the scratch root, e.g. a tmpfs or NVMe mount
+SCRATCH_ENV = 'INSEASON_SCRATCH'
+# prefix of the run folders under the scratch root
+RUN_PREFIX = 'inseason-'
+# free bytes always left on the scratch disk
+FREE_SPACE_MARGIN = 512 * 1024 * 1024
+# lock file held by the owner of a run folder while it is alive
+LOCK_NAME = '.lock'
+# age in seconds after which a run folder without lock file counts as abandoned
+UNLOCKED_MAX_AGE = 3600
+
+# scratch folder of this run, created on first use, and the lock held on it
+_run = {'root': None, 'path': None, 'lock': None}
+_lock = threading.Lock()
+# stage folder of the current thread
+_local = threading.local()
+# numbering of the temporary files
+_counter = itertools.count(1)
+
+
+# choose the scratch root
+def set_root(root):
+    """
+    Set the folder the run scratch space is created in, before its first use.
+
+    Parameters
+    ----------
+    root : str or None
+        Scratch root, ideally a tmpfs or NVMe mount separate from the results
+        volume. None uses `$INSEASON_SCRATCH` or the system temp folder.
+    """
+    with _lock:
+        if _run['path']:
+            raise RuntimeError(f"Scratch space already in use at {_run['path']}.")
+        _run['root'] = root
+
+
+# exclusive lock on a run folder, None if another process holds it
+def _try_lock(folder):
+    try:
+        fd = os.open(os.path.join(folder, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+# remove run folders left by killed processes
+def _remove_stale(root):
+    """
+    Remove the run folders whose owner is gone.
+
+    Liveness is decided by the owner's `flock` on the lock file in the
+    folder, not by its pid: the lock is released by the kernel when the
+    owner dies, holds across containers sharing the scratch root on one
+    host, and is immune to pid reuse. Folders without lock file (still being
+    created, or left by an older version) are only removed after
+    `UNLOCKED_MAX_AGE` seconds.
+    """
+    for name in os.listdir(root):
+        folder = os.path.join(root, name)
+        if not name.startswith(RUN_PREFIX) or not os.path.isdir(folder):
+            continue
+        if not os.path.exists(os.path.join(folder, LOCK_NAME)):
+            try:
+                abandoned = time.time() - os.path.getmtime(folder) > UNLOCKED_MAX_AGE
+            except OSError:
+                continue
+            if abandoned:
+                print(f"Removing stale scratch folder {folder}")
+                shutil.rmtree(folder, ignore_errors=True)
+            continue
+        fd = _try_lock(folder)
+        if fd is None:
+            continue
+        try:
+            print(f"Removing stale scratch folder {folder}")
+            shutil.rmtree(folder, ignore_errors=True)
+        finally:
+            os.close(fd)
+
+
+# SIGTERM runs the exit handlers like a normal exit
+def _terminate(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+# scratch folder of the run
+def run_dir():
+    """
+    Return the scratch folder of this run, creating it on first use.
+
+    The folder `<root>/inseason-<pid>-<random>` is unique per process, so
+    concurrent runs never share temporary files, and locked by the process
+    while it lives. It is removed at exit, including on SIGTERM; folders
+    left by killed runs (their lock is free) are removed when the next run
+    starts, also when several containers share the scratch root.
+    """
+    with _lock:
+        if not _run['path']:
+            root = _run['root'] or os.environ.get(SCRATCH_ENV) or tempfile.gettempdir()
+            os.makedirs(root, exist_ok=True)
+            _remove_stale(root)
+            path = tempfile.mkdtemp(prefix=f'{RUN_PREFIX}{os.getpid()}-', dir=root)
+            _run['lock'] = _try_lock(path)
+            _run['path'] = path
+            atexit.register(cleanup)
+            if threading.current_thread() is threading.main_thread() \
+                    and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+                signal.signal(signal.SIGTERM, _terminate)
+        return _run['path']
+
+
+# remove the scratch folder of the run
+def cleanup():
+    with _lock:
+        path, _run['path'] = _run['path'], None
+        lock, _run['lock'] = _run['lock'], None
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+    if lock is not None:
+        os.close(lock)
+
+
+# check the room left on a disk
+def ensure_free_space(folder, needed_bytes):
+    """
+    Raise an `OSError` (ENOSPC) if writing `needed_bytes` into `folder` would
+    leave less than `FREE_SPACE_MARGIN` free, before any byte is written.
+    """
+    free = shutil.disk_usage(folder).free
+    if free - needed_bytes < FREE_SPACE_MARGIN:
+        raise OSError(errno.ENOSPC, f"Not enough space for {needed_bytes / 2**20:.0f} MB "
+                                    f"({free / 2**20:.0f} MB free)", folder)
+
+
+# scratch folder of a stage
+@contextmanager
+def stage(name):
+    """
+    Create a unique scratch subfolder for a stage and make it the one of the current thread.
+
+    The subfolder and everything left in it are removed when the stage ends.
+
+    Example
+    -------
+    >>> with ScratchSpace.stage('clip_10m') as folder:
+    ...     ClipRasterByShp.clip_raster_to_cog(mosaic, shapefile, clipped)
+    """
+    folder = tempfile.mkdtemp(prefix=f'{name}-', dir=run_dir())
+    previous = getattr(_local, 'folder', None)
+    _local.folder = folder
+    try:
+        yield folder
+    finally:
+        _local.folder = previous
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+# unique path of a temporary file
+def temp_path(name, needed_bytes=0):
+    """
+    Return a unique path for a temporary file in the scratch space.
+
+    Parameters
+    ----------
+    name : str
+        File name, kept as suffix (e.g. 'reset.tif').
+    needed_bytes : int, optional
+        Expected file size; the free space is checked first (see
+        `ensure_free_space`). Defaults to 0.
+
+    Returns
+    -------
+    str
+        Path in the folder of the current stage, or in the run folder outside
+        any stage. The caller removes the file; leftovers go with the folder.
+
+    Example
+    -------
+    >>> temp = ScratchSpace.temp_path('reset.tif', xsize * ysize)
+    """
+    folder = getattr(_local, 'folder', None) or run_dir()
+    if needed_bytes:
+        ensure_free_space(folder, needed_bytes)
+    return os.path.join(folder, f'{next(_counter)}_{name}')
@@ -0,0 +1,386 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import Telemetry
+import JsonStore
+import StageProfiler
+import ResourceGovernor
+import ScratchSpace
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+# bytes read at once while hashing stage files
+HASH_CHUNK = 16 * 1024 * 1024
+# stages running at the same time
+STAGE_WORKERS = 4
+
+
+# definition of a pipeline stage
+def stage(name, func, inputs=(), outputs=(), after=(), removes=(), weight=1.0):
+    """
+    Define a named pipeline stage.
+
+    Parameters
+    ----------
+    name : str
+        Unique stage name used on the command line.
+    func : callable
+        Function without arguments doing the work; exceptions fail the stage.
+    inputs : list of str, optional
+        Files read by the stage. A stage producing one of them runs first.
+    outputs : list of str, optional
+        Files written by the stage; all must exist after it succeeded.
+    after : list of str, optional
+        Additional stages that must finish first.
+    removes : list of str, optional
+        Intermediate files of other stages deleted by this stage; their
+        producers stay complete when the files are gone.
+    weight : float, optional
+        CPU and memory share of the stage relative to the stages running
+        at the same time (default: 1, see `ResourceGovernor.stage`).
+
+    Returns
+    -------
+    dict
+        Stage definition for `run_stages`.
+    """
+    return {'name': name, 'func': func, 'inputs': list(inputs), 'outputs': list(outputs), 'after': list(after),
+            'removes': list(removes), 'weight': weight}
+
+
+# stage manifest of a run
+def load_manifest(manifest_path):
+    """
+    Load the stage manifest of a run.
+
+    Returns
+    -------
+    dict
+        `{'stages': {name: record}, 'hashes': {path: [size, mtime_ns, sha256]}}`,
+        empty if no manifest exists yet.
+    """
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            manifest.setdefault('stages', {})
+            manifest.setdefault('hashes', {})
+            return manifest
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read stage manifest {manifest_path}: {e}")
+    return {'stages': {}, 'hashes': {}}
+
+
+# write the stage manifest atomically
+def save_manifest(manifest_path, manifest):
+    JsonStore.write_json_atomic(manifest_path, manifest, indent=1, sort_keys=True)
+
+
+# content hash of a file, cached by size and modification time
+def file_digest(path, hash_cache):
+    """
+    Return the SHA-256 of a file, or None if it does not exist.
+
+    Parameters
+    ----------
+    path : str
+        File to hash.
+    hash_cache : dict
+        `{path: [size, mtime_ns, sha256]}`; files whose size and modification
+        time did not change are not read again, so multi-GB mosaics are only
+        hashed once after they are written.
+
+    Returns
+    -------
+    str or None
+        Hex digest.
+    """
+    if not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    cached = hash_cache.get(path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            sha.update(chunk)
+    hash_cache[path] = [stat.st_size, stat.st_mtime_ns, sha.hexdigest()]
+    return sha.hexdigest()
+
+
+# upstream stages of every stage
+def stage_dependencies(stages):
+    """
+    Return the upstream stages of each stage: its `after` list and the producers of its inputs.
+
+    Raises
+    ------
+    ValueError
+        For unknown stage names or dependency cycles.
+    """
+    producers = {path: s['name'] for s in stages for path in s['outputs']}
+    names = {s['name'] for s in stages}
+    dependencies = {}
+    for s in stages:
+        upstream = set(s['after']) | {producers[path] for path in s['inputs'] if path in producers}
+        upstream.discard(s['name'])
+        unknown = upstream - names
+        if unknown:
+            raise ValueError(f"Stage {s['name']} depends on unknown stages {sorted(unknown)}.")
+        dependencies[s['name']] = upstream
+
+    # cycle check by repeatedly removing stages without open dependencies
+    remaining = {name: set(upstream) for name, upstream in dependencies.items()}
+    while remaining:
+        ready = [name for name, upstream in remaining.items() if not upstream]
+        if not ready:
+            raise ValueError(f"Stage dependency cycle between {sorted(remaining)}.")
+        for name in ready:
+            del remaining[name]
+        for upstream in remaining.values():
+            upstream.difference_update(ready)
+    return dependencies
+
+
+# whether a completed stage can be skipped
+def up_to_date(s, record, hash_cache, rerun_upstream, trust_manifest, removed=()):
+    """
+    Decide whether a stage is complete and its inputs are unchanged.
+
+    Parameters
+    ----------
+    s : dict
+        Stage definition.
+    record : dict or None
+        Manifest record of the stage.
+    hash_cache : dict
+        File hash cache (see `file_digest`).
+    rerun_upstream : bool
+        True if an upstream stage ran in this invocation.
+    trust_manifest : bool
+        Skip completed stages without re-hashing their files (`resume`).
+    removed : set of str, optional
+        Intermediate files deleted by cleanup stages; missing is not a change.
+
+    Returns
+    -------
+    bool
+        True if the stage can be skipped.
+
+    Notes
+    -----
+    - Inputs that no longer exist (e.g. intermediate mosaics removed by the
+      cleanup stage) count as unchanged as long as all outputs are intact.
+    - Stages without input files are re-run whenever an upstream stage ran.
+    """
+    if not record or record.get('state') != 'done':
+        return False
+    if trust_manifest:
+        return True
+    for path, digest in record.get('outputs', {}).items():
+        current = file_digest(path, hash_cache)
+        if current != digest and not (current is None and path in removed):
+            return False
+    if not s['inputs']:
+        return not rerun_upstream
+    for path, digest in record.get('inputs', {}).items():
+        current = file_digest(path, hash_cache)
+        if current is not None and current != digest:
+            return False
+    return True
+
+
+# run the stage graph
+def run_stages(stages, manifest_path, only=None, force=(), trust_manifest=False, workers=STAGE_WORKERS,
+               profiler=None):
+    """
+    Run a DAG of stages, skipping completed stages whose inputs are unchanged.
+
+    Parameters
+    ----------
+    stages : list of dict
+        Stage definitions (see `stage`).
+    manifest_path : str
+        JSON manifest recording the content hashes of each completed stage.
+    only : list of str, optional
+        Run only these stages; the others are treated as external and their
+        outputs must already exist. Defaults to None (all stages).
+    force : list of str, optional
+        Stages run even if they are up to date. Stages downstream of them
+        run again if their inputs change.
+    trust_manifest : bool, optional
+        Skip stages recorded as done without re-hashing (default: False).
+    workers : int, optional
+        Independent stages running concurrently (default: `STAGE_WORKERS`).
+    profiler : callable, optional
+        Function returning a context manager for a stage name, wrapped
+        around every stage that runs (see `StageProfiler.stage_profiler`).
+        Defaults to None (no profiling).
+
+    Returns
+    -------
+    dict
+        Final state of every stage: 'done', 'skipped', 'failed', 'blocked'
+        (an upstream stage failed) or 'excluded' (not selected by `only`).
+    """
+    dependencies = stage_dependencies(stages)
+    by_name = {s['name']: s for s in stages}
+    unknown = (set(only or []) | set(force)) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}, available: {sorted(by_name)}.")
+    selected = set(only) if only else set(by_name)
+    selected |= set(force)
+    removed = {path for s in stages for path in s['removes']}
+
+    manifest = load_manifest(manifest_path)
+    hash_cache = manifest['hashes']
+    states = {name: ('excluded' if name not in selected else None) for name in by_name}
+    ran = set()
+
+    # execute one stage and build its manifest record
+    def execute(s):
+        started = time.time()
+        print(f"[STAGE] {s['name']} started")
+        with Telemetry.measure(s['name']), ResourceGovernor.stage(s['name'], s['weight']), \
+                ScratchSpace.stage(s['name']):
+            if profiler:
+                with profiler(s['name']):
+                    s['func']()
+            else:
+                s['func']()
+        Telemetry.count('output_files', len(s['outputs']), stage=s['name'])
+        Telemetry.count('output_bytes', sum(os.path.getsize(path) for path in s['outputs'] if os.path.exists(path)),
+                        stage=s['name'])
+        missing = [path for path in s['outputs'] if not os.path.exists(path)]
+        if missing:
+            raise RuntimeError(f"outputs not written: {missing}")
+        return {
+            'state': 'done',
+            'inputs': {path: file_digest(path, hash_cache) for path in s['inputs']},
+            'outputs': {path: file_digest(path, hash_cache) for path in s['outputs']},
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(time.time() - started, 1),
+        }
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # start every stage whose upstream stages are settled
+            for name, state in states.items():
+                if state is not None or name in running.values():
+                    continue
+                upstream = [states[u] for u in dependencies[name]]
+                if any(u in ['failed', 'blocked'] for u in upstream):
+                    states[name] = 'blocked'
+                    print(f"[STAGE] {name} blocked by a failed upstream stage")
+                    continue
+                if any(u is None for u in upstream):
+                    continue
+                s = by_name[name]
+                rerun_upstream = bool(dependencies[name] & ran)
+                if name not in force and up_to_date(s, manifest['stages'].get(name), hash_cache,
+                                                     rerun_upstream, trust_manifest, removed):
+                    states[name] = 'skipped'
+                    print(f"[STAGE] {name} up to date, skipped")
+                    continue
+                running[pool.submit(execute, s)] = name
+
+            if not running:
+                if all(state is not None for state in states.values()):
+                    break
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    manifest['stages'][name] = future.result()
+                    states[name] = 'done'
+                    ran.add(name)
+                    print(f"[STAGE] {name} done in {manifest['stages'][name]['seconds']}s")
+                except Exception as e:
+                    manifest['stages'][name] = {'state': 'failed', 'error': str(e),
+                                                'finished': datetime.now().isoformat(timespec='seconds')}
+                    states[name] = 'failed'
+                    print(f"[STAGE] {name} failed: {e}")
+                save_manifest(manifest_path, manifest)
+
+    save_manifest(manifest_path, manifest)
+    return states
+
+
+# command line of a stage graph
+def stage_cli(stages, manifest_path, argv=None, profile_folder=None):
+    """
+    Command line interface running, resuming or forcing stages.
+
+    Commands
+    --------
+    run [STAGE ...]
+        Run all (or the named) stages, skipping stages whose outputs and
+        input hashes match the manifest.
+    resume
+        Run all stages not recorded as done, without re-hashing files.
+    force STAGE [STAGE ...]
+        Re-run the named stages; downstream stages follow if their inputs change.
+    list
+        Print the stages, their dependencies and recorded state.
+
+    `run`, `resume` and `force` accept `--profile cprofile|sample` and
+    `--gdal-debug` to write per-stage profiles to `profile_folder`
+    (default: next to the manifest, see `StageProfiler.profile_stage`).
+
+    Returns
+    -------
+    int
+        Exit code, 1 if any stage failed or was blocked.
+
+    Example
+    -------
+    $ python AutoInseasonMapping.py run resample_30m erdas_30m
+    $ python AutoInseasonMapping.py force clip_10m --profile sample --gdal-debug
+    """
+    parser = argparse.ArgumentParser(description='Run the stages of the in-season mapping pipeline.')
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help='run stages, skipping up-to-date ones')
+    run_parser.add_argument('stages', nargs='*')
+    resume_parser = commands.add_parser('resume', help='run the stages not completed yet')
+    force_parser = commands.add_parser('force', help='re-run stages even if up to date')
+    force_parser.add_argument('stages', nargs='+')
+    commands.add_parser('list', help='list stages and their recorded state')
+    for p in (run_parser, force_parser):
+        p.add_argument('--workers', type=int, default=STAGE_WORKERS, help='concurrent stages')
+    for p in (run_parser, resume_parser, force_parser):
+        p.add_argument('--profile', choices=StageProfiler.PROFILE_MODES, default=None,
+                       help='profile every stage that runs')
+        p.add_argument('--gdal-debug', action='store_true', help='capture GDAL debug output per stage')
+    args = parser.parse_args(argv)
+    command = args.command or 'run'
+
+    profiler = None
+    if getattr(args, 'profile', None) or getattr(args, 'gdal_debug', False):
+        folder = profile_folder or os.path.splitext(manifest_path)[0] + '_profile'
+        profiler = StageProfiler.stage_profiler(folder, args.profile, args.gdal_debug)
+
+    if command == 'list':
+        dependencies = stage_dependencies(stages)
+        records = load_manifest(manifest_path)['stages']
+        for s in stages:
+            record = records.get(s['name'], {})
+            print(f"{s['name']:<16} {record.get('state', '-'):<8} {record.get('finished', ''):<20} "
+                  f"after: {', '.join(sorted(dependencies[s['name']])) or '-'}")
+        return 0
+
+    if command == 'resume':
+        states = run_stages(stages, manifest_path, trust_manifest=True, profiler=profiler)
+    elif command == 'force':
+        states = run_stages(stages, manifest_path, force=args.stages, workers=args.workers, profiler=profiler)
+    else:
+        states = run_stages(stages, manifest_path, only=getattr(args, 'stages', None) or None,
+                            workers=getattr(args, 'workers', STAGE_WORKERS), profiler=profiler)
+    print('Stage states: ' + ', '.join(f'{name} {state}' for name, state in states.items()))
+    return 1 if any(state in ['failed', 'blocked'] for state in states.values()) else 0
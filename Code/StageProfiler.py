@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# profiling modes of a stage
+PROFILE_MODES = ('cprofile', 'sample')
+# seconds between two stack samples
+SAMPLE_INTERVAL = 0.005
+# functions listed in the text summary of a cProfile run
+TOP_FUNCTIONS = 40
+
+# stage of the threads running a profiled stage and of their helper threads, by thread ident
+_stage_threads = {}
+_lock = threading.Lock()
+
+
+# GDAL module, None without the raster stack
+def _gdal():
+    # imported when a stage is profiled, not when the pipeline is imported
+    try:
+        from osgeo import gdal
+    except ImportError:  # the profiler also runs without the raster stack
+        return None
+    return gdal
+
+
+# register the calling thread as the thread of a stage
+@contextmanager
+def stage_thread(name):
+    """
+    Register the calling thread as running stage `name` while the context is open.
+
+    Samplers of other stages skip registered threads, so concurrent stages
+    never show up in each other's flamegraphs.
+    """
+    ident = threading.get_ident()
+    with _lock:
+        previous = _stage_threads.get(ident)
+        _stage_threads[ident] = name
+    try:
+        yield
+    finally:
+        with _lock:
+            if previous is None:
+                # helper threads of the stage end with it, their idents may be reused
+                for thread_id in [t for t, stage in _stage_threads.items() if stage == name]:
+                    del _stage_threads[thread_id]
+            else:
+                _stage_threads[ident] = previous
+
+
+# register pool threads as helpers of the calling thread's stage
+def helper_initializer():
+    """
+    Return a thread pool initializer attributing the pool threads to the
+    stage of the calling thread (a no-op outside profiled stages).
+
+    Example
+    -------
+    >>> ThreadPoolExecutor(max_workers=8, initializer=StageProfiler.helper_initializer())
+    """
+    with _lock:
+        name = _stage_threads.get(threading.get_ident())
+
+    def register():
+        if name is not None:
+            with _lock:
+                _stage_threads[threading.get_ident()] = name
+    return register
+
+
+# low-overhead stack sampler
+class StackSampler:
+    """
+    Sample the Python stacks of a stage's threads and count identical stacks.
+
+    The stage thread, its registered helper threads (e.g. the download pool
+    of `TileEngine`, see `helper_initializer`) and unregistered threads
+    started while the stage runs are sampled. Threads that existed before
+    and the threads and helpers of other stages (see `stage_thread`), also
+    those started later, are not. The GDAL block cache usage is sampled
+    along with the stacks.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Seconds between two samples (default: `SAMPLE_INTERVAL`).
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.cache_peak = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stage_thread = None
+        self.excluded = set()
+
+    # sample until stopped
+    def _run(self):
+        gdal = _gdal()
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with _lock:
+                stage = _stage_threads.get(self.stage_thread)
+                other_stages = {t for t, name in _stage_threads.items() if name != stage}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or thread_id in self.excluded or thread_id in other_stages:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            if gdal is not None:
+                self.cache_peak = max(self.cache_peak, gdal.GetCacheUsed())
+
+    def start(self):
+        self.stage_thread = threading.get_ident()
+        self.excluded = {t.ident for t in threading.enumerate() if t.ident != self.stage_thread}
+        self.thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    # stacks in the collapsed format of flamegraph.pl and speedscope
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+# GDAL debug messages of a stage
+class GdalDebugLog:
+    """
+    Capture GDAL's debug output (`CPL_DEBUG=ON`) of a stage with timestamps.
+
+    Messages are written to a log file and counted by category (GTiff, COG,
+    WARP, GDAL, ...). The debug options are set as thread-local GDAL
+    options, like the error handler, so only the stage thread logs and
+    overlapping stages cannot leave debug output on for the rest of the run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.started = time.time()
+        self.categories = Counter()
+        self.previous = {}
+
+    def handler(self, level, number, message):
+        elapsed = time.time() - self.started
+        category = message.split(':', 1)[0] if ':' in message[:32] else 'other'
+        self.categories[category] += 1
+        self.file.write(f"{elapsed:10.3f} [{level}] {message}\n")
+
+    def start(self):
+        gdal = _gdal()
+        self.file = open(self.path, 'w')
+        for option, value in [('CPL_DEBUG', 'ON'), ('CPL_TIMESTAMP', 'ON')]:
+            self.previous[option] = gdal.GetThreadLocalConfigOption(option, None)
+            gdal.SetThreadLocalConfigOption(option, value)
+        gdal.PushErrorHandler(self.handler)
+
+    def stop(self):
+        gdal = _gdal()
+        gdal.PopErrorHandler()
+        for option, value in self.previous.items():
+            gdal.SetThreadLocalConfigOption(option, value)
+        self.file.close()
+
+
+# profile a stage and write its artifacts
+@contextmanager
+def profile_stage(name, folder, mode='sample', gdal_debug=False, interval=SAMPLE_INTERVAL):
+    """
+    Profile a pipeline stage and write the artifacts to `folder`.
+
+    Parameters
+    ----------
+    name : str
+        Stage name, used as the artifact file prefix.
+    folder : str
+        Artifact folder, e.g. next to the run report.
+    mode : str or None, optional
+        'sample' (default): stack sampler writing `<name>.collapsed` for
+        flamegraph.pl or speedscope. 'cprofile': deterministic profile
+        written as `<name>.prof` (pstats) and a `<name>.txt` summary.
+        None: no Python profile.
+    gdal_debug : bool, optional
+        Capture GDAL's debug output into `<name>.gdal.log` (default: False).
+    interval : float, optional
+        Sampling interval in seconds (default: `SAMPLE_INTERVAL`).
+
+    Notes
+    -----
+    - `<name>.gdal.json` holds the GDAL block cache limit, usage at start and
+      end and the peak seen by the sampler, and the debug message counts.
+      GDAL has no public hit/miss counters; a cache too small for the stage
+      shows as a peak at the limit together with a high `read_bytes` in the
+      `Telemetry` report.
+    - Python allows one deterministic profiler at a time: a cProfile
+      requested while another stage is being profiled falls back to sampling.
+    - The calling thread is registered as the stage's thread (see
+      `stage_thread`) while it runs.
+    """
+    # registered first, so samplers of concurrent stages skip this thread from the start
+    with stage_thread(name):
+        gdal = _gdal()
+        os.makedirs(folder, exist_ok=True)
+        prefix = os.path.join(folder, name)
+        profiler = sampler = debug_log = None
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                print(f"[WARNING] cProfile unavailable for stage {name} ({e}), sampling instead")
+                profiler = None
+                mode = 'sample'
+        if mode == 'sample' or gdal is not None:
+            # also used for the cache peak of cProfile runs
+            sampler = StackSampler(interval if mode == 'sample' else 0.1)
+            sampler.start()
+        if gdal_debug and gdal is not None:
+            debug_log = GdalDebugLog(prefix + '.gdal.log')
+            debug_log.start()
+        cache_start = gdal.GetCacheUsed() if gdal is not None else None
+        started = datetime.now().isoformat(timespec='seconds')
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            if sampler:
+                sampler.stop()
+            if debug_log:
+                debug_log.stop()
+            try:
+                if profiler:
+                    profiler.dump_stats(prefix + '.prof')
+                    with open(prefix + '.txt', 'w') as f:
+                        pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+                elif sampler and mode == 'sample':
+                    sampler.write_collapsed(prefix + '.collapsed')
+                if gdal is not None:
+                    stats = {
+                        'stage': name,
+                        'started': started,
+                        'cache_max_bytes': gdal.GetCacheMax(),
+                        'cache_used_start_bytes': cache_start,
+                        'cache_used_end_bytes': gdal.GetCacheUsed(),
+                        'cache_used_peak_bytes': max(sampler.cache_peak, cache_start, gdal.GetCacheUsed()),
+                        'samples': sampler.samples,
+                        'debug_messages': dict(debug_log.categories) if debug_log else None,
+                    }
+                    with open(prefix + '.gdal.json', 'w') as f:
+                        json.dump(stats, f, indent=1)
+                print(f"Profile of stage {name} written to {folder}")
+            except OSError as e:
+                print(f"[WARNING] Could not write the profile of stage {name}: {e}")
+
+
+# profiler factory for `StagePipeline.run_stages`
+def stage_profiler(folder, mode='sample', gdal_debug=False):
+    """
+    Return a function opening `profile_stage(name, folder, mode, gdal_debug)` for a stage name.
+
+    Example
+    -------
+    >>> StagePipeline.run_stages(stages, manifest_path, profiler=stage_profiler('Results/2025July_profile'))
+    """
+    return lambda name: profile_stage(name, folder, mode, gdal_debug)
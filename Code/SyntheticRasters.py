@@ -0,0 +1,346 @@
+import os
+import json
+import math
+import argparse
+import numpy as np
+from osgeo import gdal, ogr, osr
+import BlockRaster
+gdal.UseExceptions()
+
+
+# CONUS Albers, the grid of all local products
+EPSG = 5070
+
+# benchmark extents in EPSG:5070: top-left corner and size in meters
+SCALES = {
+    'state': {'origin': (0, 2250000), 'width': 300000, 'height': 300000},            # about Iowa
+    'region': {'origin': (-300000, 2600000), 'width': 1200000, 'height': 900000},    # Corn Belt
+    'conus_fraction': {'origin': (-1000000, 2800000), 'width': 2300000, 'height': 1400000},
+}
+
+# CDL classes and their approximate share of the cropland-dominated and natural landscapes
+CROP_LANDSCAPE = {1: 30, 5: 26, 24: 6, 36: 4, 37: 4, 61: 3, 4: 2, 176: 12, 141: 3, 121: 4, 122: 2, 111: 2, 195: 2}
+NATURAL_LANDSCAPE = {176: 25, 141: 22, 142: 8, 152: 14, 190: 6, 195: 3, 111: 5, 121: 5, 122: 3, 1: 5, 5: 4}
+
+# section grid of the Public Land Survey: quarter-section fields along one-mile roads
+FIELD_SIZE = 805
+ROAD_SPACING = 1609
+ROAD_WIDTH = 15
+# extent of landscapes sharing one class distribution
+LANDSCAPE_SIZE = 25000
+# share of misclassified pixels of a tile
+NOISE_RATE = 0.03
+
+# tile layouts: edge and spacing in meters, rotation of the scene footprint in degrees
+LANDSAT_LAYOUT = {'edge': 185000, 'spacing': 165000, 'rotation': 12, 'resolution': 30}
+SENTINEL2_LAYOUT = {'edge': 109800, 'spacing': 99800, 'rotation': 0, 'resolution': 10}
+
+
+# deterministic hash of integer grid cells
+def _hash(a, b, seed):
+    h = (a.astype(np.int64) * 73856093) ^ (b.astype(np.int64) * 19349663) ^ (seed * 83492791)
+    h = (h ^ (h >> 13)) * 1274126177
+    return ((h ^ (h >> 16)) & 0xFFFFFFFF).astype(np.float64) / 2 ** 32
+
+
+# cumulative class distribution of a landscape
+def _distribution(shares):
+    classes = np.array(list(shares), dtype=np.uint8)
+    weights = np.array(list(shares.values()), dtype=np.float64)
+    return classes, np.cumsum(weights) / weights.sum()
+
+
+# CDL-like classes on a grid window
+def class_block(x0, y0, cols, rows, resolution, seed=0):
+    """
+    Generate CDL-like classes for a grid window in EPSG:5070.
+
+    Classes depend only on the map coordinates, so overlapping tiles agree
+    where they overlap, like classifications of the same fields.
+
+    Parameters
+    ----------
+    x0, y0 : float
+        Top-left corner of the window in meters.
+    cols, rows : int
+        Window size in pixels.
+    resolution : float
+        Pixel size in meters.
+    seed : int, optional
+        Landscape seed (default: 0).
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 classes of shape (rows, cols).
+
+    Notes
+    -----
+    - Quarter-section fields (`FIELD_SIZE`) of one class, some split in
+      halves, give the spatial autocorrelation of the CDL.
+    - Landscapes of `LANDSCAPE_SIZE` are cropland-dominated or natural.
+    - One-mile section roads are developed/open space (class 121).
+    """
+    x = x0 + (np.arange(cols) + 0.5) * resolution
+    y = y0 - (np.arange(rows) + 0.5) * resolution
+    fx = np.floor(x / FIELD_SIZE)[np.newaxis, :]
+    fy = np.floor(y / FIELD_SIZE)[:, np.newaxis]
+    fx, fy = np.broadcast_arrays(fx, fy)
+
+    # split some fields in halves along x or y
+    split = _hash(fx, fy, seed + 7)
+    half_x = np.floor(x / (FIELD_SIZE / 2))[np.newaxis, :] % 2
+    half_y = np.floor(y / (FIELD_SIZE / 2))[:, np.newaxis] % 2
+    part = np.where(split < 0.25, half_x, np.where(split < 0.5, half_y, 0))
+    u = _hash(fx * 2 + part, fy * 2 + part, seed)
+
+    lx, ly = np.broadcast_arrays(np.floor(x / LANDSCAPE_SIZE)[np.newaxis, :], np.floor(y / LANDSCAPE_SIZE)[:, np.newaxis])
+    crop = _hash(lx, ly, seed + 1) < 0.6
+    classes = np.empty((rows, cols), dtype=np.uint8)
+    for mask, shares in [(crop, CROP_LANDSCAPE), (~crop, NATURAL_LANDSCAPE)]:
+        values, cumulative = _distribution(shares)
+        classes[mask] = values[np.minimum(np.searchsorted(cumulative, u[mask]), len(values) - 1)]
+
+    road_x = np.abs((x + ROAD_SPACING / 2) % ROAD_SPACING - ROAD_SPACING / 2) < max(ROAD_WIDTH, resolution) / 2
+    road_y = np.abs((y + ROAD_SPACING / 2) % ROAD_SPACING - ROAD_SPACING / 2) < max(ROAD_WIDTH, resolution) / 2
+    classes[road_y[:, np.newaxis] | road_x[np.newaxis, :]] = 121
+    return classes
+
+
+# tiles of a sensor layout covering an extent
+def tile_layout(scale, layout, coarsen=1):
+    """
+    Return the overlapping tiles of a sensor covering a benchmark extent.
+
+    Parameters
+    ----------
+    scale : dict
+        Extent of `SCALES`.
+    layout : dict
+        `LANDSAT_LAYOUT` or `SENTINEL2_LAYOUT`.
+    coarsen : int, optional
+        Factor applied to the pixel size to shrink quick runs (default: 1).
+
+    Returns
+    -------
+    list of dict
+        Tiles with `name`, `center`, grid-aligned top-left corner `x0`, `y0`
+        and size `cols`, `rows` of the raster holding the (rotated) footprint.
+    """
+    resolution = layout['resolution'] * coarsen
+    angle = math.radians(layout['rotation'])
+    # bounding box of the rotated scene
+    extent = layout['edge'] * (abs(math.cos(angle)) + abs(math.sin(angle)))
+    size = int(math.ceil(extent / resolution))
+    x_min, y_max = scale['origin']
+    tiles = []
+    nx = max(1, int(math.ceil((scale['width'] - layout['edge']) / layout['spacing'])) + 1)
+    ny = max(1, int(math.ceil((scale['height'] - layout['edge']) / layout['spacing'])) + 1)
+    for j in range(ny):
+        for i in range(nx):
+            cx = x_min + layout['edge'] / 2 + i * layout['spacing']
+            cy = y_max - layout['edge'] / 2 - j * layout['spacing']
+            # corners snapped to the sensor grid, as exported at EPSG:5070
+            x0 = math.floor((cx - extent / 2) / resolution) * resolution
+            y0 = math.ceil((cy + extent / 2) / resolution) * resolution
+            tiles.append({'name': f'{i:02d}_{j:02d}', 'center': (cx, cy), 'x0': x0, 'y0': y0,
+                          'cols': size, 'rows': size})
+    return tiles
+
+
+# footprint mask of a tile window
+def footprint_mask(tile, layout, x0, y0, cols, rows, resolution, seed=0):
+    """
+    Flag the pixels of a window inside the tile's scene footprint.
+
+    Landsat scenes are rotated squares; one in four Sentinel-2 tiles is cut
+    by a swath edge. Pixels outside become NoData borders.
+    """
+    x = x0 + (np.arange(cols) + 0.5) * resolution - tile['center'][0]
+    y = y0 - (np.arange(rows) + 0.5) * resolution - tile['center'][1]
+    angle = math.radians(layout['rotation'])
+    u = x[np.newaxis, :] * math.cos(angle) + y[:, np.newaxis] * math.sin(angle)
+    v = -x[np.newaxis, :] * math.sin(angle) + y[:, np.newaxis] * math.cos(angle)
+    half = layout['edge'] / 2
+    inside = (np.abs(u) < half) & (np.abs(v) < half)
+    cut = _hash(np.array([int(tile['center'][0])]), np.array([int(tile['center'][1])]), seed + 3)[0]
+    if layout['rotation'] == 0 and cut < 0.25:
+        # diagonal swath edge through the tile
+        inside &= u + v < (cut * 8 - 1) * half
+    return inside
+
+
+# one synthetic classified tile
+def write_tile(path, tile, layout, coarsen=1, seed=0, block_size=BlockRaster.BLOCK_SIZE):
+    """
+    Write a synthetic classified tile as a uint8 GeoTIFF with NoData 0 in EPSG:5070.
+
+    Parameters
+    ----------
+    path : str
+        Output GeoTIFF.
+    tile : dict
+        Tile of `tile_layout`.
+    layout : dict
+        Sensor layout of the tile.
+    coarsen : int, optional
+        Pixel size factor (default: 1).
+    seed : int, optional
+        Landscape seed; the classification noise also depends on the tile.
+    block_size : int, optional
+        Generation window edge (default: `BlockRaster.BLOCK_SIZE`).
+    """
+    resolution = layout['resolution'] * coarsen
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds = gdal.GetDriverByName('GTiff').Create(
+        path, tile['cols'], tile['rows'], 1, gdal.GDT_Byte,
+        options=['TILED=YES', 'COMPRESS=DEFLATE', 'BIGTIFF=IF_SAFER']
+    )
+    ds.SetGeoTransform((tile['x0'], resolution, 0, tile['y0'], 0, -resolution))
+    ds.SetProjection(srs.ExportToWkt())
+    band = ds.GetRasterBand(1)
+    band.SetNoDataValue(0)
+    rng = np.random.default_rng([seed, int(tile['center'][0]) % 2 ** 31, int(tile['center'][1]) % 2 ** 31])
+    values, cumulative = _distribution(CROP_LANDSCAPE)
+    for xoff, yoff, cols, rows in BlockRaster.block_windows(tile['cols'], tile['rows'], block_size):
+        bx0 = tile['x0'] + xoff * resolution
+        by0 = tile['y0'] - yoff * resolution
+        classes = class_block(bx0, by0, cols, rows, resolution, seed)
+        # misclassified pixels, different in every tile
+        noise = rng.random((rows, cols)) < NOISE_RATE
+        classes[noise] = values[np.minimum(np.searchsorted(cumulative, rng.random(int(noise.sum()))), len(values) - 1)]
+        classes[~footprint_mask(tile, layout, bx0, by0, cols, rows, resolution, seed)] = 0
+        band.WriteArray(classes, xoff, yoff)
+    band = None
+    ds = None
+
+
+# boundary polygon of a benchmark extent
+def write_boundary(path, scale, seed=0, source=None, vertices=256):
+    """
+    Write the clip boundary of a benchmark extent as an EPSG:5070 shapefile.
+
+    Parameters
+    ----------
+    path : str
+        Output shapefile.
+    scale : dict
+        Extent of `SCALES`.
+    seed : int, optional
+        Seed of the synthetic boundary (default: 0).
+    source : str, optional
+        Real CONUS boundary shapefile in EPSG:5070, cut to the extent so the
+        clipped output keeps the size of the benchmark scale. Defaults to
+        None, an irregular synthetic polygon inside the extent.
+    vertices : int, optional
+        Vertices of the synthetic polygon (default: 256).
+    """
+    x_min, y_max = scale['origin']
+    x_max, y_min = x_min + scale['width'], y_max - scale['height']
+    if source:
+        source_ds = ogr.Open(source)
+        layer = source_ds.GetLayer()
+        boundary = ogr.Geometry(ogr.wkbMultiPolygon)
+        for feature in layer:
+            boundary = boundary.Union(feature.GetGeometryRef())
+        extent = ogr.CreateGeometryFromWkt(
+            f'POLYGON(({x_min} {y_min},{x_max} {y_min},{x_max} {y_max},{x_min} {y_max},{x_min} {y_min}))')
+        polygon = boundary.Intersection(extent)
+        source_ds = None
+    else:
+        cx, cy = (x_min + x_max) / 2, (y_min + y_max) / 2
+        rng = np.random.default_rng(seed)
+        # smooth random radius: low-frequency harmonics
+        angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+        radius = 0.85 + sum(rng.uniform(-0.04, 0.04) * np.sin(k * angles + rng.uniform(0, 2 * np.pi)) for k in range(2, 9))
+        ring = ogr.Geometry(ogr.wkbLinearRing)
+        for a, r in zip(angles, radius):
+            ring.AddPoint_2D(cx + r * scale['width'] / 2 * math.cos(a), cy + r * scale['height'] / 2 * math.sin(a))
+        ring.CloseRings()
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(ring)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    driver = ogr.GetDriverByName('ESRI Shapefile')
+    if os.path.exists(path):
+        driver.DeleteDataSource(path)
+    ds = driver.CreateDataSource(path)
+    layer = ds.CreateLayer('boundary', srs, ogr.wkbMultiPolygon if source else ogr.wkbPolygon)
+    feature = ogr.Feature(layer.GetLayerDefn())
+    feature.SetGeometry(polygon)
+    layer.CreateFeature(feature)
+    feature = None
+    ds = None
+
+
+# synthetic inputs of one benchmark scale
+def generate_inputs(folder, scale_name, coarsen=1, seed=0, shapefile=None):
+    """
+    Generate the synthetic Landsat and Sentinel-2 tiles and the boundary of a benchmark scale.
+
+    Inputs are reused if they were already generated with the same options.
+
+    Parameters
+    ----------
+    folder : str
+        Output folder; tiles are written to `L89/` and `S2/`.
+    scale_name : str
+        Key of `SCALES`.
+    coarsen : int, optional
+        Pixel size factor, e.g. 4 for 40 m / 120 m quick runs (default: 1).
+    seed : int, optional
+        Landscape seed (default: 0).
+    shapefile : str, optional
+        Real CONUS boundary shapefile in EPSG:5070, cut to the extent.
+        Defaults to None, a synthetic boundary inside the extent.
+
+    Returns
+    -------
+    dict
+        Folders, shapefile, resolutions and tile and pixel counts.
+
+    Example
+    -------
+    >>> generate_inputs('/data/bench/state', 'state', coarsen=4)
+    """
+    scale = SCALES[scale_name]
+    options = {'scale': scale_name, 'coarsen': coarsen, 'seed': seed, 'shapefile': shapefile}
+    meta_path = os.path.join(folder, 'inputs.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('options') == options:
+            print(f"[REUSED] Synthetic inputs of {scale_name} in {folder}")
+            return meta
+
+    meta = {'options': options, 'l89_resolution': LANDSAT_LAYOUT['resolution'] * coarsen,
+            's2_resolution': SENTINEL2_LAYOUT['resolution'] * coarsen, 'pixels': 0}
+    for key, layout in [('l89', LANDSAT_LAYOUT), ('s2', SENTINEL2_LAYOUT)]:
+        tile_folder = os.path.join(folder, key.upper())
+        os.makedirs(tile_folder, exist_ok=True)
+        tiles = tile_layout(scale, layout, coarsen)
+        for tile in tiles:
+            write_tile(os.path.join(tile_folder, f"Synthetic_{key.upper()}_{tile['name']}.tif"), tile, layout, coarsen, seed)
+            meta['pixels'] += tile['cols'] * tile['rows']
+        meta[f'{key}_folder'] = tile_folder
+        meta[f'{key}_tiles'] = len(tiles)
+        print(f"{len(tiles)} synthetic {key.upper()} tiles written to {tile_folder}")
+
+    meta['shapefile'] = os.path.join(folder, 'boundary_5070.shp')
+    write_boundary(meta['shapefile'], scale, seed, shapefile)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic classified tiles in EPSG:5070.')
+    parser.add_argument('folder')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='state')
+    parser.add_argument('--coarsen', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shapefile', default=None, help='real CONUS boundary shapefile (EPSG:5070)')
+    args = parser.parse_args()
+    generate_inputs(args.folder, args.scale, args.coarsen, args.seed, args.shapefile)
@@ -0,0 +1,326 @@
+import json
+import time
+import resource
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import ApiMetrics
+import JsonStore
+
+
+# prefix of the Prometheus metric names
+METRIC_PREFIX = 'inseason'
+
+# accumulated metrics of the current run, by stage name
+_stages = {}
+_lock = threading.Lock()
+# stage measured by the current thread, target of `count`
+_local = threading.local()
+
+
+# byte counters of this process
+def io_counters():
+    """
+    Read the I/O counters of this process from `/proc/self/io`.
+
+    Returns
+    -------
+    dict
+        `read_bytes` and `write_bytes` fetched from / sent to the storage
+        layer, and `rchar` and `wchar` passed through read/write calls
+        (including network sockets). Empty where `/proc` is unavailable.
+    """
+    counters = {}
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                key, value = line.split(':')
+                counters[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return counters
+
+
+# CPU seconds of this process and its finished child processes
+def cpu_seconds():
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return self_usage.ru_utime + self_usage.ru_stime + children.ru_utime + children.ru_stime
+
+
+# peak resident set size of this process in bytes
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    # kilobytes on Linux, never reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# restart the peak RSS measurement (Linux only)
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+# CPU, peak RSS and I/O of this process so far
+def process_usage():
+    """
+    Return the resource counters of this process.
+
+    Returns
+    -------
+    dict
+        `cpu_seconds` (see `cpu_seconds`), `peak_rss_bytes` (see `peak_rss`)
+        and `read_bytes`, `written_bytes`, `read_chars`, `written_chars`
+        (see `io_counters`).
+    """
+    io = io_counters()
+    return {'cpu_seconds': cpu_seconds(), 'peak_rss_bytes': peak_rss(),
+            'read_bytes': io.get('read_bytes', 0), 'written_bytes': io.get('write_bytes', 0),
+            'read_chars': io.get('rchar', 0), 'written_chars': io.get('wchar', 0)}
+
+
+# start of the current run report and the process counters at that time
+_run = {'started': time.time(), 'usage': process_usage()}
+
+
+# empty metrics of a stage
+def _new_stage():
+    return {'calls': 0, 'errors': 0, 'wall_seconds': 0.0, 'items': {}}
+
+
+# measure a stage of the run
+@contextmanager
+def measure(name, **items):
+    """
+    Measure a stage: wall time, errors and item counts.
+
+    Repeated measurements of the same name (e.g. every tile submission) are
+    accumulated into one stage record.
+
+    Parameters
+    ----------
+    name : str
+        Stage name, e.g. 'clip_10m' or 'tiles.download'.
+    **items
+        Initial item counts of the stage, e.g. `tiles=len(tiles)`.
+
+    Example
+    -------
+    >>> with Telemetry.measure('resample_30m'):
+    ...     ResampleTool.resample(clipped_path, resampled_path, 'COG', 30)
+
+    Notes
+    -----
+    - CPU time, peak RSS and bytes read and written are only available for
+      the whole process: independent stages run side by side
+      (`StagePipeline.run_stages`) and a stage's work spreads over download
+      threads, GDAL threads and process pools. They are reported for the
+      run (see `run_report`), never split by stage.
+    """
+    previous = getattr(_local, 'stage', None)
+    _local.stage = name
+    wall_start = time.time()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        wall = time.time() - wall_start
+        _local.stage = previous
+        with _lock:
+            record = _stages.setdefault(name, _new_stage())
+            record['calls'] += 1
+            record['errors'] += failed
+            record['wall_seconds'] += wall
+            for item, n in items.items():
+                record['items'][item] = record['items'].get(item, 0) + n
+
+
+# add to an item count of a stage
+def count(item, n=1, stage=None):
+    """
+    Add to an item count, e.g. tiles, files or bytes downloaded.
+
+    Parameters
+    ----------
+    item : str
+        Item name.
+    n : int or float, optional
+        Amount to add (default: 1).
+    stage : str, optional
+        Stage name. Defaults to None, the stage measured by the calling
+        thread; counts outside any stage are recorded under 'run'.
+    """
+    stage = stage or getattr(_local, 'stage', None) or 'run'
+    with _lock:
+        items = _stages.setdefault(stage, _new_stage())['items']
+        items[item] = items.get(item, 0) + n
+
+
+# start a new run report
+def reset():
+    with _lock:
+        _stages.clear()
+        reset_peak_rss()
+        _run['started'] = time.time()
+        _run['usage'] = process_usage()
+    ApiMetrics.reset()
+
+
+# metrics of the run so far
+def run_report(**labels):
+    """
+    Return the run report: resource use of the run and the metrics of every stage.
+
+    Parameters
+    ----------
+    **labels
+        Run labels stored with the report, e.g. `year=2025, month='July'`.
+
+    Returns
+    -------
+    dict
+        `{'labels', 'started', 'finished', 'wall_seconds', 'cpu_seconds',
+        'peak_rss_bytes', 'read_bytes', 'written_bytes', 'read_chars',
+        'written_chars', 'stages': {name: metrics}, 'api': {endpoint: metrics}}`.
+        CPU time and bytes count since the start of the run (see `reset`),
+        the peak RSS since the last reset where Linux supports it. Stages
+        hold `calls`, `errors`, `wall_seconds` and `items`; the API metrics
+        are those of `ApiMetrics.snapshot`.
+    """
+    with _lock:
+        stages = json.loads(json.dumps(_stages))
+        started, start_usage = _run['started'], _run['usage']
+    usage = process_usage()
+    report = {
+        'labels': {key: str(value) for key, value in labels.items()},
+        'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+        'finished': datetime.now().isoformat(timespec='seconds'),
+        'wall_seconds': round(time.time() - started, 3),
+        'cpu_seconds': round(usage['cpu_seconds'] - start_usage['cpu_seconds'], 3),
+        'peak_rss_bytes': usage['peak_rss_bytes'],
+    }
+    for key in ['read_bytes', 'written_bytes', 'read_chars', 'written_chars']:
+        report[key] = usage[key] - start_usage[key]
+    report['stages'] = stages
+    report['api'] = ApiMetrics.snapshot()
+    return report
+
+
+# Prometheus label set
+def _labels(**labels):
+    escaped = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+# run report in the Prometheus text exposition format
+def prometheus_text(report):
+    """
+    Format a run report for the node_exporter textfile collector.
+
+    Parameters
+    ----------
+    report : dict
+        Report of `run_report`.
+
+    Returns
+    -------
+    str
+        Gauges `inseason_stage_*{stage=...}` per stage (wall time, calls, errors),
+        `inseason_stage_items{stage=...,item=...}` per item count,
+        `inseason_api_*{endpoint=...}` counters and latency histograms per
+        API endpoint and `inseason_run_*` totals (wall and CPU time, peak RSS,
+        bytes read and written), all labelled with the run labels.
+    """
+    labels = report['labels']
+    metrics = [
+        ('stage_wall_seconds', 'wall_seconds', 'Wall time of the stage.'),
+        ('stage_calls', 'calls', 'Measurements accumulated into the stage.'),
+        ('stage_errors', 'errors', 'Measurements of the stage ending with an exception.'),
+    ]
+    lines = []
+    for metric, key, help_text in metrics:
+        lines.append(f'# HELP {METRIC_PREFIX}_{metric} {help_text}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_{metric} gauge')
+        for stage, record in sorted(report['stages'].items()):
+            lines.append(f'{METRIC_PREFIX}_{metric}{_labels(**labels, stage=stage)} {record[key]}')
+    lines.append(f'# HELP {METRIC_PREFIX}_stage_items Items processed by the stage.')
+    lines.append(f'# TYPE {METRIC_PREFIX}_stage_items gauge')
+    for stage, record in sorted(report['stages'].items()):
+        for item, n in sorted(record['items'].items()):
+            lines.append(f'{METRIC_PREFIX}_stage_items{_labels(**labels, stage=stage, item=item)} {n}')
+    for metric, key, help_text in [
+        ('api_calls_total', 'calls', 'Calls of the API endpoint.'),
+        ('api_errors_total', 'errors', 'Calls of the API endpoint raising an error.'),
+        ('api_quota_errors_total', 'quota_errors', 'Rate limit and quota errors of the API endpoint.'),
+        ('api_bytes_total', 'bytes', 'Bytes transferred by the API endpoint.'),
+    ]:
+        lines.append(f'# HELP {METRIC_PREFIX}_{metric} {help_text}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_{metric} counter')
+        for endpoint, metrics_of in report['api'].items():
+            lines.append(f'{METRIC_PREFIX}_{metric}{_labels(**labels, endpoint=endpoint)} {metrics_of[key]}')
+    lines.append(f'# HELP {METRIC_PREFIX}_api_latency_seconds Latency of the API endpoint.')
+    lines.append(f'# TYPE {METRIC_PREFIX}_api_latency_seconds histogram')
+    for endpoint, metrics_of in report['api'].items():
+        for bound, n in metrics_of['buckets'].items():
+            lines.append(f'{METRIC_PREFIX}_api_latency_seconds_bucket{_labels(**labels, endpoint=endpoint, le=bound)} {n}')
+        lines.append(f'{METRIC_PREFIX}_api_latency_seconds_sum{_labels(**labels, endpoint=endpoint)} {metrics_of["latency_sum"]}')
+        lines.append(f'{METRIC_PREFIX}_api_latency_seconds_count{_labels(**labels, endpoint=endpoint)} {metrics_of["calls"]}')
+    for metric, key, help_text in [('run_wall_seconds', 'wall_seconds', 'Wall time of the run.'),
+                                   ('run_cpu_seconds', 'cpu_seconds', 'CPU time of the run.'),
+                                   ('run_peak_rss_bytes', 'peak_rss_bytes', 'Peak resident set size of the run.'),
+                                   ('run_read_bytes', 'read_bytes', 'Bytes read from storage during the run.'),
+                                   ('run_written_bytes', 'written_bytes', 'Bytes written to storage during the run.')]:
+        lines.append(f'# HELP {METRIC_PREFIX}_{metric} {help_text}')
+        lines.append(f'# TYPE {METRIC_PREFIX}_{metric} gauge')
+        lines.append(f'{METRIC_PREFIX}_{metric}{_labels(**labels)} {report[key]}')
+    lines.append(f'# HELP {METRIC_PREFIX}_run_finished_timestamp_seconds End of the run.')
+    lines.append(f'# TYPE {METRIC_PREFIX}_run_finished_timestamp_seconds gauge')
+    lines.append(f'{METRIC_PREFIX}_run_finished_timestamp_seconds{_labels(**labels)} {time.time():.0f}')
+    return '\n'.join(lines) + '\n'
+
+
+# JSON run report and Prometheus textfile
+def write_report(report_path, textfile_path=None, **labels):
+    """
+    Write the run report as JSON and, optionally, as a Prometheus textfile.
+
+    Parameters
+    ----------
+    report_path : str
+        JSON run report, e.g. `Results/2025July_run_report.json`.
+    textfile_path : str, optional
+        `.prom` file in the directory of the node_exporter textfile
+        collector. Defaults to None (JSON only).
+    **labels
+        Run labels, e.g. `year=2025, month='July'`.
+
+    Returns
+    -------
+    dict
+        The report written.
+    """
+    report = run_report(**labels)
+    try:
+        JsonStore.write_json_atomic(report_path, report, indent=1, sort_keys=True)
+        if textfile_path:
+            JsonStore.write_text_atomic(textfile_path, prometheus_text(report))
+        print(f"Run report saved to {report_path}")
+    except OSError as e:
+        print(f"[WARNING] Could not write the run report: {e}")
+    return report
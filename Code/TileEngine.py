@@ -0,0 +1,850 @@
+import os
+import json
+import calendar
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import ee
+import ApiMetrics
+import DownloadTool
+import ExportProfile
+import MajorityFilter
+import MosaicMultiImg
+import RegionModel
+import RemapTable
+import RemapTool
+import RetryPolicy
+import SampleCache
+import StageProfiler
+import Telemetry
+import TileFootprint
+import TileManifest
+
+
+# concurrent Earth Engine export tasks shared by all sensors
+MAX_ACTIVE_TASKS = 200
+# seconds between two status polls of the active tasks
+POLL_INTERVAL = 30
+# parallel Drive downloads shared by all sensors
+DOWNLOAD_WORKERS = 4
+
+# temporal compositing modes: period length as (days, months)
+COMPOSITE_PERIODS = {
+    'biweekly': (14, 0),
+    'monthly': (0, 1),
+}
+
+
+# time-series collection of a single tile with spectral indices
+def tileImageCollection(profile, tile, startDate, endDate):
+    """
+    Build the filtered time-series collection of a tile for a sensor profile.
+
+    Parameters
+    ----------
+    profile : dict
+        Sensor profile (see `AutomatedL89Mapping.L89Profile`).
+    tile : list or str
+        Tile identifier of the sensor (WRS [path, row] or MGRS tile).
+    startDate : str
+        Start date for filtering images (YYYY-MM-DD).
+    endDate : str
+        End date for filtering images (YYYY-MM-DD).
+
+    Returns
+    -------
+    ee.ImageCollection
+        Collection sorted by time holding the profile bands, including the
+        normalized-difference indices of the profile.
+    """
+    indices = profile['indices']
+
+    def addIndices(image):
+        for name, pair in indices:
+            image = image.addBands(image.normalizedDifference(pair).rename(name))
+        return image
+
+    collection = profile['collection'](tile, startDate, endDate, profile['cloudCover'])
+    return collection.map(addIndices).select(profile['bands'])
+
+
+# fixed composite periods between two dates
+def compositePeriods(startDate, endDate, composite_mode):
+    """
+    Split the date range into consecutive compositing periods.
+
+    Parameters
+    ----------
+    startDate : str
+        Start date of the season (YYYY-MM-DD).
+    endDate : str
+        End date, exclusive (YYYY-MM-DD).
+    composite_mode : str
+        Key of `COMPOSITE_PERIODS` ('biweekly' or 'monthly').
+
+    Returns
+    -------
+    list of tuple of str
+        `(start, end)` dates of each period. The last period is cut at `endDate`.
+
+    Example
+    -------
+    >>> compositePeriods('2025-05-01', '2025-07-15', 'monthly')
+    [('2025-05-01', '2025-06-01'), ('2025-06-01', '2025-07-01'), ('2025-07-01', '2025-07-15')]
+    """
+    days, months = COMPOSITE_PERIODS[composite_mode]
+    start = datetime.strptime(startDate, '%Y-%m-%d')
+    end = datetime.strptime(endDate, '%Y-%m-%d')
+
+    # k-th period boundary, month steps keep the day of month where possible
+    def boundary(k):
+        month_index = start.month - 1 + months * k
+        year, month = start.year + month_index // 12, month_index % 12 + 1
+        day = min(start.day, calendar.monthrange(year, month)[1])
+        return start.replace(year=year, month=month, day=day) + timedelta(days=days * k)
+
+    periods = []
+    k = 0
+    while boundary(k) < end:
+        periods.append((boundary(k).strftime('%Y-%m-%d'), min(boundary(k + 1), end).strftime('%Y-%m-%d')))
+        k += 1
+    return periods
+
+
+# periodic median composites of a tile time series
+def compositeImage(series, bands, startDate, endDate, composite_mode):
+    """
+    Reduce a tile time series to one median composite per period.
+
+    Parameters
+    ----------
+    series : ee.ImageCollection
+        Tile time series holding `bands` (see `tileImageCollection`).
+    bands : list of str
+        Bands of the series, including the spectral indices.
+    startDate : str
+        Start date of the season (YYYY-MM-DD).
+    endDate : str
+        End date, exclusive (YYYY-MM-DD).
+    composite_mode : str
+        Key of `COMPOSITE_PERIODS` ('biweekly' or 'monthly').
+
+    Returns
+    -------
+    ee.Image
+        Stack of median composites with bands named `P<period>_<band>`,
+        e.g. `P00_NDVI`. Periods without acquisition are filled with 0,
+        so the number of features only depends on the season length and
+        not on the number of scenes of the tile.
+    """
+    composites = []
+    for i, (period_start, period_end) in enumerate(compositePeriods(startDate, endDate, composite_mode)):
+        period = series.filterDate(period_start, period_end)
+        empty = ee.Image.constant([0] * len(bands)).rename(bands).toFloat()
+        median = ee.Image(ee.Algorithms.If(period.size().gt(0), period.median().toFloat(), empty))
+        composites.append(median.select(bands).rename([f'P{i:02d}_{band}' for band in bands]))
+    return ee.Image.cat(composites)
+
+
+# feature image and footprint of a tile
+def tileFeatures(profile, tile, startDate, endDate, composite_mode=None, footprint=None):
+    """
+    Build the classification features and the footprint of a tile.
+
+    Parameters
+    ----------
+    profile : dict
+        Sensor profile (see `AutomatedL89Mapping.L89Profile`).
+    tile : list or str
+        Tile identifier of the sensor.
+    startDate : str
+        Start date for filtering images (YYYY-MM-DD).
+    endDate : str
+        End date for filtering images (YYYY-MM-DD).
+    composite_mode : str, optional
+        'biweekly' or 'monthly' for periodic composites (see `compositeImage`).
+    footprint : ee.Geometry, optional
+        Simplified tile footprint (see `TileFootprint`). Defaults to None, the
+        union of the scene footprints.
+
+    Returns
+    -------
+    tuple of (ee.Image, ee.Geometry)
+        Feature image (time series as bands) and tile geometry.
+    """
+    series = tileImageCollection(profile, tile, startDate, endDate)
+    if composite_mode:
+        # bounded number of features: one composite per period
+        tileImage = compositeImage(series, profile['bands'], startDate, endDate, composite_mode)
+        return tileImage, footprint if footprint is not None else series.geometry()
+    # convert time-series ImageCollection to single Image
+    tileImage = series.toBands()
+    return tileImage, footprint if footprint is not None else tileImage.geometry()
+
+
+# training samples of a tile
+def trainingSamples(profile, tileImage, tileGeometry, CONUStrainingLabel, sample_points=None, numPoints=None):
+    """
+    Sample the training features of a tile from the trusted-pixel labels.
+
+    Parameters
+    ----------
+    profile : dict
+        Sensor profile.
+    tileImage : ee.Image
+        Feature image of the tile (see `tileFeatures`).
+    tileGeometry : ee.Geometry
+        Tile geometry.
+    CONUStrainingLabel : ee.Image
+        Training label image with a `cropland` band.
+    sample_points : ee.FeatureCollection, optional
+        Cached training locations (see `SampleCache`). If given, features are
+        sampled at these points instead of a stratified sample over the tile.
+    numPoints : int, optional
+        Points per class of the stratified sample (default: profile's `numPoints`).
+
+    Returns
+    -------
+    ee.FeatureCollection
+        Training features with a `cropland` property.
+    """
+    if sample_points is not None:
+        # sample the new features at the cached training locations
+        return tileImage.sampleRegions(
+            collection=sample_points,
+            properties=['cropland'],
+            scale=profile['sampleScale']
+        )
+    # clip label image from trusted pixel raster
+    tileTrainingLabel = CONUStrainingLabel.clip(tileGeometry)
+    # training samples generation by stratified sampling method
+    return tileImage.addBands(tileTrainingLabel).stratifiedSample(
+        numPoints=numPoints or profile['numPoints'],
+        classBand='cropland',
+        region=tileGeometry,
+        scale=profile['sampleScale']  # matching to the sensor's spatial resolution
+    )
+
+
+# single tile time-series classification for any sensor
+def classifyTile(profile, tile, startDate, endDate, CONUStrainingLabel, composite_mode=None, sample_points=None,
+                 classifier=None, footprint=None, majority_filter=True):
+    """
+    Classify a single tile time-series image using Random Forest.
+
+    Parameters
+    ----------
+    profile : dict
+        Sensor profile (see `AutomatedL89Mapping.L89Profile`).
+    tile : list or str
+        Tile identifier of the sensor.
+    startDate : str
+        Start date for filtering images (YYYY-MM-DD).
+    endDate : str
+        End date for filtering images (YYYY-MM-DD), also used in the description.
+    CONUStrainingLabel : ee.Image
+        Training label image with a `cropland` band.
+    composite_mode : str, optional
+        'biweekly' or 'monthly' to classify periodic median composites instead
+        of every scene (see `compositeImage`). Defaults to None (all scenes).
+    sample_points : ee.FeatureCollection, optional
+        Cached training locations with a `cropland` property (see `SampleCache`).
+        If given, features are only sampled at these points instead of running
+        a stratified sample over the whole tile. Defaults to None.
+    classifier : ee.Classifier, optional
+        Trained regional classifier (see `RegionModel`). If given, the tile is
+        classified without per-tile sampling and training. Defaults to None.
+    footprint : ee.Geometry, optional
+        Simplified tile footprint used for clipping, sampling and export
+        (see `TileFootprint`). Defaults to None, the union of the scene footprints.
+    majority_filter : bool, optional
+        Apply the 3x3 `focal_mode` in Earth Engine (default: True). Disable it
+        when the mosaic is filtered locally (see `MajorityFilter.filter_raster`).
+
+    Returns
+    -------
+    ee.Dictionary
+        Dictionary containing:
+        - 'image': Classified ee.Image or 'null' if classification not possible.
+        - 'description': String describing the tile classification or 'null'.
+        - 'region': ee.Geometry of the tile or 'null'.
+    """
+    tileImage, tileGeometry = tileFeatures(profile, tile, startDate, endDate, composite_mode, footprint)
+
+    # define decription of this tile's classification
+    output_description = profile['tileName'](tile) + '_' + endDate
+
+    # return null image and description, if training sample is not availabel
+    def imgNull():
+        return ee.Dictionary({'image': 'null', 'description': 'null', 'region': 'null'})
+
+    # time-series classification and post processing
+    def imgOutput(trainedClassifier):
+        classified = (tileImage.classify(trainedClassifier)
+                      .clip(tileGeometry)
+                      .set('type', 'classification')
+                      .toUint8())
+
+        if not majority_filter:
+            return ee.Dictionary({'image': classified, 'description': output_description, 'region': tileGeometry})
+
+        # remove noise by using majorty filter
+        majority_filtered = classified.focal_mode(
+            radius=1,  # radius in pixels (1 = 3x3 window)
+            units='pixels',
+            kernelType='square',
+            iterations=1
+        )
+        return ee.Dictionary({'image': majority_filtered, 'description': output_description, 'region': tileGeometry})
+
+    # classification processing
+    def imgClassified():
+        if classifier is not None:
+            return imgOutput(classifier)
+
+        trainingSample = trainingSamples(profile, tileImage, tileGeometry, CONUStrainingLabel, sample_points)
+        trainedClassifier = ee.Classifier.smileRandomForest(20).train(
+            features=trainingSample,
+            classProperty='cropland',
+            inputProperties=tileImage.bandNames()
+        )
+
+        # conduct classification by judging the training sample's count
+        return ee.Algorithms.If(trainingSample.size().neq(0).And(trainingSample.aggregate_count_distinct("cropland").neq(1)), imgOutput(trainedClassifier), imgNull())
+
+    # conduct classification and return result if the tile has any acquisition
+    sceneCount = tileImageCollection(profile, tile, startDate, endDate).size()
+    return ee.Algorithms.If(sceneCount.neq(0), imgClassified(), imgNull())
+
+
+# interleave the tile lists of all sensors
+def interleaveTiles(profiles, tileLists):
+    """
+    Interleave the tiles of several sensors round-robin into one queue.
+
+    Parameters
+    ----------
+    profiles : list of dict
+        Sensor profiles.
+    tileLists : list of list
+        Tile list of each profile, in the same order.
+
+    Returns
+    -------
+    list of tuple
+        `(profile, tile)` pairs alternating between sensors, so a shared
+        concurrency budget is spent evenly over all of them.
+    """
+    queue = []
+    for i in range(max((len(tiles) for tiles in tileLists), default=0)):
+        for profile, tiles in zip(profiles, tileLists):
+            if i < len(tiles):
+                queue.append((profile, tiles[i]))
+    return queue
+
+
+# per-sensor counters
+def newSensorStats():
+    return {'tiles': 0, 'submitted': 0, 'reused': 0, 'null': 0, 'retried': 0,
+            'completed': 0, 'failed': 0, 'downloaded_files': 0, 'downloaded_bytes': 0,
+            'last_download': None}
+
+
+# write the list of permanently failed tiles
+def failedTileReport(failed_tiles, report_path):
+    """
+    Print and save the tiles that could not be classified after all retries.
+
+    Parameters
+    ----------
+    failed_tiles : list of dict
+        Entries with `sensor`, `tile`, `stage`, `attempts` and `error` keys.
+    report_path : str
+        JSON file the report is written to.
+    """
+    print(f"{len(failed_tiles)} tiles failed permanently.")
+    for entry in failed_tiles:
+        print(f"[FAILED] {entry['sensor']} tile {entry['tile']} at {entry['stage']} after {entry['attempts']} attempt(s): {entry['error']}")
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(failed_tiles, f, indent=1)
+    print(f"Failed tile report saved to {report_path}")
+
+
+# print the per-sensor throughput
+def throughputReport(stats, start_time):
+    """
+    Print the per-sensor tile counts and throughput of an engine run.
+
+    Parameters
+    ----------
+    stats : dict
+        Per-sensor counters created by `newSensorStats`.
+    start_time : float
+        `time.time()` at the start of the run.
+    """
+    for name, s in stats.items():
+        # throughput is measured until the last download of the sensor
+        hours = max(((s['last_download'] or time.time()) - start_time) / 3600, 1e-9)
+        print(f"[{name}] tiles {s['tiles']}, submitted {s['submitted']}, reused {s['reused']}, "
+              f"no classification {s['null']}, retried {s['retried']}, completed {s['completed']}, failed {s['failed']}, "
+              f"downloaded {s['downloaded_files']} files ({s['downloaded_bytes'] / 1e6:.1f} MB), "
+              f"{s['completed'] / hours:.1f} tiles/hour")
+
+
+# conduct the classifications, exports, downloads and mosaics of all sensors
+def run_tiles(profiles, startDate, month, CONUSBoundary, CONUStrainingLabel, local_root_folder, mosaicFolder,
+              export_profile='COG_Byte', max_active_tasks=MAX_ACTIVE_TASKS, poll_interval=POLL_INTERVAL,
+              download_workers=DOWNLOAD_WORKERS, max_resubmits=RetryPolicy.MAX_RESUBMITS, composite_mode=None,
+              sample_cache=None, region_table=None, region_asset_root=None, footprint_cache=None,
+              local_majority=False, local_remap=False, progress=None, end_date=None):
+    """
+    Classify, export, download and mosaic the tiles of several sensors with one scheduler.
+
+    Tiles of all sensor profiles are interleaved into one queue and share a
+    single budget of active Earth Engine tasks, a single status poller and a
+    single pool of Drive download threads. A tile is downloaded as soon as its
+    export completes, so exports, transfers and submissions overlap.
+
+    Parameters
+    ----------
+    profiles : list of dict
+        Sensor profiles, e.g. `[L89Profile(...), S2Profile(...)]`.
+    startDate : str
+        Start date for filtering images (YYYY-MM-DD).
+    month : str
+        Month label used in export descriptions.
+    CONUSBoundary : ee.Geometry
+        Geometry used to list the tiles of each sensor.
+    CONUStrainingLabel : ee.Image
+        Training label image with a `cropland` band.
+    local_root_folder : str
+        Local folder the tile folders are downloaded into.
+    mosaicFolder : str
+        Local folder of the per-sensor mosaics.
+    export_profile : str, optional
+        Export profile name in `ExportProfile.EXPORT_PROFILES` (default: 'COG_Byte').
+    max_active_tasks : int, optional
+        Maximum number of export tasks submitted but not finished, over all sensors.
+    poll_interval : float, optional
+        Seconds between two status polls (default: 30).
+    download_workers : int, optional
+        Number of parallel download threads (default: 4).
+    max_resubmits : int, optional
+        Number of times a tile is requeued after a transient error or a failed
+        export task (default: `RetryPolicy.MAX_RESUBMITS`).
+    composite_mode : str, optional
+        'biweekly' or 'monthly' to classify periodic median composites, which
+        keeps the feature count and EE compute per tile bounded over the
+        season (see `compositeImage`). Defaults to None (all scenes).
+    sample_cache : str, optional
+        Local folder of the per-tile training-location cache (see `SampleCache`).
+        Locations are sampled once per tile and year and reused by later
+        monthly runs. Defaults to None (stratified sampling in every run).
+    region_table : str, optional
+        CSV lookup table assigning tile keys to regions (see `RegionModel`).
+        Tiles of a region are classified by one Random Forest trained on the
+        pooled samples of all its members. Requires `composite_mode` and
+        `region_asset_root`. Defaults to None (one model per tile).
+    region_asset_root : str, optional
+        Earth Engine asset folder of the regional samples and models of this
+        run (see `RunConfig.run_paths`); its assets are replaced.
+    footprint_cache : str, optional
+        Local folder caching one simplified footprint per tile and year (see
+        `TileFootprint`), used for clipping, sampling and export instead of
+        the union of the scene footprints. Defaults to None.
+    local_majority : bool, optional
+        Drop the per-tile `focal_mode` in Earth Engine and apply the 3x3
+        majority filter to each sensor mosaic locally instead, so tile seams
+        are filtered with their neighbours (see `MajorityFilter`). Defaults to False.
+    local_remap : bool, optional
+        Export raw class codes and apply the `RemapTable` remap as a LUT while
+        the local mosaic reads the tiles (see `MosaicMultiImg.add_vrt_lut`),
+        removing the remap node from every export graph. Defaults to False.
+    progress : ProgressTracker.ProgressTracker, optional
+        Live progress model updated as tiles are submitted, run, exported,
+        downloaded and mosaicked. Defaults to None.
+    end_date : str, optional
+        End date of the scenes (YYYY-MM-DD). Defaults to None (today).
+
+    Returns
+    -------
+    dict
+        Per-sensor counters (tiles, submitted, reused, retried, completed,
+        failed, downloads), the `failed_tiles` list and the per-region
+        `regions` metrics.
+
+    Raises
+    ------
+    ValueError
+        If regional models are requested without `composite_mode` or
+        `region_asset_root`.
+
+    Notes
+    -----
+    - Profiles with an `archiveFolder` reuse archived tiles without new
+      acquisitions (see `TileManifest`).
+    - One mosaic per profile is written to `mosaicFolder` under the profile's
+      `mosaicName` at the profile's `exportScale`.
+    - Errors are classified by `RetryPolicy.classify_error`. Tiles hitting a
+      transient error (e.g. "too many requests") are requeued with jittered
+      exponential backoff instead of being dropped. Tiles failing permanently
+      or exhausting `max_resubmits` are listed in
+      `<local_root_folder>/<month>_failed_tiles.json`, as are region member
+      tiles whose sampling still fails after `RetryPolicy.call_with_retry`;
+      those are dropped from their region and from the run.
+    """
+    if region_table and not (composite_mode and region_asset_root):
+        raise ValueError("Regional models need composite_mode (identical features in all tiles) and region_asset_root.")
+
+    start_time = time.time()
+    endDate = end_date or datetime.now().strftime('%Y-%m-%d')
+    remap_original = RemapTable.originalValueList()
+    remap_target = RemapTable.resetValueList()
+    # validated once, before any tile is exported without the server-side remap
+    remap_lut = RemapTool.class_remap_lut() if local_remap else None
+
+    # tile lists, manifests and counters of every sensor
+    stats = {}
+    manifests = {}
+    processed = {}
+    tileLists = []
+    for profile in profiles:
+        name = profile['name']
+        with Telemetry.measure(f'tiles.list.{name}'):
+            tiles = RetryPolicy.call_with_retry(profile['tileList'], CONUSBoundary, description=f'{name} tile list')
+            Telemetry.count('tiles', len(tiles))
+        print(f'Number of {name} tiles:', len(tiles))
+        tileLists.append(tiles)
+        stats[name] = newSensorStats()
+        stats[name]['tiles'] = len(tiles)
+        manifests[name] = TileManifest.load_manifest(profile['archiveFolder']) if profile.get('archiveFolder') else {}
+        processed[name] = {}
+        if progress:
+            progress.add_tiles(name, [profile['tileName'](tile) for tile in tiles])
+    queue = [{'profile': profile, 'tile': tile, 'attempt': 0, 'not_before': 0}
+             for profile, tile in interleaveTiles(profiles, tileLists)]
+    failed_tiles = []
+
+    # progress of a tile, if tracked
+    def track(profile, tile, state):
+        if progress:
+            progress.update(profile['name'], profile['tileName'](tile), state)
+
+    # simplified footprint of a tile, None without cache or acquisition
+    def footprintOf(profile, tile):
+        if not footprint_cache:
+            return None
+        tile_key = profile['name'] + '_' + profile['tileName'](tile)
+        collection = profile['collection'](tile, startDate, endDate, profile['cloudCover'])
+        return TileFootprint.tile_footprint(footprint_cache, startDate[:4], tile_key, profile, collection)
+
+    # one shared classifier per region, trained from the pooled samples of its tiles
+    regionOfTile = {}
+    regionClassifiers = {}
+    regionMetrics = {}
+    if region_table:
+        # features and pooled training samples of a member tile; the footprint lookup may evaluate server-side
+        def regionSample(profile, tile, numPoints):
+            tileImage, tileGeometry = tileFeatures(profile, tile, startDate, endDate, composite_mode,
+                                                   footprintOf(profile, tile))
+            return tileImage, trainingSamples(profile, tileImage, tileGeometry, CONUStrainingLabel, numPoints=numPoints)
+
+        table = RegionModel.load_region_table(region_table)
+        regions = {}
+        dropped = set()
+        for profile, tiles in zip(profiles, tileLists):
+            members = {}
+            for tile in tiles:
+                region = table.get(profile['name'] + '_' + profile['tileName'](tile))
+                if region:
+                    members.setdefault(region, []).append(tile)
+            for region, region_tiles in members.items():
+                region_key = profile['name'] + '_' + region
+                numPoints = RegionModel.member_num_points(profile['numPoints'], len(region_tiles))
+                samples = []
+                inputProperties = None
+                for tile in region_tiles:
+                    tile_key = profile['name'] + '_' + profile['tileName'](tile)
+                    try:
+                        tileImage, sample = RetryPolicy.call_with_retry(regionSample, profile, tile, numPoints,
+                                                                        description=f'region sampling of {tile_key}')
+                    except Exception as e:
+                        # a tile without samples is dropped from its region and from the run
+                        print(f"[REGION] Tile {tile_key} dropped from region {region_key}: {e}")
+                        stats[profile['name']]['failed'] += 1
+                        track(profile, tile, 'failed')
+                        failed_tiles.append({'sensor': profile['name'], 'tile': tile, 'stage': 'region sampling',
+                                             'attempts': 1 if RetryPolicy.classify_error(e) == 'permanent'
+                                             else RetryPolicy.MAX_ATTEMPTS, 'error': str(e)})
+                        dropped.add(tile_key)
+                        continue
+                    samples.append(sample)
+                    inputProperties = tileImage.bandNames()
+                    regionOfTile[tile_key] = region_key
+                if samples:
+                    regions[region_key] = {'samples': ee.FeatureCollection(samples).flatten(),
+                                           'inputProperties': inputProperties,
+                                           'tiles': len(samples)}
+        queue = [item for item in queue if item['profile']['name'] + '_' + item['profile']['tileName'](item['tile'])
+                 not in dropped]
+        print(f"{len(regions)} regions cover {len(regionOfTile)} tiles")
+        regionClassifiers, regionMetrics = RegionModel.prepare_regions(regions, region_asset_root)
+
+    # requeue a tile with backoff, or give up after max_resubmits
+    def retryOrFail(item, stage, error):
+        name = item['profile']['name']
+        item['attempt'] += 1
+        if RetryPolicy.classify_error(error) == 'transient' and item['attempt'] <= max_resubmits:
+            delay = RetryPolicy.backoff_delay(item['attempt'])
+            item['not_before'] = time.time() + delay
+            queue.append(item)
+            stats[name]['retried'] += 1
+            track(item['profile'], item['tile'], 'queued')
+            print(f"[RETRY] {name} tile {item['tile']} requeued in {delay:.0f}s after {stage} error: {error}")
+        else:
+            stats[name]['failed'] += 1
+            track(item['profile'], item['tile'], 'failed')
+            failed_tiles.append({'sensor': name, 'tile': item['tile'], 'stage': stage,
+                                 'attempts': item['attempt'], 'error': str(error)})
+
+    # Drive services are not thread-safe: one per download thread
+    thread_local = threading.local()
+    folder_cache = {}
+    folder_lock = threading.Lock()
+
+    def downloadTile(profile, tile, description):
+        with Telemetry.measure('tiles.download'):
+            if not hasattr(thread_local, 'service'):
+                thread_local.service = DownloadTool.build_drive_service()
+            service = thread_local.service
+            with folder_lock:
+                folder_ids = folder_cache.get(profile['tileFolder'])
+                if not folder_ids:
+                    folder_ids = DownloadTool.folder_ids_by_name(service, profile['tileFolder'])
+                    folder_cache[profile['tileFolder']] = folder_ids
+            localTileFolder = os.path.join(local_root_folder, profile['tileFolder'])
+            files, downloaded_bytes = RetryPolicy.call_with_retry(DownloadTool.download_export, service, folder_ids,
+                                                                  description, localTileFolder,
+                                                                  description=f"download of '{description}'")
+            Telemetry.count('files', len(files))
+            Telemetry.count('bytes', downloaded_bytes)
+            track(profile, tile, 'downloaded')
+            return files, downloaded_bytes
+
+    # classify a tile and start its export, returns the started task or None
+    def submitTile(item, index):
+        profile = item['profile']
+        tile = item['tile']
+        name = profile['name']
+        tile_key = name + '_' + profile['tileName'](tile)
+        print(index, name, tile)
+
+        # reuse last month's classification if the tile has no new acquisition
+        ids = None
+        if profile.get('archiveFolder'):
+            archive_folder = profile['archiveFolder']
+            try:
+                ids = TileManifest.acquisition_ids(profile['collection'](tile, startDate, endDate, profile['cloudCover']), profile['idProperty'])
+            except Exception as e:
+                print(f"[WARNING] Failed to get acquisitions for tile {tile}, reclassifying: {e}")
+            if ids is not None and TileManifest.tile_unchanged(manifests[name], tile_key, ids, archive_folder):
+                localTileFolder = os.path.join(local_root_folder, profile['tileFolder'])
+                restored = TileManifest.restore_tile(manifests[name], tile_key, archive_folder, localTileFolder)
+                stats[name]['reused'] += 1
+                Telemetry.count('reused')
+                track(profile, tile, 'reused')
+                print(f"[REUSED] No new acquisition for tile {tile}, {restored} archived file(s) restored.")
+                return None
+
+        try:
+            # cached footprint instead of the union of all scene footprints
+            try:
+                footprint = footprintOf(profile, tile)
+            except Exception as e:
+                retryOrFail(item, 'footprint', e)
+                return None
+
+            # regional classifier, if the tile belongs to a trained region
+            classifier = regionClassifiers.get(regionOfTile.get(tile_key))
+
+            # training locations sampled once per tile and year
+            sample_points = None
+            if sample_cache and classifier is None:
+                try:
+                    region = footprint if footprint is not None else tileImageCollection(profile, tile, startDate, endDate).geometry()
+                    sample_points = SampleCache.cached_locations(sample_cache, startDate[:4], tile_key, CONUStrainingLabel,
+                                                                 region, profile['numPoints'], profile['sampleScale'])
+                except Exception as e:
+                    retryOrFail(item, 'sampling', e)
+                    return None
+
+            # This step usually does not trigger computation
+            classified_dictionary = ee.Dictionary(classifyTile(profile, tile, startDate, endDate, CONUStrainingLabel,
+                                                               composite_mode, sample_points, classifier, footprint,
+                                                               not local_majority))
+
+            # This line triggers a server-side computation (potential failure point)
+            try:
+                imgID = ApiMetrics.get_info(classified_dictionary.get('description'), 'ee.getInfo.classify')
+            except Exception as e:
+                retryOrFail(item, 'classification', e)
+                return None
+
+            if not imgID or imgID == 'null':
+                if ids is not None:
+                    processed[name][tile_key] = (ids, None)
+                stats[name]['null'] += 1
+                Telemetry.count('null')
+                track(profile, tile, 'skipped')
+                print(f"[SKIPPED] imgID is null for tile {tile}")
+                return None
+
+            # extract classified image, geometry region, and description
+            classified = ee.Image(classified_dictionary.get('image'))
+            if not local_remap:
+                classified = classified.remap(remap_original, remap_target)
+            classified = ExportProfile.prepare_image(classified, export_profile)
+            region = ee.Geometry(classified_dictionary.get('region'))
+            description = month + '_' + imgID
+
+            # export classification to Drive
+            task = ee.batch.Export.image.toDrive(
+                image=classified,
+                description=description,
+                folder=profile['tileFolder'],
+                region=region,
+                scale=profile['exportScale'],
+                crs='EPSG:5070',
+                maxPixels=1e12,
+                **ExportProfile.export_options(export_profile)
+            )
+            ApiMetrics.start_task(task)
+            if ids is not None:
+                processed[name][tile_key] = (ids, description)
+            stats[name]['submitted'] += 1
+            Telemetry.count('exports')
+            track(profile, tile, 'submitted')
+            print(f"Export task '{description}' started.")
+            return {'item': item, 'profile': profile, 'tile': tile, 'description': description, 'task': task}
+        except Exception as e:
+            retryOrFail(item, 'export setup', e)
+            return None
+
+    # next queued tile whose backoff has expired
+    def nextReadyItem():
+        now = time.time()
+        for i, item in enumerate(queue):
+            if item['not_before'] <= now:
+                return queue.pop(i)
+        return None
+
+    # one scheduler: submit within the budget, poll, hand finished tiles to the download pool
+    active = []
+    downloads = []
+    index = 0
+    with ThreadPoolExecutor(max_workers=download_workers, initializer=StageProfiler.helper_initializer()) as pool:
+        while queue or active:
+            while len(active) < max_active_tasks:
+                item = nextReadyItem()
+                if item is None:
+                    break
+                with Telemetry.measure('tiles.submit', tiles=1):
+                    record = submitTile(item, index)
+                index += 1
+                if record is not None:
+                    active.append(record)
+
+            if not active:
+                # only tiles waiting for their backoff are left
+                if queue:
+                    time.sleep(max(0, min(item['not_before'] for item in queue) - time.time()))
+                continue
+
+            # Avoid spamming Earth Engine with too many requests
+            time.sleep(poll_interval)
+            still_active = []
+            with Telemetry.measure('tiles.poll', tasks=len(active)):
+                for record in active:
+                    name = record['profile']['name']
+                    try:
+                        status = ApiMetrics.task_status(record['task'])
+                    except Exception as e:
+                        print(f"[WARNING] Failed to poll task '{record['description']}': {e}")
+                        still_active.append(record)
+                        continue
+                    state = status['state']
+                    if state == 'COMPLETED':
+                        stats[name]['completed'] += 1
+                        Telemetry.count('completed')
+                        track(record['profile'], record['tile'], 'exported')
+                        print(f"Task '{record['description']}' finished with state: {state}")
+                        downloads.append((record, pool.submit(downloadTile, record['profile'], record['tile'],
+                                                              record['description'])))
+                    elif state in ['FAILED', 'CANCELLED']:
+                        print(f"Task '{record['description']}' finished with state: {state}")
+                        retryOrFail(record['item'], 'export task', status.get('error_message', state))
+                    else:
+                        if state == 'RUNNING':
+                            track(record['profile'], record['tile'], 'running')
+                        still_active.append(record)
+            active = still_active
+
+        # wait for the download pool
+        for record, future in downloads:
+            name = record['profile']['name']
+            try:
+                files, downloaded_bytes = future.result()
+                stats[name]['downloaded_files'] += len(files)
+                stats[name]['downloaded_bytes'] += downloaded_bytes
+                stats[name]['last_download'] = time.time()
+            except Exception as e:
+                print(f"Something wrong during downloading '{record['description']}': {e}")
+                stats[name]['failed'] += 1
+                track(record['profile'], record['tile'], 'failed')
+                failed_tiles.append({'sensor': name, 'tile': record['tile'], 'stage': 'download',
+                                     'attempts': record['item']['attempt'] + 1, 'error': str(e)})
+
+    print("Classification of all sensors done.")
+    throughputReport(stats, start_time)
+    failedTileReport(failed_tiles, os.path.join(local_root_folder, f'{month}_failed_tiles.json'))
+
+    for profile in profiles:
+        name = profile['name']
+        localTileFolder = os.path.join(local_root_folder, profile['tileFolder'])
+
+        # archive new classifications and save acquisition manifest for the next run
+        if profile.get('archiveFolder'):
+            try:
+                with Telemetry.measure(f'tiles.archive.{name}', tiles=len(processed[name])):
+                    TileManifest.archive_tiles(manifests[name], processed[name], localTileFolder, profile['archiveFolder'])
+                    TileManifest.save_manifest(profile['archiveFolder'], manifests[name])
+                print(f"{len(processed[name])} {name} tiles archived to {profile['archiveFolder']}")
+            except Exception as e:
+                print(f"Something wrong during tile archiving: {e}")
+
+        # mosaic all classified images of the sensor
+        try:
+            print(f"Ready to mosaic multiple {name} classifications")
+            tile_files = len(os.listdir(localTileFolder)) if os.path.isdir(localTileFolder) else 0
+            with Telemetry.measure(f'mosaic.{name}', files=tile_files):
+                MosaicMultiImg.mosaicoutputVRT(localTileFolder, mosaicFolder, profile['mosaicName'],
+                                               resolution=profile['exportScale'], lut=remap_lut)
+        except Exception as e:
+            print(f"Something wrong in multi-image mosaic: {e}")
+            continue
+        if progress:
+            progress.update_all(name, ['downloaded', 'reused'], 'mosaicked')
+
+        # seam-aware majority filter at the sensor's native resolution
+        if local_majority:
+            try:
+                with Telemetry.measure(f'majority.{name}'):
+                    MajorityFilter.filter_raster(os.path.join(mosaicFolder, profile['mosaicName']))
+            except Exception as e:
+                print(f"Something wrong in local majority filter: {e}")
+
+    stats['failed_tiles'] = failed_tiles
+    stats['regions'] = regionMetrics
+    return stats
@@ -0,0 +1,95 @@
+import os
+import json
+import ee
+import JsonStore
+
+
+# vertices of a cached footprint ring; larger rings are replaced by their bounding box
+MAX_VERTICES = 64
+
+
+# bound the number of vertices of a footprint
+def bounded_footprint(footprint, max_vertices=MAX_VERTICES):
+    """
+    Replace a footprint ring with too many vertices by its bounding box.
+
+    Parameters
+    ----------
+    footprint : dict
+        Footprint as `{'crs', 'geodesic', 'coordinates'}` (one polygon ring).
+    max_vertices : int, optional
+        Maximum number of ring vertices (default: `MAX_VERTICES`).
+
+    Returns
+    -------
+    dict
+        The footprint itself, or its bounding box in the same CRS.
+    """
+    ring = footprint['coordinates'][0]
+    if len(ring) <= max_vertices:
+        return footprint
+    xs = [x for x, _ in ring]
+    ys = [y for _, y in ring]
+    box = [[min(xs), min(ys)], [max(xs), min(ys)], [max(xs), max(ys)], [min(xs), max(ys)], [min(xs), min(ys)]]
+    return dict(footprint, coordinates=[box])
+
+
+# footprint as an ee.Geometry
+def footprint_geometry(footprint):
+    """
+    Convert a cached footprint into an ee.Geometry.
+
+    The coordinates are embedded in the request, so clipping, sampling and
+    export no longer evaluate the union of the scene footprints.
+    """
+    return ee.Geometry.Polygon(footprint['coordinates'], footprint['crs'], footprint['geodesic'])
+
+
+# cached footprint of a tile, computed once per year
+def tile_footprint(cache_folder, year, tile_key, profile, collection):
+    """
+    Return the simplified footprint of a tile, computing it only on the first run of a year.
+
+    Parameters
+    ----------
+    cache_folder : str
+        Local root folder of the footprint cache.
+    year : int or str
+        Mapping year.
+    tile_key : str
+        Unique tile key.
+    profile : dict
+        Sensor profile with a `footprint` function (see `AutomatedL89Mapping.L89Footprint`
+        and `AutomatedS2Mapping.S2Footprint`).
+    collection : ee.ImageCollection
+        Acquisitions of the tile, only evaluated on a cache miss.
+
+    Returns
+    -------
+    ee.Geometry or None
+        Tile footprint with at most `MAX_VERTICES` vertices, or None if the tile
+        has no acquisition yet (the caller then falls back to the scene union).
+
+    Notes
+    -----
+    - A cache miss costs one server-side request. Tiles without any
+      acquisition are not cached and are computed again next run.
+    """
+    path = JsonStore.cache_path(cache_folder, year, tile_key)
+    footprint = None
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                footprint = json.load(f)['footprint']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Could not read footprint cache {path}: {e}")
+
+    if footprint is None:
+        footprint = profile['footprint'](collection)
+        if footprint is None:
+            return None
+        footprint = bounded_footprint(footprint)
+        # the cache is shared by concurrent runs, each writer has its own temporary file
+        JsonStore.write_json_atomic(path, {'tile': tile_key, 'year': int(year), 'footprint': footprint})
+        print(f"Footprint of {tile_key} cached with {len(footprint['coordinates'][0])} vertices.")
+    return footprint_geometry(footprint)
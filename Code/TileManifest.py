@@ -0,0 +1,180 @@
+import os
+import glob
+import json
+import shutil
+import ApiMetrics
+import JsonStore
+
+
+# name of the manifest file kept inside every sensor's archive folder
+MANIFEST_NAME = 'manifest.json'
+
+
+# read the manifest written by the previous run
+def load_manifest(archive_folder):
+    """
+    Load the tile manifest stored in a local classification archive.
+
+    Parameters
+    ----------
+    archive_folder : str
+        Local archive folder holding the manifest and the archived tiles.
+
+    Returns
+    -------
+    dict
+        Mapping of tile key to its manifest entry
+        (`{'ids': [...], 'description': str or None, 'files': [...]}`).
+        An empty dictionary is returned if no manifest exists yet.
+    """
+    manifest_path = os.path.join(archive_folder, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read tile manifest {manifest_path}: {e}")
+        return {}
+
+
+# write the manifest for the next run
+def save_manifest(archive_folder, manifest):
+    """
+    Save the tile manifest into the archive folder.
+
+    The manifest is written to a temporary file first and then renamed,
+    so an interrupted run never leaves a truncated manifest behind.
+
+    Parameters
+    ----------
+    archive_folder : str
+        Local archive folder holding the manifest and the archived tiles.
+    manifest : dict
+        Mapping of tile key to its manifest entry.
+    """
+    JsonStore.write_json_atomic(os.path.join(archive_folder, MANIFEST_NAME), manifest, indent=1, sort_keys=True)
+
+
+# acquisition list of a filtered tile collection
+def acquisition_ids(collection, id_property):
+    """
+    Retrieve the sorted acquisition IDs of a filtered tile collection.
+
+    Parameters
+    ----------
+    collection : ee.ImageCollection
+        Collection already filtered by tile, date range and cloud cover.
+    id_property : str
+        Image property holding a unique scene identifier
+        (e.g. `LANDSAT_PRODUCT_ID` or `PRODUCT_ID`).
+
+    Returns
+    -------
+    list of str
+        Sorted scene identifiers. This call triggers one server-side request.
+    """
+    return sorted(ApiMetrics.get_info(collection.aggregate_array(id_property), 'ee.getInfo.acquisitions'))
+
+
+# check whether the tile can be reused from the archive
+def tile_unchanged(manifest, tile_key, ids, archive_folder):
+    """
+    Decide whether a tile has no new acquisitions since the previous run.
+
+    Parameters
+    ----------
+    manifest : dict
+        Manifest loaded from the previous run.
+    tile_key : str
+        Unique tile key (e.g. `L89_20_31` or `S2_15TVG`).
+    ids : list of str
+        Sorted acquisition IDs of the tile in the current run.
+    archive_folder : str
+        Local archive folder holding the archived tiles.
+
+    Returns
+    -------
+    bool
+        True if the acquisition list is identical and every archived file
+        of the tile is still available locally.
+    """
+    entry = manifest.get(tile_key)
+    if entry is None or entry.get('ids') != ids:
+        return False
+    tile_folder = os.path.join(archive_folder, tile_key)
+    return all(os.path.exists(os.path.join(tile_folder, name)) for name in entry.get('files', []))
+
+
+# copy last month's classified tile into the download folder
+def restore_tile(manifest, tile_key, archive_folder, local_tile_folder):
+    """
+    Copy the archived classification of an unchanged tile into the local tile folder.
+
+    Parameters
+    ----------
+    manifest : dict
+        Manifest loaded from the previous run.
+    tile_key : str
+        Unique tile key.
+    archive_folder : str
+        Local archive folder holding the archived tiles.
+    local_tile_folder : str
+        Local folder the mosaic step reads the classified tiles from.
+
+    Returns
+    -------
+    int
+        Number of restored files (0 for tiles without a classification).
+    """
+    os.makedirs(local_tile_folder, exist_ok=True)
+    tile_folder = os.path.join(archive_folder, tile_key)
+    files = manifest[tile_key].get('files', [])
+    for name in files:
+        shutil.copy2(os.path.join(tile_folder, name), os.path.join(local_tile_folder, name))
+    return len(files)
+
+
+# archive freshly downloaded tiles and record their acquisition lists
+def archive_tiles(manifest, processed, local_tile_folder, archive_folder):
+    """
+    Archive the classified tiles of this run and update the manifest entries.
+
+    Parameters
+    ----------
+    manifest : dict
+        Manifest to update in place.
+    processed : dict
+        Mapping of tile key to `(ids, description)` for every tile processed
+        in this run. `description` is the export description, or None if the
+        tile produced no classification.
+    local_tile_folder : str
+        Local folder holding the downloaded tiles.
+    archive_folder : str
+        Local archive folder holding the archived tiles.
+
+    Notes
+    -----
+    - Exported tiles are matched by their export description, which also
+      covers multi-file (sharded) exports.
+    - A tile whose export did not arrive locally is left out of the manifest,
+      so it is reclassified in the next run.
+    """
+    for tile_key, (ids, description) in processed.items():
+        tile_folder = os.path.join(archive_folder, tile_key)
+        files = []
+        if description is not None:
+            sources = sorted(glob.glob(os.path.join(local_tile_folder, glob.escape(description) + '*.tif')))
+            if not sources:
+                print(f"Warning: No downloaded file found for {description}, tile {tile_key} is not archived.")
+                manifest.pop(tile_key, None)
+                continue
+            if os.path.exists(tile_folder):
+                shutil.rmtree(tile_folder)
+            os.makedirs(tile_folder)
+            for source in sources:
+                shutil.copy2(source, tile_folder)
+                files.append(os.path.basename(source))
+        elif os.path.exists(tile_folder):
+            shutil.rmtree(tile_folder)
+        manifest[tile_key] = {'ids': ids, 'description': description, 'files': files}
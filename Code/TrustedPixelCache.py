@@ -0,0 +1,180 @@
+import time
+import ee
+import ApiMetrics
+
+
+# seconds between two status polls of the materialization task
+POLL_INTERVAL = 60
+
+
+# asset ID of a materialized trusted-pixel product
+def asset_id(asset_root, year, gap, aoi_name):
+    """
+    Return the asset ID of the trusted-pixel product keyed by (year, gap, AOI).
+
+    Parameters
+    ----------
+    asset_root : str
+        Earth Engine asset folder, e.g. `projects/<project>/assets/TrustedPixel`.
+    year : int
+        Mapping year.
+    gap : int
+        Year gap passed to `TrustedPixel.trustedPixels`.
+    aoi_name : str
+        Short name of the area of interest, e.g. 'CONUS'.
+
+    Returns
+    -------
+    str
+        Asset ID such as `<asset_root>/trustedPixel_2025_gap7_CONUS`.
+    """
+    return f"{asset_root}/trustedPixel_{year}_gap{gap}_{aoi_name}"
+
+
+# metadata lookup only, no computation
+def asset_exists(asset_path):
+    """
+    Check whether an Earth Engine asset exists with a single metadata request.
+
+    Parameters
+    ----------
+    asset_path : str
+        Asset ID to look up.
+
+    Returns
+    -------
+    bool
+        True if the asset exists.
+    """
+    try:
+        return ApiMetrics.call('ee.data.getInfo', ee.data.getInfo, asset_path) is not None
+    except ee.EEException:
+        return False
+
+
+# create the asset folder if needed
+def ensure_folder(asset_root):
+    """
+    Create the Earth Engine asset folder of the cached products if it does not exist.
+
+    Parameters
+    ----------
+    asset_root : str
+        Earth Engine asset folder.
+    """
+    if not asset_exists(asset_root):
+        try:
+            ee.data.createAsset({'type': 'FOLDER'}, asset_root)
+        except ee.EEException:
+            # created meanwhile by a concurrent run
+            if not asset_exists(asset_root):
+                raise
+            return
+        print(f"Created asset folder {asset_root}")
+
+
+# export the trusted-pixel graph once into an asset
+def build_asset(year, gap, aoi, asset_path, scale=30):
+    """
+    Materialize the trusted-pixel label image into an Earth Engine asset.
+
+    Parameters
+    ----------
+    year : int
+        Mapping year.
+    gap : int
+        Year gap passed to `TrustedPixel.trustedPixels`.
+    aoi : ee.Geometry
+        Area of interest the product is clipped and exported to.
+    asset_path : str
+        Destination asset ID.
+    scale : float, optional
+        Export scale in meters, matching the 30 m CDL (default: 30).
+
+    Raises
+    ------
+    RuntimeError
+        If the export task fails or is cancelled.
+
+    Notes
+    -----
+    - Blocks until the export task finishes, polling every `POLL_INTERVAL` seconds.
+    - Pyramids use the mode, so coarser levels keep valid class values.
+    """
+    # imported here, it needs an initialized Earth Engine session
+    import TrustedPixel
+    label = TrustedPixel.trustedPixels(year, gap).select('cropland').clip(aoi).toUint8()
+    task = ee.batch.Export.image.toAsset(
+        image=label,
+        description=asset_path.rsplit('/', 1)[-1],
+        assetId=asset_path,
+        region=aoi,
+        scale=scale,
+        crs='EPSG:5070',
+        maxPixels=1e13,
+        pyramidingPolicy={'cropland': 'mode'}
+    )
+    ApiMetrics.start_task(task)
+    print(f"Materializing trusted pixels to {asset_path}")
+
+    while True:
+        status = ApiMetrics.task_status(task)
+        state = status['state']
+        if state == 'COMPLETED':
+            print(f"Trusted pixels saved to {asset_path}")
+            return
+        if state in ['FAILED', 'CANCELLED']:
+            raise RuntimeError(f"Trusted pixel export {state}: {status.get('error_message', '')}")
+        time.sleep(POLL_INTERVAL)
+
+
+# cached trusted pixels, built once per season
+def trusted_pixels(year, gap, aoi, aoi_name, asset_root, rebuild=False):
+    """
+    Return the trusted-pixel label image, materialized once per (year, gap, AOI).
+
+    The first run of a season exports `TrustedPixel.trustedPixels(year, gap)`
+    into an asset; later runs only check that the asset exists and load it by
+    reference, so tile sampling reads a precomputed image instead of
+    re-deriving the multi-year CDL logic for every tile.
+
+    Parameters
+    ----------
+    year : int
+        Mapping year.
+    gap : int
+        Year gap passed to `TrustedPixel.trustedPixels`.
+    aoi : ee.Geometry
+        Area of interest the product is clipped to.
+    aoi_name : str
+        Short name of the area of interest used in the asset ID.
+    asset_root : str
+        Earth Engine asset folder of the cached products.
+    rebuild : bool, optional
+        Rebuild the asset even if it exists (default: False).
+
+    Returns
+    -------
+    ee.Image
+        Label image with a `cropland` band.
+
+    Notes
+    -----
+    - If the asset cannot be built, the lazy `TrustedPixel.trustedPixels`
+      graph is returned so the run can still proceed.
+    """
+    asset_path = asset_id(asset_root, year, gap, aoi_name)
+    if not rebuild and asset_exists(asset_path):
+        print(f"Using cached trusted pixels {asset_path}")
+        return ee.Image(asset_path)
+
+    try:
+        ensure_folder(asset_root)
+        if rebuild and asset_exists(asset_path):
+            ee.data.deleteAsset(asset_path)
+        build_asset(year, gap, aoi, asset_path)
+        return ee.Image(asset_path)
+    except Exception as e:
+        print(f"Warning: Could not materialize trusted pixels ({e}), using the on-the-fly graph.")
+        import TrustedPixel
+        return TrustedPixel.trustedPixels(year, gap)